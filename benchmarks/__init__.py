@@ -0,0 +1,10 @@
+"""
+Smart Stamp 效能基準測試套件
+
+於專案根目錄執行，例如：
+
+    python -m benchmarks.matcher
+
+stamp-server 與 manager/backend 的套件名稱皆為 `app`，
+因此每個基準測試只會載入其中一個服務（見 common.use_service）。
+"""
@@ -0,0 +1,138 @@
+"""
+資料庫存取並行基準測試：同步 Session（阻塞事件迴圈）vs 非同步 AsyncSession
+
+在單一事件迴圈（相當於一個 uvicorn worker）上同時執行多個「API Key 查詢 + 載入客戶印章」，
+比較舊版同步寫法與目前非同步寫法的每秒處理量。以 SQLite 替代 MariaDB，
+並在每次 SQL 執行前加入固定延遲模擬網路往返（--latency-ms）。
+
+    python -m benchmarks.async_db --concurrency 1,8,32 --latency-ms 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import emit, use_service
+from benchmarks.seed import SlowConnection, api_key_for, seed_registry
+
+use_service('stamp-server')
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.cache import load_client_stamps  # noqa: E402
+from app.core.security import resolve_api_key  # noqa: E402
+from app.models import APIClient, Base, StampPermission, StampRegistry  # noqa: E402
+
+
+def sync_lookup(session_factory, api_key: str) -> int:
+    """舊版驗證流程的資料庫存取（同步 Session，與移植前的 verify_stamp 相同）"""
+    db = session_factory()
+    try:
+        client = db.query(APIClient).filter(APIClient.api_key == api_key, APIClient.is_active == True).first()
+        permissions = db.query(StampPermission).filter(
+            StampPermission.client_id == client.id,
+            StampPermission.is_active == True
+        ).all()
+        stamps = db.query(StampRegistry).filter(StampRegistry.id.in_([p.stamp_id for p in permissions])).all()
+        return len(stamps)
+    finally:
+        db.close()
+
+
+async def async_lookup(session_factory, api_key: str) -> int:
+    """目前驗證流程的資料庫存取（AsyncSession）"""
+    async with session_factory() as db:
+        client_info = await resolve_api_key(api_key, db)
+        stamps = await load_client_stamps(db, client_info['client_id'])
+        return len(stamps)
+
+
+async def run_load(handler, keys, concurrency: int, total: int) -> float:
+    """以固定並行數執行 total 次請求，返回每秒處理量"""
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(keys[i % len(keys)])
+
+    async def worker():
+        while not queue.empty():
+            await handler(queue.get_nowait())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+async def main_async(args) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix='smartstamp-bench-'), 'core.db')
+    sync_engine = create_engine(
+        f'sqlite:///{path}',
+        connect_args={'factory': SlowConnection, 'check_same_thread': False}
+    )
+    Base.metadata.create_all(sync_engine)
+    SessionLocal = sessionmaker(bind=sync_engine, autoflush=False)
+    seed_db = SessionLocal()
+    seed_registry(seed_db, args.clients, args.stamps)
+    seed_db.close()
+
+    async_engine = create_async_engine(
+        f'sqlite+aiosqlite:///{path}',
+        connect_args={'factory': SlowConnection},
+        pool_size=max(args.concurrency_levels),
+        max_overflow=0
+    )
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    rng = random.Random(args.seed)
+    keys = [api_key_for(rng.randint(1, args.clients)) for _ in range(args.requests)]
+    SlowConnection.latency = args.latency_ms / 1000
+
+    async def sync_handler(api_key):
+        sync_lookup(SessionLocal, api_key)
+
+    async def async_handler(api_key):
+        await async_lookup(AsyncSessionLocal, api_key)
+
+    # 預熱連線池
+    await run_load(async_handler, keys, max(args.concurrency_levels), max(args.concurrency_levels))
+
+    report = {
+        'benchmark': 'async_db',
+        'latency_ms': args.latency_ms,
+        'clients': args.clients,
+        'stamps_per_client': args.stamps,
+        'results': []
+    }
+    for concurrency in args.concurrency_levels:
+        sync_rps = await run_load(sync_handler, keys, concurrency, args.requests)
+        async_rps = await run_load(async_handler, keys, concurrency, args.requests)
+        report['results'].append({
+            'concurrency': concurrency,
+            'sync_rps': sync_rps,
+            'async_rps': async_rps,
+            'speedup': async_rps / sync_rps,
+        })
+
+    await async_engine.dispose()
+    sync_engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', default='1,8,32', help='並行數（逗號分隔）')
+    parser.add_argument('--requests', type=int, default=400, help='每個並行數的請求數量')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='每次 SQL 的模擬延遲（毫秒）')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--stamps', type=int, default=50, help='每個客戶的印章數量')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    args.concurrency_levels = [int(c) for c in args.concurrency.split(',')]
+    emit(asyncio.run(main_async(args)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+二進位驗證端點 vs JSON 端點
+
+- codec：單一請求的編解碼成本
+  - JSON：json.loads + VerifyRequest 驗證，VerifyResponse 經 jsonable_encoder 與 json.dumps 序列化
+  - 二進位：decode_points + encode_response
+- endpoints：同一組請求在行程內（httpx ASGITransport，不經過網路）分別送到 POST /api/v1/verify 與
+  POST /api/v1/verify/binary，輸出 p50/p95/p99 延遲與每秒請求數；量測前先確認兩個端點的結果一致
+
+以 SQLite 替代 stamp_core_db / app_business_db，測試資料與 benchmarks.e2e 相同。
+
+    python -m benchmarks.binary_verify --requests 2000 --output binary.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+
+from benchmarks.common import emit, jitter_points, measure, random_points, use_service
+from benchmarks.e2e import drive, send
+from benchmarks.seed import api_key_for, seed_registry
+
+
+def build_requests(args, points_by_client):
+    """產生 (client_id, points) 列表（依 --match-ratio 混合會驗證成功與失敗的請求）"""
+    rng = random.Random(args.seed)
+    requests = []
+    for _ in range(args.requests):
+        client_id = rng.randint(1, args.clients)
+        if rng.random() < args.match_ratio:
+            points = jitter_points(rng, rng.choice(points_by_client[client_id - 1]), amount=0.05)
+        else:
+            points = random_points(rng)
+        requests.append((client_id, points))
+    return requests
+
+
+def bench_codec(points) -> list:
+    """單一請求的編解碼成本"""
+    from fastapi.encoders import jsonable_encoder
+
+    from app.core.binary_protocol import decode_points, encode_points, encode_response
+    from app.main import VerifyRequest, VerifyResponse
+
+    json_body = json.dumps({'points': points}).encode('utf-8')
+    binary_body = encode_points(points)
+    result = VerifyResponse(status='valid', stamp_id=123, jwt_token='x' * 600, message='印章驗證成功')
+
+    def json_codec():
+        VerifyRequest.model_validate(json.loads(json_body))
+        json.dumps(jsonable_encoder(VerifyResponse.model_validate(result)), ensure_ascii=False).encode('utf-8')
+
+    def binary_codec():
+        decode_points(binary_body)
+        encode_response(result.status, result.message, result.stamp_id, result.jwt_token)
+
+    return [
+        {'name': 'json', 'request_bytes': len(json_body), **measure(json_codec)},
+        {'name': 'binary', 'request_bytes': len(binary_body), **measure(binary_codec)},
+    ]
+
+
+async def bench_endpoints(app, requests, concurrency: int, warmup: int, check: int) -> dict:
+    """確認兩個端點的結果一致後，分別量測延遲與每秒請求數"""
+    import httpx
+
+    from app.core.binary_protocol import decode_response, encode_points
+
+    json_requests = [
+        ('POST', '/api/v1/verify', {'points': points}, {'X-API-Key': api_key_for(client_id)})
+        for client_id, points in requests
+    ]
+    binary_requests = [
+        ('POST', '/api/v1/verify/binary', encode_points(points), {'X-API-Key': api_key_for(client_id)})
+        for client_id, points in requests
+    ]
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            for json_request, binary_request in zip(json_requests[:check], binary_requests[:check]):
+                expected = await send(client, *json_request)
+                actual = await send(client, *binary_request)
+                decoded = decode_response(actual.content)
+                body = expected.json()
+                if expected.status_code == 200:
+                    same = (
+                        (decoded['status'], decoded['stamp_id'], decoded['message'], bool(decoded['jwt_token']))
+                        == (body['status'], body['stamp_id'], body['message'], bool(body['jwt_token']))
+                    )
+                else:
+                    same = decoded['message'] == body['detail']
+                if actual.status_code != expected.status_code or not same:
+                    raise AssertionError(f"二進位端點的結果與 JSON 端點不同: {body} vs {decoded}")
+
+            return {
+                'json': {'endpoint': 'POST /api/v1/verify', **await drive(client, json_requests, concurrency, warmup)},
+                'binary': {
+                    'endpoint': 'POST /api/v1/verify/binary',
+                    **await drive(client, binary_requests, concurrency, warmup)
+                },
+            }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=20, help='客戶數量')
+    parser.add_argument('--stamps', type=int, default=50, help='每個客戶自有的印章數量')
+    parser.add_argument('--requests', type=int, default=2000, help='每個端點的請求數量')
+    parser.add_argument('--concurrency', type=int, default=8, help='並行請求數')
+    parser.add_argument('--warmup', type=int, default=50, help='預熱請求數量（不計入結果）')
+    parser.add_argument('--check', type=int, default=200, help='量測前比對兩個端點結果的請求數量')
+    parser.add_argument('--match-ratio', type=float, default=0.8, help='會驗證成功的請求比例')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='smartstamp-binary-') as workdir:
+        os.environ['DATABASE_URL_CORE'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+        os.environ['DATABASE_URL_BUSINESS'] = f"sqlite:///{os.path.join(workdir, 'business.db')}"
+        os.environ['LOG_SPOOL_DIR'] = os.path.join(workdir, 'log_spool')
+        os.environ['REGISTRY_SNAPSHOT_DIR'] = os.path.join(workdir, 'registry_snapshot')
+        # 兩個端點共用每個客戶的令牌桶，量測處理量時不限流
+        os.environ['RATE_LIMIT_ENABLED'] = 'false'
+        use_service('stamp-server')
+
+        from app.core import database
+        from app.models import Base
+
+        Base.metadata.create_all(database.engine_core)
+        Base.metadata.create_all(database.engine_business)
+        session = database.SessionLocalCore()
+        points_by_client = seed_registry(session, args.clients, args.stamps, 0, seed=args.seed)
+        session.close()
+
+        from app.main import app
+
+        requests = build_requests(args, points_by_client)
+        report = {
+            'benchmark': 'binary_verify',
+            'clients': args.clients,
+            'stamps_per_client': args.stamps,
+            'concurrency': args.concurrency,
+            'codec': bench_codec(requests[0][1]),
+            'endpoints': asyncio.run(bench_endpoints(app, requests, args.concurrency, args.warmup, args.check)),
+        }
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
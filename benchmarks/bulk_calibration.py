@@ -0,0 +1,107 @@
+"""
+管理後台批次校正基準測試（SQLite）
+
+- per_row：以 TestClient 逐筆呼叫 POST /admin/stamps/calibrate（每筆一個交易）
+- bulk：同樣的紀錄以 NDJSON 上傳到 POST /admin/stamps/calibrate/bulk（每 BULK_CHUNK_SIZE 筆一個交易）
+- memory：直接呼叫 run_bulk_calibration 處理 --rows 的一半與全部，輸出 tracemalloc 的記憶體高峰，
+  確認記憶體用量與上傳大小無關
+
+兩種方式都會檢查碰撞（force=false），紀錄由隨機座標產生。
+
+    python -m benchmarks.bulk_calibration --rows 20000 --output bulk_calibration.json
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import emit, random_points, use_service
+
+use_service('manager')
+
+
+def make_records(rng: random.Random, rows: int, prefix: str) -> list:
+    return [{'name': f'{prefix}-{i}', 'points': random_points(rng)} for i in range(rows)]
+
+
+def to_ndjson(records: list) -> bytes:
+    return ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+
+
+def bench_per_row(client, records: list) -> dict:
+    start = time.perf_counter()
+    for record in records:
+        # 與批次校正的預設相同：無法區分的紀錄不建立
+        response = client.post('/admin/stamps/calibrate', json={**record, 'reject_collisions': True})
+        if response.status_code not in (200, 409):
+            raise AssertionError(f"校正失敗：{response.status_code} {response.text}")
+    elapsed = time.perf_counter() - start
+    return {'name': 'per_row', 'rows': len(records), 'elapsed_s': elapsed, 'rows_per_sec': len(records) / elapsed}
+
+
+def bench_bulk(client, records: list) -> dict:
+    body = to_ndjson(records)
+    start = time.perf_counter()
+    response = client.post('/admin/stamps/calibrate/bulk', content=body)
+    summary = json.loads(response.text.splitlines()[-1])['summary']
+    elapsed = time.perf_counter() - start
+    if summary['total'] != len(records) or summary['errors']:
+        raise AssertionError(f"批次校正結果不正確：{summary}")
+    return {
+        'name': 'bulk',
+        'rows': len(records),
+        'created': summary['created'],
+        'elapsed_s': elapsed,
+        'rows_per_sec': len(records) / elapsed,
+    }
+
+
+def bench_memory(records: list) -> dict:
+    from app.core.bulk_calibration import run_bulk_calibration
+
+    with tempfile.TemporaryFile() as upload, tempfile.TemporaryFile() as report:
+        upload.write(to_ndjson(records))
+        upload.seek(0)
+        tracemalloc.start()
+        summary = run_bulk_calibration(upload, 'ndjson', report)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'name': 'memory',
+        'rows': summary.total,
+        'peak_memory_mb': peak / 1024 / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000, help='批次上傳的紀錄數量')
+    parser.add_argument('--per-row', type=int, default=2000, help='逐筆校正的紀錄數量')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix='smartstamp-bulk-') as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+        from fastapi.testclient import TestClient
+
+        from app.core import database
+        from app.main import app
+
+        with TestClient(app) as client:
+            results = [
+                bench_per_row(client, make_records(rng, args.per_row, 'per-row')),
+                bench_bulk(client, make_records(rng, args.per_row, 'bulk')),
+            ]
+        results.append(bench_memory(make_records(rng, args.rows // 2, 'memory-half')))
+        results.append(bench_memory(make_records(rng, args.rows, 'memory-full')))
+        database.engine.dispose()
+    emit({'benchmark': 'bulk_calibration', 'results': results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+印章碰撞偵測基準測試（管理後台）
+
+- report：全註冊表碰撞報告，逐列與所有後面的印章比對（all-pairs）vs 目前的格子分塊比對
+  （find_all_collisions）；不超過 --naive-max 的規模會先確認兩者的結果相同
+- calibrate：校正時的碰撞檢查，讀取整張表比對 vs 目前以 fp_0..fp_4 索引做方框查詢（find_collisions），
+  以 SQLite 建立 --db-stamps 枚印章
+
+印章由隨機座標產生，另有 --duplicate-ratio 比例的印章是既有印章加上抖動後再次校正。
+
+    python -m benchmarks.collisions --sizes 1000,10000,100000 --output collisions.json
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import emit, jitter_points, measure, random_points, use_service
+
+use_service('manager')
+
+
+def build_registry(rng: random.Random, size: int, duplicate_ratio: float):
+    """產生 size 枚印章的 (印章 ID, 指紋陣列)"""
+    from smart_stamp_fingerprint.batch import get_normalized_fingerprints
+
+    stamp_points = []
+    for _ in range(size):
+        if stamp_points and rng.random() < duplicate_ratio:
+            stamp_points.append(jitter_points(rng, rng.choice(stamp_points), amount=0.3))
+        else:
+            stamp_points.append(random_points(rng))
+    return np.arange(1, size + 1, dtype=np.int64), get_normalized_fingerprints(stamp_points)
+
+
+def naive_collisions(stamp_ids: np.ndarray, fingerprints: np.ndarray, tolerance_max: float, tolerance_mse: float):
+    """逐列與所有後面的印章比對，返回 {(stamp_id, other_stamp_id)}"""
+    pairs = set()
+    for i in range(len(stamp_ids) - 1):
+        diff = fingerprints[i + 1:] - fingerprints[i]
+        max_error = np.abs(diff).max(axis=1)
+        mse = (diff * diff).sum(axis=1) / diff.shape[1]
+        for j in np.flatnonzero((max_error < tolerance_max) & (mse < tolerance_mse)):
+            a, b = int(stamp_ids[i]), int(stamp_ids[i + 1 + j])
+            pairs.add((min(a, b), max(a, b)))
+    return pairs
+
+
+def bench_report(rng: random.Random, sizes, duplicate_ratio: float, naive_max: int) -> list:
+    from app.core import collisions
+
+    results = []
+    for size in sizes:
+        stamp_ids, fingerprints = build_registry(rng, size, duplicate_ratio)
+        start = time.perf_counter()
+        found = collisions.find_all_collisions(stamp_ids, fingerprints)
+        blocked_s = time.perf_counter() - start
+
+        result = {'name': 'report', 'stamps': size, 'pairs': len(found), 'blocked_s': blocked_s}
+        if size <= naive_max:
+            start = time.perf_counter()
+            expected = naive_collisions(
+                stamp_ids, fingerprints,
+                collisions.VERIFICATION_TOLERANCE_MAX, collisions.VERIFICATION_TOLERANCE_MSE
+            )
+            result['naive_s'] = time.perf_counter() - start
+            result['speedup'] = result['naive_s'] / blocked_s
+            if expected != {(pair.stamp_id, pair.other_stamp_id) for pair in found}:
+                raise AssertionError(f"{size} 枚印章的分塊比對結果與 all-pairs 不同")
+        results.append(result)
+    return results
+
+
+def bench_calibrate(rng: random.Random, size: int, duplicate_ratio: float) -> dict:
+    from sqlalchemy import insert
+
+    from app.core import collisions, database
+    from app.models import Base, StampRegistry
+    from smart_stamp_fingerprint import calculate_max_error, calculate_mse, get_normalized_fingerprint
+
+    stamp_ids, fingerprints = build_registry(rng, size, duplicate_ratio)
+    Base.metadata.create_all(database.engine)
+    db = database.SessionLocal()
+    rows = [
+        {'id': int(stamp_id), 'name': f'bench-stamp-{stamp_id}', 'fingerprint': fingerprint.tolist(),
+         **collisions.fingerprint_columns(fingerprint)}
+        for stamp_id, fingerprint in zip(stamp_ids, fingerprints)
+    ]
+    db.execute(insert(StampRegistry), rows)
+    db.commit()
+
+    target = get_normalized_fingerprint(random_points(rng))
+
+    def full_scan():
+        found = []
+        for stamp_id, fingerprint in db.query(StampRegistry.id, StampRegistry.fingerprint):
+            mse = calculate_mse(fingerprint, target)
+            max_error = calculate_max_error(fingerprint, target)
+            if collisions.is_collision(mse, max_error):
+                found.append(stamp_id)
+        return found
+
+    if sorted(full_scan()) != sorted(collision.stamp_id for collision in collisions.find_collisions(db, target)):
+        raise AssertionError("索引方框查詢的結果與讀取整張表不同")
+
+    scan = measure(full_scan, repeat=3, number=1)
+    indexed = measure(lambda: collisions.find_collisions(db, target))
+    db.close()
+    return {
+        'name': 'calibrate',
+        'stamps': size,
+        'full_scan_ms': scan['best_us'] / 1000,
+        'indexed_ms': indexed['best_us'] / 1000,
+        'speedup': scan['best_us'] / indexed['best_us'],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='碰撞報告的印章數量（逗號分隔）')
+    parser.add_argument('--naive-max', type=int, default=10000, help='執行 all-pairs 比對的最大印章數量')
+    parser.add_argument('--db-stamps', type=int, default=100000, help='校正碰撞檢查的印章數量')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.01, help='再次校正既有印章的比例')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix='smartstamp-collisions-') as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+        report = {
+            'benchmark': 'collisions',
+            'duplicate_ratio': args.duplicate_ratio,
+            'results': [
+                *bench_report(rng, [int(n) for n in args.sizes.split(',')], args.duplicate_ratio, args.naive_max),
+                bench_calibrate(rng, args.db_stamps, args.duplicate_ratio),
+            ]
+        }
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
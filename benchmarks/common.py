@@ -0,0 +1,122 @@
+"""
+基準測試共用工具
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVICE_PATHS = {
+    'stamp-server': os.path.join(PROJECT_ROOT, 'stamp-server'),
+    'manager': os.path.join(PROJECT_ROOT, 'manager', 'backend'),
+}
+
+
+def use_service(name: str) -> None:
+    """將指定服務加入 sys.path，之後即可 `import app...`（同一行程只能載入一個服務）"""
+    path = SERVICE_PATHS[name]
+    loaded = sys.modules.get('app')
+    if loaded is not None and not os.path.abspath(loaded.__path__[0]).startswith(path):
+        raise RuntimeError(f"此行程已載入另一個服務的 app 套件，無法再載入 {name}")
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def random_points(rng: random.Random, scale: float = 500.0) -> List[Tuple[float, float]]:
+    """產生 5 個隨機觸控點"""
+    return [(rng.uniform(0, scale), rng.uniform(0, scale)) for _ in range(5)]
+
+
+def jitter_points(rng: random.Random, points: Sequence[Tuple[float, float]], amount: float = 0.5) -> List[Tuple[float, float]]:
+    """在觸控點上加入少量抖動，模擬同一枚印章的再次蓋印"""
+    return [(x + rng.uniform(-amount, amount), y + rng.uniform(-amount, amount)) for x, y in points]
+
+
+def measure(func: Callable[[], object], repeat: int = 5, number: int = 0, min_time: float = 0.2) -> dict:
+    """
+    量測函式每次呼叫的耗時（取多輪中的最佳值）
+
+    Args:
+        func: 待量測的無參數函式
+        repeat: 量測輪數
+        number: 每輪呼叫次數，0 表示自動決定
+        min_time: 自動決定次數時每輪的最短時間（秒）
+    """
+    if number <= 0:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - start >= min_time:
+                break
+            number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    best = min(timings)
+    return {
+        'number': number,
+        'best_us': best * 1e6,
+        'mean_us': sum(timings) / len(timings) * 1e6,
+        'ops_per_sec': 1.0 / best if best > 0 else float('inf'),
+    }
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """已排序數列的百分位數（最近排名法）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(latencies: Sequence[float], elapsed: float) -> dict:
+    """
+    將每個請求的耗時（秒）整理為 p50/p95/p99 延遲（毫秒）與每秒請求數
+
+    Args:
+        latencies: 每個請求的耗時（秒）
+        elapsed: 整體經過時間（秒）
+    """
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'rps': len(ordered) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def git_revision() -> Optional[str]:
+    """目前的 git commit（無法取得時返回 None）"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def emit(report: dict, output: Optional[str] = None) -> None:
+    """以 JSON 格式輸出結果（附上目前的 git commit），指定 output 時另外寫入檔案"""
+    report.setdefault('commit', git_revision())
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
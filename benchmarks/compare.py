@@ -0,0 +1,59 @@
+"""
+比較兩次基準測試的 JSON 結果（例如兩個 commit 的 e2e 輸出）
+
+列出兩份結果中都存在的數值欄位及其變化百分比，欄位以路徑表示（例如 results.stamp-server.p99_ms）。
+列表中的項目以 name / stamps / algorithm / concurrency 等欄位組成路徑，使不同次執行的項目能對應。
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+from typing import Dict
+
+# 列表項目中用來識別同一項目的欄位
+IDENTITY_KEYS = ('name', 'algorithm', 'stamps', 'concurrency', 'executor', 'endpoint')
+
+
+def flatten(value, prefix: str = '') -> Dict[str, float]:
+    """將巢狀結果展開為 {路徑: 數值}"""
+    flat: Dict[str, float] = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            flat.update(flatten(child, f'{prefix}.{key}' if prefix else str(key)))
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            label = str(i)
+            if isinstance(child, dict):
+                parts = [f'{key}={child[key]}' for key in IDENTITY_KEYS if key in child]
+                label = ','.join(parts) or label
+            flat.update(flatten(child, f'{prefix}[{label}]'))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = float(value)
+    return flat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    with open(args.before, encoding='utf-8') as f:
+        before_report = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after_report = json.load(f)
+    before = flatten(before_report)
+    after = flatten(after_report)
+
+    print(f"{before_report.get('commit')} → {after_report.get('commit')}")
+    width = max((len(path) for path in before if path in after), default=0)
+    for path in before:
+        if path not in after:
+            continue
+        old, new = before[path], after[path]
+        change = f'{(new - old) / old * 100:+.1f}%' if old else 'n/a'
+        print(f'{path:<{width}}  {old:>14.3f}  {new:>14.3f}  {change:>8}')
+
+
+if __name__ == '__main__':
+    main()
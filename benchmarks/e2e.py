@@ -0,0 +1,204 @@
+"""
+端對端負載測試：在行程內（httpx ASGITransport，不經過網路）對兩個服務發送並行請求
+
+- stamp-server：POST /api/v1/verify（依 --match-ratio 混合會驗證成功與失敗的請求）
+- manager：POST /admin/stamps/calibrate
+
+兩個服務以 SQLite 替代 stamp_core_db / app_business_db，並依 --clients / --stamps / --shared-permissions 建立測試資料。
+兩個服務的 Python 套件都叫 app，無法在同一行程載入，因此每個服務在獨立的子行程中執行。
+輸出每個端點的 p50/p95/p99 延遲與每秒請求數。
+
+    python -m benchmarks.e2e --requests 2000 --concurrency 8 --output e2e.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.common import PROJECT_ROOT, emit, jitter_points, latency_summary, random_points, use_service
+from benchmarks.seed import api_key_for, seed_registry
+
+SERVICES = ('stamp-server', 'manager')
+
+
+async def send(client, method: str, url: str, body, headers):
+    """送出單一請求（body 為 bytes 時原樣送出，否則以 JSON 編碼）"""
+    if isinstance(body, bytes):
+        return await client.request(method, url, content=body, headers=headers)
+    return await client.request(method, url, json=body, headers=headers)
+
+
+async def drive(client, requests, concurrency: int, warmup: int) -> dict:
+    """
+    以固定並行數送出所有請求（應用程式須已啟動）
+
+    Args:
+        client: httpx.AsyncClient
+        requests: (method, url, body, headers) 列表
+        concurrency: 並行數
+        warmup: 正式量測前先送出的請求數量（不計入結果）
+    """
+    latencies = []
+    statuses = Counter()
+
+    for request in requests[:warmup]:
+        await send(client, *request)
+
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    async def worker():
+        while not queue.empty():
+            request = queue.get_nowait()
+            started = time.perf_counter()
+            response = await send(client, *request)
+            latencies.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {**latency_summary(latencies, elapsed), 'status_counts': dict(statuses)}
+
+
+async def run_load(app, requests, concurrency: int, warmup: int) -> dict:
+    """
+    啟動應用程式並以固定並行數送出所有請求
+
+    Args:
+        app: FastAPI 應用程式（會執行 startup / shutdown 事件）
+        requests: (method, url, body, headers) 列表
+        concurrency: 並行數
+        warmup: 正式量測前先送出的請求數量（不計入結果）
+    """
+    import httpx
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            return await drive(client, requests, concurrency, warmup)
+
+
+def stamp_server_worker(args, workdir: str) -> dict:
+    """在子行程中載入 stamp-server 並測試 /api/v1/verify"""
+    os.environ['DATABASE_URL_CORE'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+    os.environ['DATABASE_URL_BUSINESS'] = f"sqlite:///{os.path.join(workdir, 'business.db')}"
+    os.environ['LOG_SPOOL_DIR'] = os.path.join(workdir, 'log_spool')
+    os.environ['REGISTRY_SNAPSHOT_DIR'] = os.path.join(workdir, 'registry_snapshot')
+    use_service('stamp-server')
+
+    from app.core import database
+    from app.models import Base
+
+    Base.metadata.create_all(database.engine_core)
+    Base.metadata.create_all(database.engine_business)
+    session = database.SessionLocalCore()
+    points_by_client = seed_registry(session, args.clients, args.stamps, args.shared_permissions, seed=args.seed)
+    session.close()
+
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    requests = []
+    for _ in range(args.requests):
+        client_id = rng.randint(1, args.clients)
+        if rng.random() < args.match_ratio:
+            points = jitter_points(rng, rng.choice(points_by_client[client_id - 1]), amount=0.05)
+        else:
+            points = random_points(rng)
+        requests.append(('POST', '/api/v1/verify', {'points': points}, {'X-API-Key': api_key_for(client_id)}))
+
+    result = asyncio.run(run_load(app, requests, args.concurrency, args.warmup))
+    return {'endpoint': 'POST /api/v1/verify', **result}
+
+
+def manager_worker(args, workdir: str) -> dict:
+    """在子行程中載入管理後台並測試 /admin/stamps/calibrate"""
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+    use_service('manager')
+
+    from app.core.database import SessionLocal, engine
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    seed_registry(session, args.clients, args.stamps, args.shared_permissions, seed=args.seed)
+    session.close()
+
+    from app.main import app
+
+    # 預熱會重送前面的請求，隨機座標也可能與測試資料碰撞；以 force 建立，量測的仍包含碰撞檢查
+    rng = random.Random(args.seed)
+    requests = [
+        ('POST', '/admin/stamps/calibrate', {'name': f'bench-calibrate-{i}', 'points': random_points(rng)}, {})
+        for i in range(args.requests)
+    ]
+
+    result = asyncio.run(run_load(app, requests, args.concurrency, args.warmup))
+    return {'endpoint': 'POST /admin/stamps/calibrate', **result}
+
+
+WORKERS = {
+    'stamp-server': stamp_server_worker,
+    'manager': manager_worker,
+}
+
+
+def run_service(service: str, argv) -> dict:
+    """在子行程中執行單一服務的負載測試並取得結果"""
+    with tempfile.TemporaryDirectory(prefix='smartstamp-e2e-') as workdir:
+        result_path = os.path.join(workdir, 'result.json')
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.e2e', *argv, '--worker', service, '--result-file', result_path],
+            cwd=PROJECT_ROOT,
+            check=True,
+            stdout=subprocess.DEVNULL
+        )
+        with open(result_path, encoding='utf-8') as f:
+            return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--services', default=','.join(SERVICES), help='要測試的服務（逗號分隔）')
+    parser.add_argument('--clients', type=int, default=20, help='客戶數量')
+    parser.add_argument('--stamps', type=int, default=50, help='每個客戶自有的印章數量')
+    parser.add_argument('--shared-permissions', type=int, default=0, help='每個客戶另外取得其他客戶印章的權限數量')
+    parser.add_argument('--requests', type=int, default=2000, help='每個端點的請求數量')
+    parser.add_argument('--concurrency', type=int, default=8, help='並行請求數')
+    parser.add_argument('--warmup', type=int, default=50, help='預熱請求數量（不計入結果）')
+    parser.add_argument('--match-ratio', type=float, default=0.8, help='verify 請求中會驗證成功的比例')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    parser.add_argument('--worker', choices=SERVICES, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args, argv = parser.parse_args(), sys.argv[1:]
+
+    if args.worker:
+        with tempfile.TemporaryDirectory(prefix='smartstamp-e2e-db-') as workdir:
+            result = WORKERS[args.worker](args, workdir)
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    report = {
+        'benchmark': 'e2e',
+        'clients': args.clients,
+        'stamps_per_client': args.stamps,
+        'shared_permissions': args.shared_permissions,
+        'concurrency': args.concurrency,
+        'results': {service: run_service(service, argv) for service in args.services.split(',')}
+    }
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+指紋空間索引基準測試：線性掃描（find_best_within）vs 網格索引（FingerprintGridIndex）
+
+每個規模都會先確認兩者的查詢結果相同，再量測查詢耗時，並找出索引開始勝過線性掃描的交叉點。
+查詢混合了「既有印章再次蓋印」（加入抖動）與「未註冊的隨機印章」兩種情況。
+
+    python -m benchmarks.fingerprint_index --sizes 100,500,1000,2000,5000,20000,100000
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+
+from benchmarks.common import emit, jitter_points, measure, random_points, use_service
+
+use_service('stamp-server')
+
+from app.core.fingerprint_index import FingerprintGridIndex  # noqa: E402
+from app.core.math_utils import get_normalized_fingerprint  # noqa: E402
+from app.core.matcher import as_fingerprint_matrix, find_best_within  # noqa: E402
+
+VERIFICATION_TOLERANCE_MAX = float(os.getenv('VERIFICATION_TOLERANCE_MAX', '0.01'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100,500,1000,2000,5000,20000,100000', help='印章數量（逗號分隔）')
+    parser.add_argument('--queries', type=int, default=200, help='每個規模的查詢數量')
+    parser.add_argument('--tolerance', type=float, default=VERIFICATION_TOLERANCE_MAX, help='最大誤差容差')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {'benchmark': 'fingerprint_index', 'tolerance': args.tolerance, 'results': [], 'crossover_stamps': None}
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        stamp_points = [random_points(rng) for _ in range(size)]
+        stamp_ids = np.arange(1, size + 1, dtype=np.int64)
+        fingerprints = as_fingerprint_matrix([get_normalized_fingerprint(p) for p in stamp_points])
+        index = FingerprintGridIndex.build(stamp_ids, fingerprints, cell_size=2 * args.tolerance)
+
+        queries = []
+        for _ in range(args.queries):
+            if rng.random() < 0.5:
+                queries.append(get_normalized_fingerprint(jitter_points(rng, rng.choice(stamp_points))))
+            else:
+                queries.append(get_normalized_fingerprint(random_points(rng)))
+
+        matched = 0
+        for query in queries:
+            expected = find_best_within(stamp_ids, fingerprints, query, args.tolerance)
+            actual = index.query(query, args.tolerance)
+            assert expected == actual or (
+                expected is not None and actual is not None and
+                (expected.stamp_id, expected.mse, expected.max_error) == (actual.stamp_id, actual.mse, actual.max_error)
+            ), "索引查詢結果與線性掃描不一致"
+            matched += expected is not None
+
+        def run_linear():
+            for query in queries:
+                find_best_within(stamp_ids, fingerprints, query, args.tolerance)
+
+        def run_index():
+            for query in queries:
+                index.query(query, args.tolerance)
+
+        linear_us = measure(run_linear, repeat=3)['best_us'] / len(queries)
+        index_us = measure(run_index, repeat=3)['best_us'] / len(queries)
+        report['results'].append({
+            'stamps': size,
+            'candidates_in_box': matched,
+            'linear_us': linear_us,
+            'index_us': index_us,
+            'speedup': linear_us / index_us,
+        })
+        if report['crossover_stamps'] is None and index_us < linear_us:
+            report['crossover_stamps'] = size
+
+    # 額外量測逐筆新增與刪除的成本
+    index = FingerprintGridIndex(cell_size=2 * args.tolerance)
+    extra = [get_normalized_fingerprint(random_points(rng)) for _ in range(1000)]
+    next_id = iter(range(1, 10 ** 9))
+
+    def insert_delete():
+        stamp_id = next(next_id)
+        index.insert(stamp_id, extra[stamp_id % len(extra)])
+        index.delete(stamp_id)
+
+    report['insert_delete_us'] = measure(insert_delete)['best_us']
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
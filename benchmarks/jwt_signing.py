@@ -0,0 +1,81 @@
+"""
+JWT 簽章基準測試：比較 RS256 / ES256 / EdDSA 與各種簽章執行方式
+
+- inline：在目前執行緒直接簽署，即單一核心每秒簽章數
+- thread / process：透過 SecurityManager.sign_jwt_async 並行簽署，另外換算每核心每秒簽章數
+
+每種演算法都會先用公鑰驗證簽出的 JWT，確認 get_public_key_pem 的輸出可用。
+
+    python -m benchmarks.jwt_signing --workers 4 --tokens 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import jwt
+
+from benchmarks.common import emit, measure, use_service
+
+use_service('stamp-server')
+
+from app.core.security import SUPPORTED_ALGORITHMS, SecurityManager  # noqa: E402
+
+
+async def pool_throughput(manager: SecurityManager, tokens: int, concurrency: int) -> float:
+    """以 concurrency 個並行請求簽署 tokens 個 JWT，返回每秒簽章數"""
+    # 預熱簽章池（行程池需要啟動子行程）
+    await asyncio.gather(*(manager.sign_jwt_async(stamp_id=0) for _ in range(manager.workers)))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def sign_one(i):
+        async with semaphore:
+            await manager.sign_jwt_async(stamp_id=i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sign_one(i) for i in range(tokens)))
+    return tokens / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--algorithms', default=','.join(SUPPORTED_ALGORITHMS))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='簽章池大小')
+    parser.add_argument('--tokens', type=int, default=2000, help='簽章池測試的 JWT 數量')
+    args = parser.parse_args()
+
+    report = {'benchmark': 'jwt_signing', 'workers': args.workers, 'cpu_count': os.cpu_count(), 'results': []}
+    for algorithm in args.algorithms.split(','):
+        manager = SecurityManager(algorithm=algorithm, executor='inline')
+        token = manager.sign_jwt(stamp_id=1)
+        claims = jwt.decode(token, manager.get_public_key_pem(), algorithms=[algorithm])
+        assert claims['stamp_id'] == 1, "JWT 驗證失敗"
+
+        inline = measure(lambda: manager.sign_jwt(stamp_id=1))
+        result = {
+            'algorithm': algorithm,
+            'token_bytes': len(token),
+            'inline_signs_per_sec': inline['ops_per_sec'],
+        }
+
+        key_file = tempfile.NamedTemporaryFile(suffix='.pem', delete=False)
+        key_file.write(manager.get_private_key_pem())
+        key_file.close()
+
+        for executor in ('thread', 'process'):
+            pooled = SecurityManager(key_file.name, algorithm=algorithm, executor=executor, workers=args.workers)
+            rate = asyncio.run(pool_throughput(pooled, args.tokens, concurrency=args.workers * 4))
+            pooled.close()
+            result[f'{executor}_signs_per_sec'] = rate
+            result[f'{executor}_signs_per_sec_per_core'] = rate / min(args.workers, os.cpu_count() or 1)
+
+        os.unlink(key_file.name)
+        report['results'].append(result)
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
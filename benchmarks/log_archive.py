@@ -0,0 +1,146 @@
+"""
+驗證日誌封存基準測試（SQLite，分割區以每月的時間範圍模擬）
+
+- archive：逐月封存並刪除分割區（各月份的日誌筆數不同），輸出每秒筆數、壓縮比（未壓縮的 NDJSON / gzip），
+  以及另一次封存時 tracemalloc 的記憶體高峰，確認記憶體高峰與分割區大小無關
+- query：由封存檔讀取一個月份中單一客戶的日誌（只開啟該月份的封存檔），以及掃描整個月份的每秒筆數（確認筆數與分割區相同）
+- restore：把同一個月份的日誌寫回 stamping_logs 的每秒筆數
+
+    python -m benchmarks.log_archive --logs 300000 --output log_archive.json
+"""
+import argparse
+import gzip
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import emit, use_service
+
+use_service('manager')
+
+STATUSES = ('valid', 'valid', 'valid', 'valid', 'invalid', 'error')
+
+
+def insert_logs(engine, rng: random.Random, start: datetime, end: datetime, count: int, clients: int) -> None:
+    from sqlalchemy import insert
+
+    from app.models import StampingLog
+
+    span = int((end - start).total_seconds()) - 1
+    with engine.begin() as conn:
+        for offset in range(0, count, 20000):
+            rows = []
+            for _ in range(min(20000, count - offset)):
+                status = rng.choice(STATUSES)
+                rows.append({
+                    'log_uuid': uuid.UUID(int=rng.getrandbits(128)).hex,
+                    'client_id': rng.randint(1, clients),
+                    'stamp_id': rng.randint(1, 500) if status == 'valid' else None,
+                    'status': status,
+                    'fingerprint': [round(rng.random(), 6) for _ in range(5)],
+                    'error_message': '指紋不符' if status == 'invalid' else None,
+                    'ip_address': f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                    'user_agent': 'SmartStampClient/2.1 (Linux; Android 14)',
+                    'created_at': start + timedelta(seconds=rng.randint(0, span)),
+                })
+            conn.execute(insert(StampingLog), rows)
+
+
+def uncompressed_bytes(path: str) -> int:
+    size = 0
+    with gzip.open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            size += len(chunk)
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logs', type=int, default=300000, help='驗證日誌筆數（分布在 --months 個月，越晚的月份越多）')
+    parser.add_argument('--months', type=int, default=4, help='封存的月份數')
+    parser.add_argument('--clients', type=int, default=50, help='客戶數量')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix='smartstamp-log-archive-') as workdir:
+        os.environ['LOG_ARCHIVE_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'business.db')}"
+        from sqlalchemy import create_engine, func, select
+
+        from app.core import log_archive
+        from app.models import BusinessBase, StampingLog
+
+        engine = create_engine(log_archive.LOG_ARCHIVE_DATABASE_URL)
+        BusinessBase.metadata.create_all(engine)
+        first = log_archive.add_months(log_archive.month_start(datetime.now()), -args.months)
+        weights = range(1, args.months + 1)
+        for i, weight in enumerate(weights):
+            month = log_archive.add_months(first, i)
+            insert_logs(engine, rng, month, log_archive.add_months(month, 1),
+                        args.logs * weight // sum(weights), args.clients)
+
+        backend = log_archive.partition_backend(engine)
+        archive_dir = os.path.join(workdir, 'archive')
+        results = []
+        for partition in backend.list():
+            # tracemalloc 會拖慢讀取與序列化，記憶體高峰另以一次不刪除分割區的封存量測
+            tracemalloc.start()
+            log_archive.write_archive(engine, partition, os.path.join(workdir, 'traced'))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            start = time.perf_counter()
+            manifest = log_archive.archive_partition(engine, backend, partition, archive_dir)
+            elapsed = time.perf_counter() - start
+            archive_path = os.path.join(archive_dir, manifest.file)
+            results.append({
+                'name': 'archive',
+                'partition': manifest.partition,
+                'rows': manifest.rows,
+                'rows_per_sec': manifest.rows / elapsed,
+                'bytes': manifest.bytes,
+                'compression_ratio': uncompressed_bytes(archive_path) / manifest.bytes,
+                'peak_memory_mb': peak / 1024 / 1024,
+            })
+        with engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(StampingLog)).scalar():
+                raise AssertionError("封存後 stamping_logs 仍有日誌")
+
+        # 最後一個（最大的）月份中單一客戶的日誌
+        month = log_archive.add_months(first, args.months - 1)
+        until = log_archive.add_months(month, 1)
+        start = time.perf_counter()
+        rows = list(log_archive.iter_archived_rows(archive_dir, month, until, client_id=1))
+        query_s = time.perf_counter() - start
+        start = time.perf_counter()
+        scanned = sum(1 for _ in log_archive.iter_archived_rows(archive_dir, month, until))
+        scan_s = time.perf_counter() - start
+        if scanned != results[-1]['rows']:
+            raise AssertionError("封存檔的筆數與分割區不同")
+
+        start = time.perf_counter()
+        restored = log_archive.restore_rows(engine, log_archive.iter_archived_rows(archive_dir, month, until))
+        restore_s = time.perf_counter() - start
+        with engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(StampingLog)).scalar() != scanned:
+                raise AssertionError("還原的筆數與封存檔不同")
+        engine.dispose()
+
+    emit({
+        'benchmark': 'log_archive',
+        'logs': args.logs,
+        'results': [
+            *results,
+            {'name': 'query', 'partition_rows': scanned, 'matched': len(rows),
+             'filtered_ms': query_s * 1000, 'scan_rows_per_sec': scanned / scan_s},
+            {'name': 'restore', 'rows': restored, 'rows_per_sec': restored / restore_s},
+        ]
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
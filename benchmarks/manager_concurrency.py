@@ -0,0 +1,139 @@
+"""
+管理後台並行基準測試：耗時的查詢是否阻塞其他請求（SQLite）
+
+在單一事件迴圈（相當於一個 uvicorn worker）上發出一個耗時的 GET /admin/permissions
+（對 stamp_permissions 的每次查詢加入 --slow-ms 延遲，模擬大型表或鎖等待），
+在它完成之前每隔固定時間呼叫 GET /health 與 GET /admin/clients，記錄這些請求的延遲
+（從預定的發出時間起算）：
+
+- event_loop：在 async def 路由中直接呼叫同步 Session（舊版寫法，事件迴圈被佔用）
+- threadpool：目前的一般 def 路由（FastAPI 在執行緒池中執行）
+
+只輸出延遲的數字；不阻塞的判定由 manager/backend/tests/test_concurrency.py 負責。
+
+    python -m benchmarks.manager_concurrency --slow-ms 1000 --output manager_concurrency.json
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.common import emit, percentile, use_service
+
+use_service('manager')
+
+
+def seed(database, clients: int) -> None:
+    from sqlalchemy import insert
+
+    from app.models import APIClient, Base, StampPermission, StampRegistry
+
+    Base.metadata.create_all(database.engine)
+    db = database.SessionLocal()
+    db.execute(insert(StampRegistry), [
+        {'id': i, 'name': f'bench-stamp-{i}', 'fingerprint': [0.1, 0.2, 0.3, 0.4, 1.0]} for i in range(1, 101)
+    ])
+    db.execute(insert(APIClient), [
+        {'id': i, 'name': f'bench-client-{i}', 'api_key': f'sk_bench_{i}'} for i in range(1, clients + 1)
+    ])
+    db.execute(insert(StampPermission), [
+        {'client_id': client_id, 'stamp_id': stamp_id, 'is_active': True}
+        for client_id in range(1, clients + 1) for stamp_id in range(1, 101)
+    ])
+    db.commit()
+    db.close()
+
+
+def slow_permission_queries(engine, slow_s: float) -> None:
+    """對 stamp_permissions 的每次查詢加入延遲（在執行查詢的執行緒中等待，與真正的慢查詢相同）"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def delay(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM stamp_permissions' in statement:
+            time.sleep(slow_s)
+
+
+def add_event_loop_route(app, database) -> None:
+    """舊版寫法：async def 路由直接使用同步 Session"""
+    from fastapi import Response
+
+    from app.main import list_permissions
+
+    @app.get('/bench/permissions-on-event-loop')
+    async def permissions_on_event_loop(response: Response):
+        db = database.SessionLocal()
+        try:
+            return list_permissions(response, limit=100, db=db)
+        finally:
+            db.close()
+
+
+async def probe(client, slow_path: str, probes: int, slow_s: float) -> dict:
+    """
+    耗時的請求進行中時，每隔固定時間呼叫 /health 與 /admin/clients
+
+    延遲從預定的發出時間起算：事件迴圈被阻塞時請求無法準時發出，等待的時間也計入延遲。
+    """
+    interval = slow_s / probes
+    slow_start = time.perf_counter()
+    slow = asyncio.ensure_future(client.get(slow_path))
+
+    latencies = {'/health': [], '/admin/clients': []}
+    for i in range(probes):
+        # 平均分布在耗時的請求預期執行的期間內
+        scheduled = slow_start + interval * (i + 0.5)
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+        for path, values in latencies.items():
+            response = await client.get(path)
+            values.append((time.perf_counter() - scheduled) * 1000)
+            if response.status_code != 200:
+                raise AssertionError(f"{path} 失敗：{response.status_code}")
+    response = await slow
+    slow_ms = (time.perf_counter() - slow_start) * 1000
+    if response.status_code != 200:
+        raise AssertionError(f"{slow_path} 失敗：{response.status_code}")
+
+    result = {'slow_request_ms': slow_ms}
+    for path, values in latencies.items():
+        values.sort()
+        result[path] = {'p50_ms': percentile(values, 50), 'max_ms': values[-1]}
+    return result
+
+
+async def run(app, probes: int, slow_s: float) -> list:
+    import httpx
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://manager') as client:
+        for mode, path in (('event_loop', '/bench/permissions-on-event-loop'), ('threadpool', '/admin/permissions')):
+            results.append({'name': 'blocking', 'mode': mode, **await probe(client, path, probes, slow_s)})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--slow-ms', type=float, default=1000, help='stamp_permissions 查詢的延遲（毫秒）')
+    parser.add_argument('--probes', type=int, default=20, help='耗時的請求進行中時呼叫 /health 與 /admin/clients 的次數')
+    parser.add_argument('--clients', type=int, default=20, help='客戶數量')
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='smartstamp-concurrency-') as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+        from app.core import database
+        from app.main import app
+
+        seed(database, args.clients)
+        slow_permission_queries(database.engine, args.slow_ms / 1000)
+        add_event_loop_route(app, database)
+        results = asyncio.run(run(app, args.probes, args.slow_ms / 1000))
+        database.engine.dispose()
+
+    emit({'benchmark': 'manager_concurrency', 'slow_ms': args.slow_ms, 'results': results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+指紋比對基準測試：逐筆比對（calculate_mse / calculate_max_error）vs 向量化比對
+
+執行前會先驗證兩者在隨機資料上選出的印章、MSE 與最大誤差逐位元一致，不一致時直接中止
+（完整的一致性測試見 stamp-server/tests/test_matcher.py）。
+
+    python -m benchmarks.matcher --sizes 10,100,1000,10000
+"""
+import argparse
+import random
+
+import numpy as np
+
+from benchmarks.common import emit, measure, random_points, use_service
+
+use_service('stamp-server')
+
+from app.core.math_utils import calculate_max_error, calculate_mse, get_normalized_fingerprint  # noqa: E402
+from app.core.matcher import as_fingerprint_matrix, find_best_match  # noqa: E402
+
+
+def scalar_best_match(stamp_ids, fingerprints, fingerprint):
+    """與 verify_stamp 原本的逐筆比對迴圈相同"""
+    best_match = None
+    best_mse = float('inf')
+    best_max_error = float('inf')
+    for stamp_id, stored_fingerprint in zip(stamp_ids, fingerprints):
+        mse = calculate_mse(fingerprint, stored_fingerprint)
+        max_error = calculate_max_error(fingerprint, stored_fingerprint)
+        if mse < best_mse:
+            best_mse = mse
+            best_max_error = max_error
+            best_match = stamp_id
+    return best_match, best_mse, best_max_error
+
+
+def check_equivalence(rng: random.Random, rounds: int = 200) -> int:
+    """驗證向量化比對與逐筆比對的結果逐位元一致，返回檢查的組數"""
+    checked = 0
+    for _ in range(rounds):
+        n = rng.randint(1, 300)
+        fingerprints = [get_normalized_fingerprint(random_points(rng)) for _ in range(n)]
+        # 加入重複指紋以檢查 MSE 相同時的選擇順序
+        if n > 2:
+            fingerprints[-1] = list(fingerprints[0])
+        stamp_ids = list(range(1, n + 1))
+        matrix = as_fingerprint_matrix(fingerprints)
+        target = fingerprints[rng.randrange(n)] if rng.random() < 0.5 else get_normalized_fingerprint(random_points(rng))
+
+        expected = scalar_best_match(stamp_ids, fingerprints, target)
+        result = find_best_match(np.asarray(stamp_ids, dtype=np.int64), matrix, target)
+        assert (result.stamp_id, result.mse, result.max_error) == expected, "最佳候選不一致"
+        checked += 1
+    return checked
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='每個客戶的印章數量（逗號分隔）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {'benchmark': 'matcher', 'equivalence_checked': check_equivalence(rng), 'results': []}
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        fingerprints = [get_normalized_fingerprint(random_points(rng)) for _ in range(size)]
+        stamp_ids = list(range(1, size + 1))
+        matrix = as_fingerprint_matrix(fingerprints)
+        ids = np.asarray(stamp_ids, dtype=np.int64)
+        target = get_normalized_fingerprint(random_points(rng))
+
+        scalar = measure(lambda: scalar_best_match(stamp_ids, fingerprints, target))
+        vectorized = measure(lambda: find_best_match(ids, matrix, target))
+        report['results'].append({
+            'stamps': size,
+            'scalar_us': scalar['best_us'],
+            'vectorized_us': vectorized['best_us'],
+            'speedup': scalar['best_us'] / vectorized['best_us'],
+        })
+
+    emit(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+驗證伺服器熱點函式的微基準測試
+
+- get_normalized_fingerprint：5 點座標 → 指紋
+- get_normalized_fingerprints：批次驗證的指紋計算，逐筆呼叫 vs 批次 API 的每筆耗時（依 --batch 指定筆數）
+- 比對：原本的逐筆比對迴圈 vs 目前的 ClientStamps.best_match（依 --stamps 指定每個客戶的印章數量）
+- SecurityManager.sign_jwt：單次簽章耗時（演算法由 --algorithm 指定）
+
+    python -m benchmarks.micro --stamps 10,100,1000 --batch 100 --output micro.json
+"""
+import argparse
+import random
+
+from benchmarks.common import emit, jitter_points, measure, random_points, use_service
+
+use_service('stamp-server')
+
+from app.core.cache import ClientStamps  # noqa: E402
+from app.core.math_utils import get_normalized_fingerprint, get_normalized_fingerprints  # noqa: E402
+from app.core.security import SUPPORTED_ALGORITHMS, SecurityManager  # noqa: E402
+from benchmarks.matcher import scalar_best_match  # noqa: E402
+
+# 與 stamp-server 的預設最大誤差容差相同
+MAX_ERROR_TOLERANCE = 0.01
+
+
+def bench_fingerprint(rng: random.Random) -> dict:
+    points = random_points(rng)
+    return {'name': 'get_normalized_fingerprint', **measure(lambda: get_normalized_fingerprint(points))}
+
+
+def bench_fingerprint_batch(rng: random.Random, size: int) -> dict:
+    batch = [random_points(rng) for _ in range(size)]
+    scalar = measure(lambda: [get_normalized_fingerprint(points) for points in batch])
+    current = measure(lambda: get_normalized_fingerprints(batch))
+    return {
+        'name': 'fingerprint_batch',
+        'items': size,
+        'scalar_per_item_us': scalar['best_us'] / size,
+        'batch_per_item_us': current['best_us'] / size,
+        'speedup': scalar['best_us'] / current['best_us'],
+    }
+
+
+def bench_matching(rng: random.Random, sizes) -> list:
+    results = []
+    for n in sizes:
+        stamp_points = [random_points(rng) for _ in range(n)]
+        stamp_ids = list(range(1, n + 1))
+        fingerprints = [get_normalized_fingerprint(p) for p in stamp_points]
+        client_stamps = ClientStamps.build(stamp_ids, fingerprints)
+        target = get_normalized_fingerprint(jitter_points(rng, stamp_points[rng.randrange(n)]))
+
+        scalar = measure(lambda: scalar_best_match(stamp_ids, fingerprints, target))
+        current = measure(lambda: client_stamps.best_match(target, MAX_ERROR_TOLERANCE))
+        results.append({
+            'name': 'match',
+            'stamps': n,
+            'scalar_us': scalar['best_us'],
+            'current_us': current['best_us'],
+            'speedup': scalar['best_us'] / current['best_us'],
+        })
+    return results
+
+
+def bench_sign_jwt(algorithm: str) -> dict:
+    manager = SecurityManager(algorithm=algorithm, executor='inline')
+    return {'name': 'sign_jwt', 'algorithm': algorithm, **measure(lambda: manager.sign_jwt(stamp_id=1))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stamps', default='10,100,1000', help='比對測試的每客戶印章數量（逗號分隔）')
+    parser.add_argument('--batch', type=int, default=100, help='批次指紋計算測試的筆數')
+    parser.add_argument('--algorithm', default='RS256', choices=SUPPORTED_ALGORITHMS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {
+        'benchmark': 'micro',
+        'results': [
+            bench_fingerprint(rng),
+            bench_fingerprint_batch(rng, args.batch),
+            *bench_matching(rng, [int(n) for n in args.stamps.split(',')]),
+            bench_sign_jwt(args.algorithm),
+        ]
+    }
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+管理後台列表分頁與匯出基準測試（SQLite）
+
+- page：取得第 k 頁的耗時，offset 分頁（OFFSET k * limit）vs keyset 分頁（id > 游標），依 --depths 指定位置
+- export：以伺服器端游標分批匯出所有印章（NDJSON / CSV），輸出每秒筆數與 tracemalloc 的記憶體高峰，
+  另以 --rows 的一半再匯出一次，確認記憶體高峰與總筆數無關
+
+    python -m benchmarks.pagination --rows 200000 --output pagination.json
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import emit, measure, use_service
+
+use_service('manager')
+
+
+def seed_stamps(database, rows: int) -> None:
+    from sqlalchemy import insert
+
+    from app.models import Base, StampRegistry
+
+    Base.metadata.create_all(database.engine)
+    db = database.SessionLocal()
+    fingerprint = [0.1, 0.2, 0.3, 0.4, 1.0]
+    for start in range(1, rows + 1, 10000):
+        db.execute(insert(StampRegistry), [
+            {'id': i, 'name': f'bench-stamp-{i}', 'fingerprint': fingerprint, 'description': f'印章 {i}'}
+            for i in range(start, min(start + 10000, rows + 1))
+        ])
+    db.commit()
+    db.close()
+
+
+def bench_pages(database, rows: int, limit: int, depths) -> list:
+    from fastapi import Response
+
+    from app.core.pagination import encode_cursor, keyset_page
+    from app.models import StampRegistry
+
+    db = database.SessionLocal()
+    results = []
+    for depth in depths:
+        offset = int(rows * depth)
+        # id 從 1 連續編號，第 offset 筆之後的游標即 offset
+        cursor = encode_cursor(offset) if offset else None
+
+        def by_offset():
+            return db.query(StampRegistry).order_by(StampRegistry.id).offset(offset).limit(limit).all()
+
+        def by_keyset():
+            return keyset_page(db.query(StampRegistry), StampRegistry.id, cursor, limit, Response())
+
+        if [stamp.id for stamp in by_offset()] != [stamp.id for stamp in by_keyset()]:
+            raise AssertionError(f"位置 {offset} 的 offset 與 keyset 分頁結果不同")
+        offset_result = measure(by_offset, repeat=3)
+        keyset_result = measure(by_keyset, repeat=3)
+        db.expunge_all()
+        results.append({
+            'name': 'page',
+            'offset': offset,
+            'limit': limit,
+            'offset_ms': offset_result['best_us'] / 1000,
+            'keyset_ms': keyset_result['best_us'] / 1000,
+            'speedup': offset_result['best_us'] / keyset_result['best_us'],
+        })
+    return results
+
+
+def bench_export(database, export_format: str, rows: int) -> dict:
+    from sqlalchemy import select
+
+    from app.core.pagination import export_rows
+    from app.models import StampRegistry
+
+    statement = select(
+        StampRegistry.id, StampRegistry.name, StampRegistry.fingerprint, StampRegistry.description,
+        StampRegistry.created_at, StampRegistry.updated_at
+    ).where(StampRegistry.id <= rows).order_by(StampRegistry.id)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = 0
+    for chunk in export_rows(database.SessionLocal, statement, export_format):
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'name': 'export',
+        'format': export_format,
+        'rows': rows,
+        'bytes': size,
+        'rows_per_sec': rows / elapsed,
+        'peak_memory_mb': peak / 1024 / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000, help='印章數量')
+    parser.add_argument('--limit', type=int, default=100, help='每頁筆數')
+    parser.add_argument('--depths', default='0,0.5,0.99', help='量測的頁面位置（佔總筆數的比例，逗號分隔）')
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='smartstamp-pagination-') as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+        from app.core import database
+
+        seed_stamps(database, args.rows)
+        report = {
+            'benchmark': 'pagination',
+            'rows': args.rows,
+            'results': [
+                *bench_pages(database, args.rows, args.limit, [float(d) for d in args.depths.split(',')]),
+                *(bench_export(database, export_format, rows)
+                  for export_format in ('ndjson', 'csv')
+                  for rows in (args.rows // 2, args.rows)),
+            ]
+        }
+        database.engine.dispose()
+    emit(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+管理後台批次權限基準測試（SQLite）
+
+- grant：將 --stamps 枚印章授予一個新客戶，逐筆 POST /admin/permissions（每筆三次查詢與一次 commit）
+  vs 一次 POST /admin/permissions/bulk（每 PERMISSION_BULK_CHUNK_SIZE 組一次查詢與一次多列 upsert）
+- matrix：取得所有客戶的權限，以 GET /admin/permissions 逐頁讀取（limit=1000）
+  vs GET /admin/permissions/matrix（runs 與 bitset），輸出耗時與回應大小
+
+    python -m benchmarks.permissions --stamps 5000 --clients 20 --output permissions.json
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import emit, use_service
+
+use_service('manager')
+
+
+def seed(database, stamps: int, clients: int) -> None:
+    from sqlalchemy import insert
+
+    from app.models import APIClient, Base, StampRegistry
+
+    Base.metadata.create_all(database.engine)
+    db = database.SessionLocal()
+    db.execute(insert(StampRegistry), [
+        {'id': i, 'name': f'bench-stamp-{i}', 'fingerprint': [0.1, 0.2, 0.3, 0.4, 1.0]}
+        for i in range(1, stamps + 1)
+    ])
+    db.execute(insert(APIClient), [
+        {'id': i, 'name': f'bench-client-{i}', 'api_key': f'sk_bench_{i}'}
+        for i in range(1, clients + 2)
+    ])
+    db.commit()
+    db.close()
+
+
+def bench_grant(client, stamps: int, clients: int) -> dict:
+    per_row_client, bulk_client = clients, clients + 1
+    start = time.perf_counter()
+    for stamp_id in range(1, stamps + 1):
+        response = client.post('/admin/permissions', json={'client_id': per_row_client, 'stamp_id': stamp_id})
+        if response.status_code != 200:
+            raise AssertionError(f"授予權限失敗：{response.status_code} {response.text}")
+    per_row_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post('/admin/permissions/bulk', json={
+        'grant': [{'client_id': bulk_client, 'stamp_id': stamp_id} for stamp_id in range(1, stamps + 1)]
+    })
+    bulk_s = time.perf_counter() - start
+    if response.json().get('granted') != stamps:
+        raise AssertionError(f"批次授予權限結果不正確：{response.text}")
+    return {
+        'name': 'grant',
+        'stamps': stamps,
+        'per_row_s': per_row_s,
+        'bulk_s': bulk_s,
+        'speedup': per_row_s / bulk_s,
+    }
+
+
+def bench_matrix(client, stamps: int, clients: int) -> list:
+    # 其他客戶各授予一半的印章（交錯的區段，讓 runs 編碼不只一段）
+    grant = [
+        {'client_id': client_id, 'stamp_id': stamp_id}
+        for client_id in range(1, clients)
+        for stamp_id in range(1, stamps + 1)
+        if (stamp_id // 50 + client_id) % 2 == 0
+    ]
+    client.post('/admin/permissions/bulk', json={'grant': grant})
+
+    start = time.perf_counter()
+    total, size, params = 0, 0, {'limit': 1000}
+    while True:
+        response = client.get('/admin/permissions', params=params)
+        total += len(response.json())
+        size += len(response.content)
+        cursor = response.headers.get('x-next-cursor')
+        if not cursor:
+            break
+        params = {'limit': 1000, 'cursor': cursor}
+    results = [{'name': 'matrix', 'method': 'list_pages', 'permissions': total,
+                'elapsed_ms': (time.perf_counter() - start) * 1000, 'bytes': size}]
+
+    for encoding in ('runs', 'bitset'):
+        start = time.perf_counter()
+        response = client.get('/admin/permissions/matrix', params={'encoding': encoding})
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if response.json()['total_permissions'] != total:
+            raise AssertionError(f"{encoding} 矩陣的權限數量與列表不同")
+        results.append({'name': 'matrix', 'method': encoding, 'permissions': total,
+                        'elapsed_ms': elapsed_ms, 'bytes': len(response.content)})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stamps', type=int, default=5000, help='印章數量')
+    parser.add_argument('--clients', type=int, default=20, help='客戶數量')
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='smartstamp-permissions-') as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+        from fastapi.testclient import TestClient
+
+        from app.core import database
+        from app.main import app
+
+        seed(database, args.stamps, args.clients)
+        with TestClient(app) as client:
+            results = [bench_grant(client, args.stamps, args.clients), *bench_matrix(client, args.stamps, args.clients)]
+        database.engine.dispose()
+    emit({'benchmark': 'permissions', 'stamps': args.stamps, 'clients': args.clients, 'results': results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
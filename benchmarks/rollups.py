@@ -0,0 +1,146 @@
+"""
+驗證日誌統計基準測試（SQLite）
+
+- raw：維運原本的做法，直接對 stamping_logs 做 GROUP BY（最近 30 天，依客戶與狀態）
+- rollup：由 id 0 開始彙總所有日誌的耗時（每秒筆數），以及新增 --increment 筆日誌後一次增量彙總的耗時
+- query：同樣的統計改由 GET /admin/analytics/usage 使用的 query_usage 讀取每日彙總表，
+  量測前先確認結果與 raw 相同
+
+    python -m benchmarks.rollups --logs 1000000 --output rollups.json
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks.common import emit, measure, use_service
+
+use_service('manager')
+
+STATUSES = ('valid', 'valid', 'valid', 'valid', 'invalid', 'error')
+
+
+def insert_logs(database, rng: random.Random, count: int, clients: int, stamps: int, days: int) -> None:
+    from sqlalchemy import insert
+
+    from app.models import StampingLog
+
+    now = datetime.now()
+    db = database.BusinessSessionLocal()
+    for start in range(0, count, 50000):
+        rows = []
+        for _ in range(min(50000, count - start)):
+            status = rng.choice(STATUSES)
+            client_id = rng.randint(1, clients)
+            rows.append({
+                'client_id': client_id,
+                # 每個客戶只使用自己的印章（印章平均分給各客戶）
+                'stamp_id': client_id + clients * rng.randrange(max(stamps // clients, 1)) if status == 'valid' else None,
+                'status': status,
+                'created_at': now - timedelta(seconds=rng.randint(0, days * 86400)),
+            })
+        db.execute(insert(StampingLog), rows)
+    db.commit()
+    db.close()
+
+
+def run_rollup(database) -> int:
+    """彙總到目前為止的所有日誌（不等待 ROLLUP_LAG_SECONDS），返回彙總的筆數"""
+    from app.core.rollups import rollup_once
+
+    db = database.BusinessSessionLocal()
+    logs = 0
+    idle = 0
+    try:
+        # 沒有可彙總的日誌時只記錄 MAX(id)，下一次才彙總到那裡；連續兩次沒有彙總即完成
+        while idle < 2:
+            result = rollup_once(db, lag_seconds=0)
+            logs += result.logs
+            idle = idle + 1 if result.logs == 0 and not result.more else 0
+        return logs
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logs', type=int, default=1000000, help='驗證日誌筆數')
+    parser.add_argument('--increment', type=int, default=10000, help='增量彙總的新日誌筆數')
+    parser.add_argument('--clients', type=int, default=50, help='客戶數量')
+    parser.add_argument('--stamps', type=int, default=500, help='印章數量')
+    parser.add_argument('--days', type=int, default=90, help='日誌分布的天數')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='另外將結果寫入此 JSON 檔案')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix='smartstamp-rollups-') as workdir:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'core.db')}"
+        os.environ['BUSINESS_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'business.db')}"
+        from sqlalchemy import func, select
+
+        from app.core import database
+        from app.core.rollups import query_usage
+        from app.models import BusinessBase, StampingLog
+
+        # stamping_logs 的索引與 init.sql 相同
+        BusinessBase.metadata.create_all(database.business_engine)
+        insert_logs(database, rng, args.logs, args.clients, args.stamps, args.days)
+
+        start = time.perf_counter()
+        rolled_up = run_rollup(database)
+        rollup_s = time.perf_counter() - start
+
+        insert_logs(database, rng, args.increment, args.clients, args.stamps, 1)
+        start = time.perf_counter()
+        incremental = run_rollup(database)
+        incremental_ms = (time.perf_counter() - start) * 1000
+
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=29)
+        until = since + timedelta(days=31)
+        db = database.BusinessSessionLocal()
+
+        def raw():
+            return db.execute(
+                select(StampingLog.client_id, StampingLog.status, func.count())
+                .where(StampingLog.created_at >= since, StampingLog.created_at < until)
+                .group_by(StampingLog.client_id, StampingLog.status)
+            ).all()
+
+        def rolled():
+            return query_usage(db, 'day', since, until, group_by=['client'])
+
+        expected = Counter({(client_id, status): count for client_id, status, count in raw()})
+        actual = Counter({
+            (row['client_id'], status): count for row in rolled()['rows'] for status, count in row['counts'].items()
+        })
+        if expected != actual:
+            raise AssertionError("彙總表的統計與直接 GROUP BY 不同")
+
+        raw_result = measure(raw, repeat=3, number=1)
+        rolled_result = measure(rolled, repeat=5)
+        db.close()
+        database.engine.dispose()
+        database.business_engine.dispose()
+
+    emit({
+        'benchmark': 'rollups',
+        'logs': args.logs,
+        'results': [
+            {'name': 'rollup', 'logs': rolled_up, 'elapsed_s': rollup_s, 'logs_per_sec': rolled_up / rollup_s},
+            {'name': 'incremental', 'logs': incremental, 'elapsed_ms': incremental_ms},
+            {
+                'name': 'query',
+                'raw_group_by_ms': raw_result['best_us'] / 1000,
+                'rollup_ms': rolled_result['best_us'] / 1000,
+                'speedup': raw_result['best_us'] / rolled_result['best_us'],
+            },
+        ]
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+SQLite 測試資料庫：以 stamp-server 的資料表結構建立 stamp_core_db / app_business_db 的替代品
+"""
+import random
+import sqlite3
+import time
+from typing import List
+
+from benchmarks.common import random_points
+
+
+class SlowConnection(sqlite3.Connection):
+    """每次執行 SQL 前等待固定時間，模擬遠端資料庫的網路往返延遲"""
+
+    latency = 0.0
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or SlowCursor)
+
+
+class SlowCursor(sqlite3.Cursor):
+    def execute(self, *args, **kwargs):
+        if SlowConnection.latency:
+            time.sleep(SlowConnection.latency)
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        if SlowConnection.latency:
+            time.sleep(SlowConnection.latency)
+        return super().executemany(*args, **kwargs)
+
+
+def api_key_for(client_id: int) -> str:
+    """測試客戶的 API Key"""
+    return f"sk_bench_{client_id:08d}"
+
+
+def seed_registry(
+    session,
+    clients: int,
+    stamps_per_client: int,
+    shared_permissions: int = 0,
+    seed: int = 42
+) -> List[List[tuple]]:
+    """
+    建立測試客戶、印章與權限（需先以 use_service 載入任一服務，兩個服務的資料表結構相同）
+
+    Args:
+        session: 核心資料庫的同步 session
+        clients: 客戶數量
+        stamps_per_client: 每個客戶自有的印章數量
+        shared_permissions: 每個客戶另外取得其他客戶印章的權限數量
+        seed: 亂數種子
+
+    Returns:
+        每個客戶自有印章的觸控點（可用來產生會驗證成功的請求）
+    """
+    from app.core.math_utils import get_normalized_fingerprint
+    from app.models import APIClient, StampPermission, StampRegistry
+    from sqlalchemy import insert
+
+    rng = random.Random(seed)
+    session.execute(insert(APIClient), [
+        {'id': c, 'name': f'bench-client-{c}', 'api_key': api_key_for(c), 'is_active': True}
+        for c in range(1, clients + 1)
+    ])
+
+    points_by_client = []
+    stamp_id = 0
+    for c in range(1, clients + 1):
+        stamps, permissions, points = [], [], []
+        for _ in range(stamps_per_client):
+            stamp_id += 1
+            stamp_points = random_points(rng)
+            points.append(stamp_points)
+            stamps.append({'id': stamp_id, 'name': f'bench-stamp-{stamp_id}', 'fingerprint': get_normalized_fingerprint(stamp_points)})
+            permissions.append({'client_id': c, 'stamp_id': stamp_id, 'is_active': True})
+        session.execute(insert(StampRegistry), stamps)
+        session.execute(insert(StampPermission), permissions)
+        points_by_client.append(points)
+
+    # 跨客戶的共用權限
+    total_stamps = stamp_id
+    if shared_permissions and clients > 1:
+        shared = []
+        for c in range(1, clients + 1):
+            first = (c - 1) * stamps_per_client + 1
+            own = set(range(first, first + stamps_per_client))
+            others = [s for s in rng.sample(range(1, total_stamps + 1), min(total_stamps, shared_permissions + stamps_per_client)) if s not in own]
+            shared.extend({'client_id': c, 'stamp_id': s, 'is_active': True} for s in others[:shared_permissions])
+        session.execute(insert(StampPermission), shared)
+
+    session.commit()
+    return points_by_client
@@ -26,6 +26,8 @@ const CONFIG = {
   STAMP_SERVER_URL: process.env.STAMP_SERVER_URL || 'http://localhost:8000/api/v1/verify',
   API_KEY: process.env.API_KEY || 'sk_your_api_key_here', // 請替換為實際的 API Key
   PUBLIC_KEY_PATH: process.env.PUBLIC_KEY_PATH || path.join(__dirname, 'keys/public_key.pem'),
+  // 需與 stamp-server 的 JWT_ALGORITHM 相同（RS256 / ES256 / EdDSA）
+  JWT_ALGORITHM: process.env.JWT_ALGORITHM || 'RS256',
   PORT: process.env.PORT || 3001
 }
 
@@ -65,7 +67,7 @@ function verifyJWT(token) {
   }
 
   try {
-    const decoded = jwt.verify(token, publicKey, { algorithms: ['RS256'] })
+    const decoded = jwt.verify(token, publicKey, { algorithms: [CONFIG.JWT_ALGORITHM] })
     return { valid: true, payload: decoded }
   } catch (error) {
     return { valid: false, error: error.message }
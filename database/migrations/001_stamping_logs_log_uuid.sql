@@ -0,0 +1,9 @@
+-- stamping_logs 新增 log_uuid
+-- 驗證伺服器在 app_business_db 無法寫入時會把日誌寫入本機暫存，恢復後以 INSERT IGNORE 重送；
+-- log_uuid 的唯一索引確保同一筆日誌只寫入一次。既有的日誌 log_uuid 為 NULL（唯一索引允許多個 NULL）。
+
+USE app_business_db;
+
+ALTER TABLE stamping_logs
+    ADD COLUMN log_uuid CHAR(32) NULL COMMENT '日誌唯一識別碼（重送本機暫存時避免重複寫入）' AFTER id,
+    ADD UNIQUE KEY uk_log_uuid (log_uuid);
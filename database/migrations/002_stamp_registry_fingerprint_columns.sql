@@ -0,0 +1,21 @@
+-- stamp_registry 新增 fp_0 ~ fp_4 與 idx_fingerprint 複合索引
+-- 管理後台校正印章時以方框查詢找出驗證容差內的既有印章（碰撞偵測），不需讀取整張表。
+-- 既有印章由 fingerprint 補上各個值；管理後台啟動時也會補上 fp_0 為 NULL 的印章。
+
+USE stamp_core_db;
+
+ALTER TABLE stamp_registry
+    ADD COLUMN fp_0 DOUBLE NULL COMMENT '指紋第 1 個值（碰撞偵測用，與 fingerprint 相同）' AFTER fingerprint,
+    ADD COLUMN fp_1 DOUBLE NULL COMMENT '指紋第 2 個值' AFTER fp_0,
+    ADD COLUMN fp_2 DOUBLE NULL COMMENT '指紋第 3 個值' AFTER fp_1,
+    ADD COLUMN fp_3 DOUBLE NULL COMMENT '指紋第 4 個值' AFTER fp_2,
+    ADD COLUMN fp_4 DOUBLE NULL COMMENT '指紋第 5 個值' AFTER fp_3,
+    ADD INDEX idx_fingerprint (fp_0, fp_1, fp_2, fp_3);
+
+UPDATE stamp_registry
+SET fp_0 = JSON_EXTRACT(fingerprint, '$[0]'),
+    fp_1 = JSON_EXTRACT(fingerprint, '$[1]'),
+    fp_2 = JSON_EXTRACT(fingerprint, '$[2]'),
+    fp_3 = JSON_EXTRACT(fingerprint, '$[3]'),
+    fp_4 = JSON_EXTRACT(fingerprint, '$[4]')
+WHERE fp_0 IS NULL AND JSON_LENGTH(fingerprint) = 5;
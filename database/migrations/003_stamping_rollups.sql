@@ -0,0 +1,46 @@
+-- 驗證日誌統計彙總表
+-- 管理後台依 stamping_logs.id 遞增把新的日誌彙總到每小時／每日彙總表，分析端點只讀取彙總表，
+-- 不再對 stamping_logs 做 GROUP BY。既有的日誌在管理後台啟動後由背景任務自 id 0 開始逐批彙總。
+
+USE app_business_db;
+
+-- 驗證日誌每小時彙總（管理後台依 id 遞增彙總 stamping_logs，分析端點只讀取彙總表）
+CREATE TABLE IF NOT EXISTS stamping_rollup_hourly (
+    bucket DATETIME NOT NULL COMMENT '小時（整點）',
+    client_id INT NOT NULL COMMENT '客戶 ID',
+    stamp_id INT NOT NULL COMMENT '印章 ID（0 表示驗證失敗、沒有對應印章）',
+    status VARCHAR(50) NOT NULL COMMENT '狀態：valid, invalid, error',
+    count BIGINT NOT NULL DEFAULT 0 COMMENT '日誌筆數',
+    PRIMARY KEY (bucket, client_id, stamp_id, status),
+    INDEX idx_hourly_client_bucket (client_id, bucket),
+    INDEX idx_hourly_stamp_bucket (stamp_id, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='驗證日誌每小時彙總';
+
+-- 驗證日誌每日彙總
+CREATE TABLE IF NOT EXISTS stamping_rollup_daily (
+    bucket DATE NOT NULL COMMENT '日期',
+    client_id INT NOT NULL COMMENT '客戶 ID',
+    stamp_id INT NOT NULL COMMENT '印章 ID（0 表示驗證失敗、沒有對應印章）',
+    status VARCHAR(50) NOT NULL COMMENT '狀態：valid, invalid, error',
+    count BIGINT NOT NULL DEFAULT 0 COMMENT '日誌筆數',
+    PRIMARY KEY (bucket, client_id, stamp_id, status),
+    INDEX idx_daily_client_bucket (client_id, bucket),
+    INDEX idx_daily_stamp_bucket (stamp_id, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='驗證日誌每日彙總';
+
+-- 彙總進度（高水位）
+CREATE TABLE IF NOT EXISTS stamping_rollup_state (
+    name VARCHAR(64) NOT NULL PRIMARY KEY COMMENT '彙總名稱',
+    last_log_id BIGINT NOT NULL DEFAULT 0 COMMENT '已彙總到的 stamping_logs.id',
+    observed_max_id BIGINT NOT NULL DEFAULT 0 COMMENT '上次記錄的 MAX(id)，經過 ROLLUP_LAG_SECONDS 後才彙總到這裡',
+    observed_at DATETIME NULL COMMENT '記錄 observed_max_id 的時間',
+    updated_at DATETIME NULL COMMENT '上次彙總的時間'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='驗證日誌彙總進度';
+
+-- 授予 admin_dashboard 讀取驗證日誌與維護彙總表的權限（驗證統計）
+GRANT SELECT ON app_business_db.stamping_logs TO 'admin_dashboard'@'%';
+GRANT ALL PRIVILEGES ON app_business_db.stamping_rollup_hourly TO 'admin_dashboard'@'%';
+GRANT ALL PRIVILEGES ON app_business_db.stamping_rollup_daily TO 'admin_dashboard'@'%';
+GRANT ALL PRIVILEGES ON app_business_db.stamping_rollup_state TO 'admin_dashboard'@'%';
+
+FLUSH PRIVILEGES;
@@ -0,0 +1,24 @@
+-- stamping_logs 改為依 created_at 每月分割
+-- 過期的日誌由管理後台的封存工具（python -m app.core.log_archive archive）寫成 gzip 壓縮的 NDJSON 後以
+-- DROP PARTITION 刪除，不再以 DELETE 逐列刪除。
+-- MySQL 要求分割表的每個唯一鍵（含主鍵）都包含分割欄位，因此主鍵改為 (id, created_at)、
+-- uk_log_uuid 改為 (log_uuid, created_at)。驗證伺服器重送暫存時保留原本的 created_at，仍可去除重複。
+--
+-- 既有的日誌較多時，先以 python -m app.core.log_archive partition-sql 產生自最早月份起的分割定義，
+-- 取代下方的 PARTITION BY；之後每月以 python -m app.core.log_archive ensure 由 pmax 切出新的月份。
+-- 轉換會複製整張資料表，請在離峰時段執行。
+
+USE app_business_db;
+
+ALTER TABLE stamping_logs
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at),
+    DROP INDEX uk_log_uuid,
+    ADD UNIQUE KEY uk_log_uuid (log_uuid, created_at);
+
+ALTER TABLE stamping_logs PARTITION BY RANGE COLUMNS(created_at) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- 封存工具需要 SELECT、INSERT（還原）、ALTER（REORGANIZE PARTITION）與 DROP（DROP PARTITION）權限，
+-- 請另以具有這些權限的帳號設定 LOG_ARCHIVE_DATABASE_URL，不要授予 admin_dashboard。
@@ -0,0 +1,292 @@
+"""
+批次印章校正：上傳 NDJSON 或 CSV 的 {name, points, description} 紀錄，一次建立大量印章
+
+上傳內容先寫入磁碟上的暫存檔，再依 BULK_CHUNK_SIZE 分批處理：
+每批以批次 API 計算指紋、檢查碰撞，並以多列 INSERT 寫入印章與 registry_changes 後 commit。
+每列的結果寫入另一個暫存檔，處理完畢後以 NDJSON 串流返回，記憶體用量與上傳大小無關。
+"""
+import csv
+import io
+import json
+import math
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from app.core import changes
+from app.core.collisions import find_all_collisions, find_collisions, fingerprint_columns
+from app.core.database import SessionLocal
+from app.models import StampRegistry
+from app.schemas import BulkCalibrateRecord
+from smart_stamp_fingerprint.batch import get_normalized_fingerprints
+
+# 批次校正配置（可配置）
+# 每個交易處理的紀錄數量
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+# 上傳內容的大小上限（位元組）
+BULK_MAX_UPLOAD_BYTES = int(os.getenv('BULK_MAX_UPLOAD_BYTES', str(256 * 1024 * 1024)))
+
+UPLOAD_FORMATS = ('ndjson', 'csv')
+
+STATUS_CREATED = 'created'
+STATUS_INVALID = 'invalid'
+STATUS_COLLISION = 'collision'
+STATUS_ERROR = 'error'
+
+
+class UploadTooLarge(Exception):
+    """上傳內容超過 BULK_MAX_UPLOAD_BYTES"""
+
+
+@dataclass
+class BulkSummary:
+    """批次校正統計"""
+    total: int = 0
+    created: int = 0
+    invalid: int = 0
+    collisions: int = 0
+    errors: int = 0
+
+    def count(self, status: str) -> None:
+        self.total += 1
+        if status == STATUS_CREATED:
+            self.created += 1
+        elif status == STATUS_INVALID:
+            self.invalid += 1
+        elif status == STATUS_COLLISION:
+            self.collisions += 1
+        else:
+            self.errors += 1
+
+
+@dataclass
+class PendingRow:
+    """一筆上傳的紀錄（格式錯誤時 record 為 None，error 為錯誤訊息）"""
+    line: int
+    name: Optional[str]
+    record: Optional[BulkCalibrateRecord] = None
+    error: Optional[str] = None
+    collisions: List[int] = field(default_factory=list)
+    mates: List[int] = field(default_factory=list)
+
+
+async def spool_upload(stream, max_bytes: int = BULK_MAX_UPLOAD_BYTES) -> IO[bytes]:
+    """
+    將上傳內容寫入暫存檔
+
+    Raises:
+        UploadTooLarge: 超過大小上限
+    """
+    spool = tempfile.TemporaryFile()
+    size = 0
+    try:
+        async for chunk in stream:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge()
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iter_records(upload: IO[bytes], upload_format: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    逐筆讀取上傳的紀錄
+
+    Returns:
+        (行號, 紀錄, 錯誤訊息) 的迭代器；格式錯誤時紀錄為 None
+    """
+    text = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    if upload_format == 'ndjson':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f"不是有效的 JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "每一行必須是 JSON 物件"
+                continue
+            yield line_number, record, None
+        return
+
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None or not {'name', 'points'} <= set(reader.fieldnames):
+        yield 1, None, "CSV 第一列必須是欄位名稱，且包含 name 與 points"
+        return
+    for row in reader:
+        # 第一列為欄位名稱，line_num 為此筆紀錄最後一行的行號
+        line_number = reader.line_num
+        try:
+            points = json.loads(row.get('points') or '')
+        except json.JSONDecodeError:
+            yield line_number, None, "points 必須是 JSON 陣列，例如 [[x1, y1], ..., [x5, y5]]"
+            continue
+        yield line_number, {'name': row.get('name'), 'points': points, 'description': row.get('description') or None}, None
+
+
+def validate_record(record: dict) -> Tuple[Optional[BulkCalibrateRecord], Optional[str]]:
+    """檢查紀錄格式，返回 (紀錄, 錯誤訊息)"""
+    try:
+        parsed = BulkCalibrateRecord.model_validate(record)
+    except ValidationError as e:
+        error = e.errors()[0]
+        location = '.'.join(str(part) for part in error['loc'])
+        return None, f"{location}: {error['msg']}"
+    if not all(math.isfinite(value) for point in parsed.points for value in point):
+        return None, "座標必須是有限的數值"
+    return parsed, None
+
+
+def insert_stamps(db, rows: List[dict]) -> List[int]:
+    """
+    以多列 INSERT 寫入印章，依輸入順序返回印章 ID
+
+    支援 INSERT ... RETURNING 的資料庫（MariaDB 10.5+、SQLite）以單一敘述寫入整批；
+    MySQL 不支援時逐列 INSERT 以取得自動編號（仍在同一個交易中）。
+    """
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        statement = insert(StampRegistry).returning(StampRegistry.id, sort_by_parameter_order=True)
+        return list(db.scalars(statement, rows))
+    return [db.execute(insert(StampRegistry).values(**row)).inserted_primary_key[0] for row in rows]
+
+
+class BulkCalibrator:
+    """依序處理上傳的紀錄並寫入結果報告"""
+
+    def __init__(self, db, report: IO[bytes], force: bool = False, chunk_size: int = BULK_CHUNK_SIZE):
+        """
+        初始化
+
+        Args:
+            db: 資料庫 session（每批 commit 一次）
+            report: 寫入每列結果（NDJSON）的檔案
+            force: 指紋與既有印章或同一次上傳的其他紀錄無法區分時仍然建立
+            chunk_size: 每個交易處理的紀錄數量
+        """
+        self.db = db
+        self.report = report
+        self.force = force
+        self.chunk_size = chunk_size
+        self.summary = BulkSummary()
+
+    def write(self, line: int, name: Optional[str], status: str, message: str,
+              stamp_id: Optional[int] = None, collisions: Optional[List[int]] = None) -> None:
+        self.summary.count(status)
+        self.report.write((json.dumps({
+            'line': line,
+            'name': name,
+            'status': status,
+            'stamp_id': stamp_id,
+            'collisions': collisions or [],
+            'message': message,
+        }, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def run(self, records: Iterator[Tuple[int, Optional[dict], Optional[str]]]) -> BulkSummary:
+        """處理所有紀錄，返回統計"""
+        pending: List[PendingRow] = []
+        for line, record, error in records:
+            name = record.get('name') if isinstance(record, dict) else None
+            row = PendingRow(line, name if isinstance(name, str) else None)
+            if record is not None:
+                row.record, error = validate_record(record)
+            row.error = error
+            pending.append(row)
+            if len(pending) >= self.chunk_size:
+                self.process_chunk(pending)
+                pending = []
+        if pending:
+            self.process_chunk(pending)
+        return self.summary
+
+    def process_chunk(self, chunk: List[PendingRow]) -> None:
+        """計算指紋、檢查碰撞並在單一交易中寫入一批紀錄，再依上傳順序寫入結果"""
+        rows = [row for row in chunk if row.record is not None]
+        stamp_ids: List[int] = []
+        accepted: Dict[int, int] = {}
+        failure: Optional[str] = None
+        if rows:
+            fingerprints = get_normalized_fingerprints([row.record.points for row in rows])
+            try:
+                # 與既有印章（含先前已 commit 的批次）的碰撞以索引查詢
+                for row, fingerprint in zip(rows, fingerprints.tolist()):
+                    row.collisions = [collision.stamp_id for collision in find_collisions(self.db, fingerprint)]
+                # 同一批紀錄之間的碰撞：只計入排在前面且會建立的紀錄
+                for pair in find_all_collisions(np.arange(len(rows), dtype=np.int64), fingerprints):
+                    rows[pair.other_stamp_id].mates.append(pair.stamp_id)
+                for position, row in enumerate(rows):
+                    row.mates = [mate for mate in row.mates if mate in accepted]
+                    if self.force or not (row.collisions or row.mates):
+                        accepted[position] = len(accepted)
+
+                created = list(accepted)
+                if created:
+                    stamp_ids = insert_stamps(self.db, [
+                        {
+                            'name': rows[position].record.name,
+                            'description': rows[position].record.description,
+                            'fingerprint': fingerprints[position].tolist(),
+                            **fingerprint_columns(fingerprints[position]),
+                        }
+                        for position in created
+                    ])
+                    changes.record_changes(self.db, [
+                        {'kind': changes.STAMP_CREATED, 'stamp_id': stamp_id, 'fingerprint': fingerprints[position].tolist()}
+                        for position, stamp_id in zip(created, stamp_ids)
+                    ])
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                failure = f"寫入失敗: {str(e)}"
+
+        position = -1
+        for row in chunk:
+            if row.record is None:
+                self.write(row.line, row.name, STATUS_INVALID, row.error)
+                continue
+            position += 1
+            if failure is not None:
+                self.write(row.line, row.name, STATUS_ERROR, failure)
+                continue
+            collisions = row.collisions + [stamp_ids[accepted[mate]] for mate in row.mates]
+            if position in accepted:
+                self.write(row.line, row.name, STATUS_CREATED, "印章校正成功", stamp_ids[accepted[position]], collisions)
+            else:
+                self.write(
+                    row.line, row.name, STATUS_COLLISION,
+                    "指紋與既有印章（或同一次上傳中排在前面的紀錄）無法區分，驗證時可能被判定為其他印章",
+                    collisions=collisions
+                )
+
+
+def run_bulk_calibration(upload: IO[bytes], upload_format: str, report: IO[bytes], force: bool = False) -> BulkSummary:
+    """以獨立的 session 處理整份上傳（在執行緒池中執行），結果寫入 report"""
+    db = SessionLocal()
+    try:
+        return BulkCalibrator(db, report, force=force).run(iter_records(upload, upload_format))
+    finally:
+        db.close()
+
+
+def iter_report(report: IO[bytes], summary: BulkSummary, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """串流返回結果報告，最後一行為統計；讀取完畢後關閉暫存檔"""
+    try:
+        report.seek(0)
+        while True:
+            chunk = report.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield (json.dumps({'summary': summary.__dict__}) + '\n').encode('utf-8')
+    finally:
+        report.close()
@@ -0,0 +1,68 @@
+"""
+註冊表變更紀錄模組：在與資料變更相同的交易中寫入 registry_changes
+驗證伺服器依 id 遞增讀取這張表，只把變更的部分套用到記憶體中的快取
+"""
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from app.models import RegistryChange
+
+# 變更類型（與 stamp-server/app/core/change_feed.py 相同）
+STAMP_CREATED = 'stamp_created'
+STAMP_DELETED = 'stamp_deleted'
+CLIENT_CREATED = 'client_created'
+CLIENT_UPDATED = 'client_updated'
+PERMISSION_GRANTED = 'permission_granted'
+PERMISSION_REVOKED = 'permission_revoked'
+
+# 變更紀錄保留天數（驗證伺服器只需要最近的紀錄），0 表示不清理
+REGISTRY_CHANGES_RETENTION_DAYS = int(os.getenv('REGISTRY_CHANGES_RETENTION_DAYS', '7'))
+
+
+def record_change(
+    db,
+    kind: str,
+    client_id: Optional[int] = None,
+    stamp_id: Optional[int] = None,
+    fingerprint: Optional[List[float]] = None
+) -> None:
+    """
+    加入一筆變更紀錄（由呼叫端與資料變更一起 commit，兩者同時成功或同時失敗）
+
+    Args:
+        db: 資料庫 session
+        kind: 變更類型
+        client_id: 相關客戶 ID
+        stamp_id: 相關印章 ID
+        fingerprint: 印章指紋（新增印章或授予權限時附上）
+    """
+    db.add(RegistryChange(
+        kind=kind,
+        client_id=client_id,
+        stamp_id=stamp_id,
+        fingerprint=fingerprint
+    ))
+
+
+def record_changes(db, entries: List[dict]) -> None:
+    """
+    以單一多列 INSERT 加入多筆變更紀錄（批次操作使用，同樣由呼叫端 commit）
+
+    Args:
+        db: 資料庫 session
+        entries: 每筆為 record_change 的參數（kind、client_id、stamp_id、fingerprint）
+    """
+    db.execute(insert(RegistryChange), entries)
+
+
+def prune_changes(db, retention_days: int = REGISTRY_CHANGES_RETENTION_DAYS) -> int:
+    """刪除超過保留天數的變更紀錄，返回刪除筆數"""
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    deleted = db.query(RegistryChange).filter(RegistryChange.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
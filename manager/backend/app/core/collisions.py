@@ -0,0 +1,204 @@
+"""
+印章碰撞偵測：找出指紋落在驗證容差內、驗證伺服器無法區分的印章
+
+驗證伺服器在最大誤差容差（L∞ 方框）內選出 MSE 最小的印章，兩枚印章的指紋若同時滿足
+最大誤差與 MSE 容差，對其中一枚蓋印時可能被判定為另一枚。
+
+- 校正時：以 stamp_registry 的 fp_0..fp_4 欄位與 idx_fingerprint 複合索引做方框查詢，
+  只讀取方框內的候選印章，再以與驗證伺服器相同的方式計算誤差
+- 全註冊表報告：依 fp_0、fp_1 的格子分塊，每格只與相鄰格子的印章以向量化方式比對
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import and_
+
+from app.models import StampRegistry
+from smart_stamp_fingerprint import FINGERPRINT_SIZE, calculate_max_error, calculate_mse
+
+# 驗證容差（與 stamp-server 的同名環境變數相同，兩邊應設定一致）
+VERIFICATION_TOLERANCE_MSE = float(os.getenv('VERIFICATION_TOLERANCE_MSE', '0.0001'))
+VERIFICATION_TOLERANCE_MAX = float(os.getenv('VERIFICATION_TOLERANCE_MAX', '0.01'))
+
+# 碰撞報告配置（可配置）
+# 每次向量化比對的印章組合上限（控制暫存陣列的記憶體用量）
+COLLISION_CHUNK_PAIRS = int(os.getenv('COLLISION_CHUNK_PAIRS', '262144'))
+
+# 向量化 MSE 與 calculate_mse 的相對誤差遠小於此值（只用來放寬篩選，最後仍以 calculate_mse 判斷）
+MSE_RECHECK_RELATIVE = 1e-12
+
+# 方框查詢略為放寬，避免邊界上的捨入誤差漏掉候選（之後仍以精確誤差判斷）
+BOX_MARGIN = 1e-9
+
+FINGERPRINT_COLUMNS = [getattr(StampRegistry, f'fp_{i}') for i in range(FINGERPRINT_SIZE)]
+
+
+@dataclass
+class Collision:
+    """一組無法區分的印章"""
+    stamp_id: int
+    other_stamp_id: Optional[int]
+    mse: float
+    max_error: float
+
+
+def fingerprint_columns(fingerprint: Sequence[float]) -> dict:
+    """指紋對應的 fp_0..fp_4 欄位值（建立印章時與 fingerprint 一起寫入）"""
+    return {f'fp_{i}': float(value) for i, value in enumerate(fingerprint)}
+
+
+def is_collision(mse: float, max_error: float) -> bool:
+    """與驗證伺服器的判定相同：最大誤差與 MSE 都在容差內"""
+    return max_error < VERIFICATION_TOLERANCE_MAX and mse < VERIFICATION_TOLERANCE_MSE
+
+
+def find_collisions(db, fingerprint: Sequence[float], exclude_stamp_id: Optional[int] = None) -> List[Collision]:
+    """
+    找出與指定指紋無法區分的既有印章（依 MSE 由小到大排序）
+
+    Args:
+        db: 資料庫 session
+        fingerprint: 待檢查的指紋
+        exclude_stamp_id: 排除的印章 ID（檢查既有印章時排除自己）
+
+    Returns:
+        碰撞列表，stamp_id 為既有印章，other_stamp_id 為 exclude_stamp_id（新指紋時為 None）
+    """
+    radius = VERIFICATION_TOLERANCE_MAX + BOX_MARGIN
+    box = and_(*(
+        column.between(value - radius, value + radius)
+        for column, value in zip(FINGERPRINT_COLUMNS, fingerprint)
+    ))
+    query = db.query(StampRegistry.id, *FINGERPRINT_COLUMNS).filter(box)
+    if exclude_stamp_id is not None:
+        query = query.filter(StampRegistry.id != exclude_stamp_id)
+
+    collisions = []
+    for stamp_id, *candidate in query:
+        mse = calculate_mse(candidate, fingerprint)
+        max_error = calculate_max_error(candidate, fingerprint)
+        if is_collision(mse, max_error):
+            collisions.append(Collision(stamp_id, exclude_stamp_id, mse, max_error))
+    collisions.sort(key=lambda collision: (collision.mse, collision.stamp_id))
+    return collisions
+
+
+def find_all_collisions(stamp_ids: np.ndarray, fingerprints: np.ndarray) -> List[Collision]:
+    """
+    找出註冊表中所有無法區分的印章組合
+
+    以 fp_0、fp_1 切成寬度為容差的格子並依格子排序，最大誤差在容差內的兩枚印章在這兩個維度上
+    必定位於相同或相鄰的格子。每個格子只與排在後面的相鄰格子（同一列與下一列各三格，
+    排序後各為一段連續範圍）以向量化方式比對，每組合只比對一次。
+
+    Args:
+        stamp_ids: (N,) 印章 ID
+        fingerprints: (N, 5) 指紋陣列
+
+    Returns:
+        碰撞列表（stamp_id < other_stamp_id），依 MSE 由小到大排序
+    """
+    n = len(stamp_ids)
+    if n < 2:
+        return []
+
+    # 格子座標加 1，讓相鄰格子的座標不小於 0；width 大於 fp_1 的最大格子座標加 1，同一列的鍵連續
+    cells = np.floor(fingerprints[:, :2] / VERIFICATION_TOLERANCE_MAX).astype(np.int64) + 1
+    width = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * width + cells[:, 1]
+    order = np.lexsort((stamp_ids, keys))
+    stamp_ids = stamp_ids[order]
+    fingerprints = np.ascontiguousarray(fingerprints[order])
+    keys = keys[order]
+
+    cell_keys, cell_starts = np.unique(keys, return_index=True)
+    cell_stops = np.append(cell_starts[1:], n)
+    # 同一列（fp_0 相同格子）與下一列中 fp_1 相鄰的三格
+    same_lo = np.searchsorted(keys, cell_keys - 1, side='left')
+    same_hi = np.searchsorted(keys, cell_keys + 1, side='right')
+    next_lo = np.searchsorted(keys, cell_keys + width - 1, side='left')
+    next_hi = np.searchsorted(keys, cell_keys + width + 1, side='right')
+
+    found_a, found_b, found_mse, found_max = [], [], [], []
+    for start, stop, lo, hi, lo2, hi2 in zip(cell_starts, cell_stops, same_lo, same_hi, next_lo, next_hi):
+        # 同一列中排在這一格之前的印章不需比對（該組合由前面的格子處理）
+        cols = np.r_[max(lo, start + 1):hi, lo2:hi2]
+        if len(cols) == 0:
+            continue
+        step = max(1, COLLISION_CHUNK_PAIRS // len(cols))
+        for row_start in range(start, stop, step):
+            row_stop = min(row_start + step, stop)
+            diff = fingerprints[row_start:row_stop, None, :] - fingerprints[None, cols, :]
+            max_error = np.abs(diff).max(axis=-1)
+            # 只保留排在後面的印章（每組合比對一次）
+            later = np.arange(row_start, row_stop)[:, None] < cols[None, :]
+            row, col = np.nonzero(later & (max_error < VERIFICATION_TOLERANCE_MAX))
+            if len(row) == 0:
+                continue
+            # MSE 只為最大誤差在容差內的組合計算；向量化的 d * d 與 calculate_mse 可能差幾個 ULP，
+            # 先以放寬的容差篩選，留下的組合再以 calculate_mse 重算後判斷
+            pair_diff = diff[row, col]
+            squared = pair_diff * pair_diff
+            total = squared[:, 0] + squared[:, 1]
+            for i in range(2, FINGERPRINT_SIZE):
+                total += squared[:, i]
+            near = total / FINGERPRINT_SIZE < VERIFICATION_TOLERANCE_MSE * (1 + MSE_RECHECK_RELATIVE)
+            rows_a = row_start + row[near]
+            rows_b = cols[col[near]]
+            mse = np.array([
+                calculate_mse(fingerprints[a].tolist(), fingerprints[b].tolist()) for a, b in zip(rows_a, rows_b)
+            ], dtype=np.float64)
+            keep = mse < VERIFICATION_TOLERANCE_MSE
+            found_a.append(rows_a[keep])
+            found_b.append(rows_b[keep])
+            found_mse.append(mse[keep])
+            found_max.append(max_error[row[near][keep], col[near][keep]])
+
+    if not found_a:
+        return []
+    ids_a = stamp_ids[np.concatenate(found_a)]
+    ids_b = stamp_ids[np.concatenate(found_b)]
+    mses = np.concatenate(found_mse)
+    max_errors = np.concatenate(found_max)
+    collisions = [
+        Collision(int(min(a, b)), int(max(a, b)), float(mse), float(max_error))
+        for a, b, mse, max_error in zip(ids_a, ids_b, mses, max_errors)
+    ]
+    collisions.sort(key=lambda collision: (collision.mse, collision.stamp_id, collision.other_stamp_id))
+    return collisions
+
+
+def load_fingerprint_matrix(db):
+    """讀取所有印章的 ID 與 fp_0..fp_4 欄位，返回 ((N,) 印章 ID, (N, 5) 指紋陣列)"""
+    rows = db.query(StampRegistry.id, *FINGERPRINT_COLUMNS).filter(StampRegistry.fp_0.isnot(None)).all()
+    stamp_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    fingerprints = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), FINGERPRINT_SIZE)
+    return stamp_ids, fingerprints
+
+
+def backfill_fingerprint_columns(db, batch_size: int = 1000) -> int:
+    """
+    為 fp_0 為 NULL 的印章（升級前建立或由其他工具寫入）補上 fp_0..fp_4，返回補上的筆數
+
+    MySQL/MariaDB 可改用 migrations/002_stamp_registry_fingerprint_columns.sql 一次完成。
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        stamps = db.query(StampRegistry).filter(
+            StampRegistry.fp_0.is_(None),
+            StampRegistry.id > last_id
+        ).order_by(StampRegistry.id).limit(batch_size).all()
+        if not stamps:
+            return updated
+        for stamp in stamps:
+            if len(stamp.fingerprint) != FINGERPRINT_SIZE:
+                print(f"警告：印章 {stamp.id} 的指紋長度不是 {FINGERPRINT_SIZE}，無法補上 fp_0..fp_4")
+                continue
+            for name, value in fingerprint_columns(stamp.fingerprint).items():
+                setattr(stamp, name, value)
+            updated += 1
+        db.commit()
+        last_id = stamps[-1].id
@@ -0,0 +1,178 @@
+"""
+列表分頁與串流匯出
+
+- 分頁：以 id 為鍵的 keyset pagination（WHERE id > 游標 ORDER BY id LIMIT n），每一頁的成本與頁數無關；
+  還有下一頁時於 X-Next-Cursor 回應標頭返回游標
+- 匯出：以伺服器端游標（stream_results）依 EXPORT_CHUNK_SIZE 分批讀取並輸出 NDJSON 或 CSV，
+  記憶體用量與總筆數無關
+"""
+import base64
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# 分頁與匯出配置（可配置）
+# 每頁預設筆數與上限
+PAGE_DEFAULT_LIMIT = int(os.getenv('PAGE_DEFAULT_LIMIT', '100'))
+PAGE_MAX_LIMIT = int(os.getenv('PAGE_MAX_LIMIT', '1000'))
+# 匯出時每次自資料庫讀取的筆數
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def encode_cursor(last_id: int) -> str:
+    """將本頁最後一筆的 id 編碼為游標"""
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    解碼游標，返回上一頁最後一筆的 id
+
+    Raises:
+        HTTPException: 游標格式不正確（400）
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        last_id = data['id']
+        if type(last_id) is not int:
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="cursor 格式不正確")
+    return last_id
+
+
+def check_limit(limit: int) -> int:
+    """檢查每頁筆數"""
+    if limit < 1 or limit > PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit 必須介於 1 到 {PAGE_MAX_LIMIT}")
+    return limit
+
+
+def keyset_page(query, id_column, cursor: Optional[str], limit: int, response, skip: int = 0) -> list:
+    """
+    取得一頁資料，還有下一頁時設定 X-Next-Cursor 回應標頭
+
+    Args:
+        query: 已套用過濾條件的查詢
+        id_column: 排序與游標使用的 id 欄位
+        cursor: 上一頁返回的游標，None 表示第一頁
+        limit: 每頁筆數
+        response: FastAPI Response（設定回應標頭）
+        skip: 舊版的 offset 分頁，只在沒有 cursor 時使用
+
+    Returns:
+        本頁的資料列
+    """
+    check_limit(limit)
+    if cursor:
+        query = query.filter(id_column > decode_cursor(cursor)).order_by(id_column)
+    else:
+        query = query.order_by(id_column).offset(max(skip, 0))
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    return rows
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def iter_ndjson(columns: Sequence[str], chunks: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """每列一個 JSON 物件"""
+    for rows in chunks:
+        yield ''.join(
+            json.dumps({name: _json_value(value) for name, value in zip(columns, row)}, ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+def iter_csv(columns: Sequence[str], chunks: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    """第一列為欄位名稱（以 UTF-8 BOM 開頭，讓試算表軟體正確辨識編碼）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_rows(session_factory: Callable, statement, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[Tuple]]:
+    """
+    以伺服器端游標分批讀取查詢結果
+
+    使用自己的 session（串流在請求的依賴項結束之後才進行），讀取完畢或中斷時關閉。
+    """
+    db = session_factory()
+    try:
+        result = db.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+        for rows in result.partitions():
+            yield [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+def export_rows(session_factory: Callable, statement, export_format: str) -> Iterator[bytes]:
+    """
+    將查詢結果編碼為 NDJSON 或 CSV（逐批產生）
+
+    Args:
+        session_factory: 資料庫 Session 工廠
+        statement: select() 查詢（欄位名稱即匯出的欄位）
+        export_format: ndjson 或 csv
+
+    Raises:
+        HTTPException: 不支援的匯出格式（400）
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支援的匯出格式：{export_format}（可用：{', '.join(EXPORT_FORMATS)}）")
+    columns = [column.name for column in statement.selected_columns]
+    chunks = stream_rows(session_factory, statement)
+    return iter_ndjson(columns, chunks) if export_format == 'ndjson' else iter_csv(columns, chunks)
+
+
+def export_response(session_factory: Callable, statement, export_format: str, filename: str) -> StreamingResponse:
+    """
+    以串流回應匯出查詢結果（同步產生器由 Starlette 在執行緒池中逐批讀取，不佔用事件迴圈）
+
+    Args:
+        session_factory: 資料庫 Session 工廠
+        statement: select() 查詢（欄位名稱即匯出的欄位）
+        export_format: ndjson 或 csv
+        filename: 下載檔名（不含副檔名）
+    """
+    body = export_rows(session_factory, statement, export_format)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'}
+    )
@@ -0,0 +1,226 @@
+"""
+批次權限管理與權限矩陣
+
+- 批次授予／撤銷：每 PERMISSION_BULK_CHUNK_SIZE 組 (client_id, stamp_id) 以一次查詢取得目前啟用的組合，
+  授予以 uk_client_stamp 唯一鍵做多列 upsert（MySQL：ON DUPLICATE KEY UPDATE；SQLite：ON CONFLICT），
+  撤銷以單一 UPDATE 完成，並只為狀態實際改變的組合寫入 registry_changes；整個請求在同一個交易中 commit
+- 權限矩陣：以一次排序查詢讀取所有啟用的權限，依客戶輸出印章 ID 的連續區段（runs）或位元集合（bitset）
+"""
+import base64
+import os
+from itertools import chain
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_, update
+
+from app.core import changes
+from app.models import APIClient, StampPermission, StampRegistry
+
+# 批次權限配置（可配置）
+# 每次查詢與寫入的組合數量
+PERMISSION_BULK_CHUNK_SIZE = int(os.getenv('PERMISSION_BULK_CHUNK_SIZE', '1000'))
+# 單一請求的組合數量上限
+PERMISSION_BULK_MAX_PAIRS = int(os.getenv('PERMISSION_BULK_MAX_PAIRS', '100000'))
+
+MATRIX_ENCODINGS = ('runs', 'bitset')
+
+Pair = Tuple[int, int]
+
+
+@dataclass
+class BulkPermissionResult:
+    """批次權限統計"""
+    granted: int = 0
+    already_granted: int = 0
+    revoked: int = 0
+    not_granted: int = 0
+
+
+def _chunks(pairs: Sequence[Pair], size: int) -> Iterable[Sequence[Pair]]:
+    for start in range(0, len(pairs), size):
+        yield pairs[start:start + size]
+
+
+def _missing_ids(db, column, ids: Set[int]) -> List[int]:
+    found = set()
+    id_list = sorted(ids)
+    for start in range(0, len(id_list), PERMISSION_BULK_CHUNK_SIZE):
+        found.update(db.scalars(select(column).where(column.in_(id_list[start:start + PERMISSION_BULK_CHUNK_SIZE]))))
+    return sorted(ids - found)
+
+
+def _active_pairs(db, pairs: Sequence[Pair]) -> Set[Pair]:
+    """這批組合中目前啟用的組合"""
+    rows = db.execute(
+        select(StampPermission.client_id, StampPermission.stamp_id).where(
+            tuple_(StampPermission.client_id, StampPermission.stamp_id).in_(pairs),
+            StampPermission.is_active == True
+        )
+    )
+    return {(client_id, stamp_id) for client_id, stamp_id in rows}
+
+
+def _upsert_statement(dialect_name: str):
+    """以 uk_client_stamp 唯一鍵做 upsert：不存在時建立，已存在（已撤銷）時重新啟用"""
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        statement = sqlite_insert(StampPermission)
+        return statement.on_conflict_do_update(
+            index_elements=[StampPermission.client_id, StampPermission.stamp_id],
+            set_={'is_active': True}
+        )
+    from sqlalchemy.dialects.mysql import insert as mysql_insert
+    return mysql_insert(StampPermission).on_duplicate_key_update(is_active=True)
+
+
+def check_pairs(grant: Sequence[Pair], revoke: Sequence[Pair]) -> Tuple[List[Pair], List[Pair]]:
+    """
+    去除重複的組合並檢查數量
+
+    Raises:
+        HTTPException: 組合過多或同一組合同時出現在授予與撤銷（400）
+    """
+    grant = list(dict.fromkeys(grant))
+    revoke = list(dict.fromkeys(revoke))
+    if len(grant) + len(revoke) > PERMISSION_BULK_MAX_PAIRS:
+        raise HTTPException(status_code=400, detail=f"單一請求最多 {PERMISSION_BULK_MAX_PAIRS} 組權限")
+    both = set(grant) & set(revoke)
+    if both:
+        client_id, stamp_id = min(both)
+        raise HTTPException(
+            status_code=400,
+            detail=f"同一組權限不能同時授予與撤銷（client_id={client_id}, stamp_id={stamp_id}）"
+        )
+    return grant, revoke
+
+
+def bulk_update_permissions(db, grant: Sequence[Pair], revoke: Sequence[Pair]) -> BulkPermissionResult:
+    """
+    批次授予與撤銷權限（由呼叫端 commit）
+
+    Args:
+        db: 資料庫 session
+        grant: 要授予的 (client_id, stamp_id)，已授予的組合不變
+        revoke: 要撤銷的 (client_id, stamp_id)，未授予的組合不變
+
+    Raises:
+        HTTPException: 授予的客戶或印章不存在（404）
+    """
+    grant, revoke = check_pairs(grant, revoke)
+    result = BulkPermissionResult()
+
+    if grant:
+        missing = _missing_ids(db, APIClient.id, {client_id for client_id, _ in grant})
+        if missing:
+            raise HTTPException(status_code=404, detail=f"客戶不存在：{missing[:20]}")
+        missing = _missing_ids(db, StampRegistry.id, {stamp_id for _, stamp_id in grant})
+        if missing:
+            raise HTTPException(status_code=404, detail=f"印章不存在：{missing[:20]}")
+
+    upsert = _upsert_statement(db.get_bind().dialect.name) if grant else None
+    for chunk in _chunks(grant, PERMISSION_BULK_CHUNK_SIZE):
+        active = _active_pairs(db, chunk)
+        new_pairs = [pair for pair in chunk if pair not in active]
+        result.already_granted += len(active)
+        result.granted += len(new_pairs)
+        if not new_pairs:
+            continue
+        db.execute(upsert, [
+            {'client_id': client_id, 'stamp_id': stamp_id, 'is_active': True}
+            for client_id, stamp_id in new_pairs
+        ])
+        # 授予權限的變更紀錄附上指紋，驗證伺服器不需再查詢
+        fingerprints: Dict[int, list] = dict(db.execute(
+            select(StampRegistry.id, StampRegistry.fingerprint).where(
+                StampRegistry.id.in_({stamp_id for _, stamp_id in new_pairs})
+            )
+        ).all())
+        changes.record_changes(db, [
+            {'kind': changes.PERMISSION_GRANTED, 'client_id': client_id, 'stamp_id': stamp_id,
+             'fingerprint': fingerprints[stamp_id]}
+            for client_id, stamp_id in new_pairs
+        ])
+
+    for chunk in _chunks(revoke, PERMISSION_BULK_CHUNK_SIZE):
+        current = _active_pairs(db, chunk)
+        active = [pair for pair in chunk if pair in current]
+        result.not_granted += len(chunk) - len(active)
+        result.revoked += len(active)
+        if not active:
+            continue
+        db.execute(
+            update(StampPermission)
+            .where(tuple_(StampPermission.client_id, StampPermission.stamp_id).in_(active))
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        changes.record_changes(db, [
+            {'kind': changes.PERMISSION_REVOKED, 'client_id': client_id, 'stamp_id': stamp_id, 'fingerprint': None}
+            for client_id, stamp_id in active
+        ])
+
+    return result
+
+
+def encode_runs(stamp_ids: np.ndarray) -> List[List[int]]:
+    """已排序的印章 ID 轉為連續區段 [[第一個印章 ID, 個數], ...]"""
+    breaks = np.flatnonzero(np.diff(stamp_ids) != 1) + 1
+    starts = np.r_[0, breaks]
+    lengths = np.diff(np.r_[starts, len(stamp_ids)])
+    return np.stack([stamp_ids[starts], lengths], axis=1).tolist()
+
+
+def encode_bitset(stamp_ids: np.ndarray, base: int, size: int) -> str:
+    """印章 ID 轉為位元集合：第 i 個位元（byte i // 8 的第 i % 8 個位元，低位在前）表示印章 base + i，以 base64 編碼"""
+    bits = np.zeros(size, dtype=bool)
+    bits[stamp_ids - base] = True
+    return base64.b64encode(np.packbits(bits, bitorder='little').tobytes()).decode('ascii')
+
+
+def permission_matrix(db, encoding: str = 'runs', client_id: Optional[int] = None) -> dict:
+    """
+    客戶 × 印章的權限矩陣（只列出至少有一個啟用權限的客戶）
+
+    Args:
+        db: 資料庫 session
+        encoding: runs（連續區段）或 bitset（位元集合）
+        client_id: 只列出此客戶
+
+    Raises:
+        HTTPException: 不支援的編碼（400）
+    """
+    if encoding not in MATRIX_ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"不支援的編碼：{encoding}（可用：{', '.join(MATRIX_ENCODINGS)}）")
+
+    statement = select(StampPermission.client_id, StampPermission.stamp_id).where(StampPermission.is_active == True)
+    if client_id:
+        statement = statement.where(StampPermission.client_id == client_id)
+    rows = db.execute(statement.order_by(StampPermission.client_id, StampPermission.stamp_id)).all()
+    # 以 fromiter 攤平（np.array 直接讀取 Row 物件時會逐列探測陣列介面，慢一個數量級）
+    pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(len(rows), 2)
+
+    client_ids, starts = np.unique(pairs[:, 0], return_index=True)
+    stops = np.append(starts[1:], len(pairs))
+    base = int(pairs[:, 1].min()) if len(pairs) else 0
+    size = int(pairs[:, 1].max()) - base + 1 if len(pairs) else 0
+
+    clients = []
+    for client, start, stop in zip(client_ids.tolist(), starts, stops):
+        stamp_ids = pairs[start:stop, 1]
+        row = {'client_id': client, 'count': int(stop - start)}
+        if encoding == 'runs':
+            row['runs'] = encode_runs(stamp_ids)
+        else:
+            row['bits'] = encode_bitset(stamp_ids, base, size)
+        clients.append(row)
+
+    return {
+        'encoding': encoding,
+        'stamp_id_base': base,
+        'stamp_id_count': size,
+        'total_permissions': len(pairs),
+        'clients': clients,
+    }
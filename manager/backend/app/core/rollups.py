@@ -0,0 +1,341 @@
+"""
+驗證日誌統計：增量彙總 stamping_logs 並提供分析查詢
+
+統計不直接對 stamping_logs 做 GROUP BY（大表上需數分鐘，且與驗證伺服器的寫入競爭），
+而是由背景任務依 id 遞增把新的日誌彙總到每小時／每日彙總表，分析端點只讀取彙總表。
+
+- 高水位：stamping_rollup_state.last_log_id 為已彙總到的 id，每次只處理之後最多 ROLLUP_BATCH_SIZE 筆
+- 彙總以 INSERT ... SELECT ... GROUP BY 在資料庫中完成，鍵已存在時累加 count
+  （MySQL：ON DUPLICATE KEY UPDATE；SQLite：ON CONFLICT），與推進高水位在同一個交易中
+- 自動編號的 id 不一定依 commit 順序出現：每次執行記錄當下的 MAX(id)，
+  只彙總到 ROLLUP_LAG_SECONDS 之前記錄的 MAX(id)，讓已分配較小 id 的交易有時間 commit
+- 狀態列以 SELECT ... FOR UPDATE 鎖定，多個管理後台 worker 同時執行時不會重複累加
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+
+from app.models import StampingLog, StampingRollupDaily, StampingRollupHourly, StampingRollupState
+
+# 統計彙總配置（可配置）
+ROLLUP_ENABLED = os.getenv('ROLLUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# 背景彙總的間隔（秒）
+ROLLUP_INTERVAL = float(os.getenv('ROLLUP_INTERVAL', '60'))
+# 只彙總此秒數之前已存在的 id（應大於最長的日誌寫入交易）
+ROLLUP_LAG_SECONDS = float(os.getenv('ROLLUP_LAG_SECONDS', '30'))
+# 每個交易彙總的 id 範圍
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', '100000'))
+# 失敗時重試間隔的上限（秒）
+ROLLUP_MAX_BACKOFF = float(os.getenv('ROLLUP_MAX_BACKOFF', '600'))
+# 分析查詢最多讀取的彙總列數
+ANALYTICS_MAX_ROWS = int(os.getenv('ANALYTICS_MAX_ROWS', '20000'))
+
+ROLLUP_NAME = 'stamping_logs'
+SUCCESS_STATUS = 'valid'
+# 驗證失敗、沒有對應印章的日誌在彙總表中的 stamp_id（主鍵欄位不能為 NULL）
+NO_STAMP_ID = 0
+
+GRANULARITIES = {
+    'hour': StampingRollupHourly,
+    'day': StampingRollupDaily,
+}
+GROUP_BY_FIELDS = ('bucket', 'client', 'stamp')
+
+
+@dataclass
+class RollupResult:
+    """一次彙總的結果"""
+    logs: int
+    last_log_id: int
+    # 還有已可彙總的日誌（受 ROLLUP_BATCH_SIZE 限制），應立即再執行一次
+    more: bool
+
+
+def _bucket_expression(dialect_name: str, granularity: str):
+    """將 created_at 截斷為小時或日期的 SQL 運算式"""
+    column = StampingLog.created_at
+    if dialect_name == 'sqlite':
+        # 與 SQLAlchemy 在 SQLite 儲存 DateTime 的字串格式相同（含微秒），範圍比較才會一致
+        return func.strftime('%Y-%m-%d %H:00:00.000000', column) if granularity == 'hour' else func.date(column)
+    return func.date_format(column, '%Y-%m-%d %H:00:00') if granularity == 'hour' else func.date(column)
+
+
+def _rollup_statement(dialect_name: str, granularity: str, after_id: int, upto_id: int):
+    """彙總 (after_id, upto_id] 的日誌並累加到彙總表"""
+    model = GRANULARITIES[granularity]
+    bucket = _bucket_expression(dialect_name, granularity)
+    stamp_id = func.coalesce(StampingLog.stamp_id, NO_STAMP_ID)
+    grouped = select(bucket, StampingLog.client_id, stamp_id, StampingLog.status, func.count()).where(
+        StampingLog.id > after_id,
+        StampingLog.id <= upto_id
+    ).group_by(bucket, StampingLog.client_id, stamp_id, StampingLog.status)
+    columns = ['bucket', 'client_id', 'stamp_id', 'status', 'count']
+
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        statement = sqlite_insert(model).from_select(columns, grouped)
+        return statement.on_conflict_do_update(
+            index_elements=[model.bucket, model.client_id, model.stamp_id, model.status],
+            set_={'count': model.count + statement.excluded['count']}
+        )
+    from sqlalchemy.dialects.mysql import insert as mysql_insert
+    statement = mysql_insert(model).from_select(columns, grouped)
+    return statement.on_duplicate_key_update(count=model.count + statement.inserted['count'])
+
+
+def rollup_once(db, batch_size: int = ROLLUP_BATCH_SIZE, lag_seconds: float = ROLLUP_LAG_SECONDS) -> RollupResult:
+    """
+    彙總一批新的日誌（單一交易）
+
+    Args:
+        db: 業務日誌資料庫 session
+        batch_size: 最多彙總的 id 範圍
+        lag_seconds: 只彙總此秒數之前記錄的 MAX(id) 以內的日誌
+
+    Returns:
+        彙總結果
+    """
+    state = db.query(StampingRollupState).filter(StampingRollupState.name == ROLLUP_NAME).with_for_update().first()
+    if state is None:
+        state = StampingRollupState(name=ROLLUP_NAME, last_log_id=0, observed_max_id=0)
+        db.add(state)
+        db.flush()
+
+    now = datetime.now()
+    after_id = state.last_log_id
+    upto_id = after_id
+    if state.observed_at is not None and state.observed_at <= now - timedelta(seconds=lag_seconds):
+        upto_id = min(state.observed_max_id, after_id + batch_size)
+
+    logs = 0
+    if upto_id > after_id:
+        dialect_name = db.get_bind().dialect.name
+        logs = db.execute(
+            select(func.count()).where(StampingLog.id > after_id, StampingLog.id <= upto_id)
+        ).scalar()
+        if logs:
+            for granularity in GRANULARITIES:
+                db.execute(_rollup_statement(dialect_name, granularity, after_id, upto_id))
+        state.last_log_id = upto_id
+
+    more = upto_id < state.observed_max_id and upto_id > after_id
+    if not more:
+        # 已彙總到上次記錄的位置：記錄新的 MAX(id)，ROLLUP_LAG_SECONDS 之後才彙總到這裡
+        state.observed_max_id = max(db.execute(select(func.max(StampingLog.id))).scalar() or 0, state.last_log_id)
+        state.observed_at = now
+    state.updated_at = now
+    db.commit()
+    return RollupResult(logs=logs, last_log_id=state.last_log_id, more=more)
+
+
+def rollup_status(db) -> dict:
+    """彙總進度（已彙總到的 id 與時間）"""
+    state = db.query(StampingRollupState).filter(StampingRollupState.name == ROLLUP_NAME).first()
+    return {
+        'last_log_id': state.last_log_id if state else 0,
+        'rolled_up_at': state.updated_at if state else None,
+    }
+
+
+class RollupScheduler:
+    """背景任務：定期增量彙總驗證日誌（彙總在執行緒池中執行）"""
+
+    def __init__(self, session_factory: Callable, interval: float = ROLLUP_INTERVAL):
+        """
+        初始化
+
+        Args:
+            session_factory: 業務日誌資料庫 Session 工廠
+            interval: 彙總間隔（秒）
+        """
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+        # 統計資料
+        self.runs = 0
+        self.logs = 0
+        self.errors = 0
+        self.last_success: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def run_once(self) -> RollupResult:
+        """彙總一批（同步，可在執行緒池或命令列中呼叫）"""
+        db = self.session_factory()
+        try:
+            result = rollup_once(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.runs += 1
+        self.logs += result.logs
+        self.last_success = time.time()
+        return result
+
+    async def start(self) -> None:
+        """啟動背景任務（應用程式啟動時呼叫）"""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止背景任務（每批在單一交易中完成，直接取消即可）"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        """背景任務：定期彙總；還有可彙總的日誌時立即處理下一批"""
+        backoff = self.interval
+        while True:
+            try:
+                result = await run_in_threadpool(self.run_once)
+                backoff = self.interval
+            except Exception as e:
+                self.errors += 1
+                print(f"警告：彙總驗證日誌失敗，{backoff:.1f} 秒後重試: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, ROLLUP_MAX_BACKOFF)
+                continue
+            if not result.more:
+                await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        """背景任務狀態"""
+        return {
+            'running': self.running,
+            'runs': self.runs,
+            'logs': self.logs,
+            'errors': self.errors,
+            'seconds_since_success': time.time() - self.last_success if self.last_success else None,
+        }
+
+
+def _default_range(granularity: str, start: Optional[datetime], end: Optional[datetime]):
+    """預設範圍：每小時為最近 24 小時，每日為最近 30 天（含目前的小時／今天）"""
+    if granularity == 'hour':
+        end = end or datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        start = start or end - timedelta(hours=24)
+        return start, end
+    end_day = end.date() if end else date.today() + timedelta(days=1)
+    start_day = start.date() if start else end_day - timedelta(days=30)
+    return start_day, end_day
+
+
+def _success_rate(counts: Dict[str, int], total: int) -> Optional[float]:
+    return counts.get(SUCCESS_STATUS, 0) / total if total else None
+
+
+def query_usage(
+    db,
+    granularity: str = 'hour',
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    client_id: Optional[int] = None,
+    stamp_id: Optional[int] = None,
+    group_by: Sequence[str] = ('bucket',)
+) -> dict:
+    """
+    由彙總表查詢驗證次數與成功率
+
+    Args:
+        db: 業務日誌資料庫 session
+        granularity: hour 或 day
+        start: 起始時間（含）
+        end: 結束時間（不含）
+        client_id: 只統計此客戶
+        stamp_id: 只統計此印章（0 為驗證失敗、沒有對應印章的日誌）
+        group_by: 分組欄位（bucket、client、stamp 的組合，空白表示只返回總計）
+
+    Raises:
+        HTTPException: 參數不正確或結果過多（400）
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"不支援的時間粒度：{granularity}（可用：{', '.join(GRANULARITIES)}）")
+    unknown = [field for field in group_by if field not in GROUP_BY_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支援的分組欄位：{unknown}（可用：{', '.join(GROUP_BY_FIELDS)}）")
+
+    model = GRANULARITIES[granularity]
+    start, end = _default_range(granularity, start, end)
+    fields = [field for field in GROUP_BY_FIELDS if field in group_by]
+    columns = [{'bucket': model.bucket, 'client': model.client_id, 'stamp': model.stamp_id}[field] for field in fields]
+
+    statement = select(*columns, model.status, func.sum(model.count)).where(model.bucket >= start, model.bucket < end)
+    if client_id is not None:
+        statement = statement.where(model.client_id == client_id)
+    if stamp_id is not None:
+        statement = statement.where(model.stamp_id == stamp_id)
+    statement = statement.group_by(*columns, model.status).order_by(*columns, model.status)
+    result = db.execute(statement.limit(ANALYTICS_MAX_ROWS + 1)).all()
+    if len(result) > ANALYTICS_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"結果超過 {ANALYTICS_MAX_ROWS} 列，請縮小時間範圍或減少分組欄位")
+
+    rows: Dict[tuple, dict] = {}
+    totals: Dict[str, int] = {}
+    for *key, status, count in result:
+        count = int(count)
+        row = rows.get(tuple(key))
+        if row is None:
+            row = rows[tuple(key)] = {
+                **{{'bucket': 'bucket', 'client': 'client_id', 'stamp': 'stamp_id'}[field]: value
+                   for field, value in zip(fields, key)},
+                'total': 0,
+                'counts': {},
+            }
+        row['counts'][status] = row['counts'].get(status, 0) + count
+        row['total'] += count
+        totals[status] = totals.get(status, 0) + count
+    for row in rows.values():
+        row['success_rate'] = _success_rate(row['counts'], row['total'])
+
+    total = sum(totals.values())
+    return {
+        'granularity': granularity,
+        'start': start,
+        'end': end,
+        'group_by': fields,
+        **rollup_status(db),
+        'total': total,
+        'counts': totals,
+        'success_rate': _success_rate(totals, total),
+        'rows': list(rows.values()),
+    }
+
+
+if __name__ == '__main__':
+    # 命令列：彙總到目前為止的日誌（第一次執行時先記錄 MAX(id)，等待 ROLLUP_LAG_SECONDS 後再彙總）
+    from app.core.database import BusinessSessionLocal, business_engine
+    from app.models import BusinessBase
+
+    BusinessBase.metadata.create_all(
+        business_engine,
+        tables=[StampingRollupHourly.__table__, StampingRollupDaily.__table__, StampingRollupState.__table__]
+    )
+    scheduler = RollupScheduler(BusinessSessionLocal)
+    total_logs = 0
+    for attempt in range(2):
+        while True:
+            result = scheduler.run_once()
+            total_logs += result.logs
+            if not result.more:
+                break
+        if attempt == 0:
+            time.sleep(ROLLUP_LAG_SECONDS)
+    print(f"已彙總 {total_logs} 筆日誌，目前到 id {result.last_log_id}")
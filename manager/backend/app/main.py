@@ -1,18 +1,44 @@
 """
 Smart Stamp 管理後台 - 後端 API
 """
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from anyio import to_thread
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import List, Optional
+import tempfile
+import time
 
-from app.core.database import get_db, engine
+from app.core.database import (
+    THREADPOOL_SIZE, get_db, get_business_db, engine, business_engine, SessionLocal, BusinessSessionLocal
+)
 from app.core.math_utils import get_normalized_fingerprint
-from app.models import APIClient, StampRegistry, StampPermission, Base
+from app.core import changes
+from app.core.changes import record_change
+from app.core import collisions
+from app.core.collisions import find_collisions, find_all_collisions, fingerprint_columns, load_fingerprint_matrix
+from app.core.bulk_calibration import (
+    BULK_MAX_UPLOAD_BYTES, UPLOAD_FORMATS, UploadTooLarge,
+    iter_report, run_bulk_calibration, spool_upload
+)
+from app.core.permissions import bulk_update_permissions, permission_matrix
+from app.core.rollups import ROLLUP_ENABLED, RollupScheduler, query_usage, rollup_status
+from app.core.pagination import NEXT_CURSOR_HEADER, PAGE_DEFAULT_LIMIT, export_response, keyset_page
+from app.models import (
+    APIClient, StampRegistry, StampPermission, Base,
+    BusinessBase, StampingRollupDaily, StampingRollupHourly, StampingRollupState
+)
 from app.schemas import (
     CalibrateRequest, CalibrateResponse,
+    CollisionPair, CollisionReport, StampCollision,
     ClientCreate, ClientResponse,
     PermissionCreate, PermissionResponse,
+    BulkPermissionRequest, BulkPermissionResponse, PermissionMatrix,
+    RollupRunResponse, UsageReport,
     StampResponse
 )
 
@@ -30,13 +56,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# 驗證日誌增量彙總（背景任務）
+rollup_scheduler = RollupScheduler(BusinessSessionLocal)
+
 
 @app.on_event("startup")
 async def startup_event():
-    """啟動時建立資料表（如果不存在）"""
+    """
+    啟動時設定執行緒池大小、建立資料表（如果不存在），清理過期的變更紀錄，為舊印章補上碰撞偵測用的指紋欄位，
+    並啟動驗證日誌彙總
+    """
+    # 同步路由、同步依賴項與串流回應的同步產生器共用 AnyIO 的預設執行緒池
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
     Base.metadata.create_all(bind=engine)
+    
+    db = SessionLocal()
+    try:
+        changes.prune_changes(db)
+    except Exception as e:
+        db.rollback()
+        print(f"警告：清理變更紀錄失敗: {e}")
+    try:
+        backfilled = collisions.backfill_fingerprint_columns(db)
+        if backfilled:
+            print(f"已為 {backfilled} 枚印章補上 fp_0..fp_4 欄位")
+    except Exception as e:
+        db.rollback()
+        print(f"警告：補上印章指紋欄位失敗（請執行 database/migrations/002_stamp_registry_fingerprint_columns.sql）: {e}")
+    finally:
+        db.close()
+
+    try:
+        BusinessBase.metadata.create_all(
+            bind=business_engine,
+            tables=[StampingRollupHourly.__table__, StampingRollupDaily.__table__, StampingRollupState.__table__]
+        )
+    except Exception as e:
+        print(f"警告：建立驗證日誌彙總表失敗（請執行 database/migrations/003_stamping_rollups.sql）: {e}")
+    if ROLLUP_ENABLED:
+        await rollup_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """停止驗證日誌彙總"""
+    await rollup_scheduler.stop()
 
 
 @app.get("/")
@@ -55,28 +122,46 @@ async def health_check():
     return {"status": "healthy"}
 
 
+# 使用資料庫的路由皆為一般的 def：FastAPI 在執行緒池中執行，同步的 ORM 存取不會阻塞事件迴圈
+# （耗時的查詢只佔用一個執行緒，/health 與其他請求照常處理）
+
 # ==================== 印章管理 ====================
 
 @app.post("/admin/stamps/calibrate", response_model=CalibrateResponse)
-async def calibrate_stamp(
+def calibrate_stamp(
     request: CalibrateRequest,
     db: Session = Depends(get_db)
 ):
     """
     印章校正：接收 5 點座標，計算指紋並儲存為新印章
+    
+    指紋與既有印章無法區分（在驗證容差內）時仍然建立，並在 collisions 列出這些印章；
+    reject_collisions 為 true 時改為返回 409，不建立印章。
     """
     try:
         # 計算指紋
         fingerprint = get_normalized_fingerprint(request.points)
         
+        # 碰撞偵測：以索引找出驗證容差內的既有印章
+        found = find_collisions(db, fingerprint)
+        if found and request.reject_collisions:
+            stamp_ids = ", ".join(str(collision.stamp_id) for collision in found)
+            raise HTTPException(
+                status_code=409,
+                detail=f"指紋與既有印章無法區分（印章 ID: {stamp_ids}），驗證時可能被判定為其他印章"
+            )
+        
         # 建立新印章
         stamp = StampRegistry(
             name=request.name,
             fingerprint=fingerprint,
-            description=request.description
+            description=request.description,
+            **fingerprint_columns(fingerprint)
         )
         
         db.add(stamp)
+        db.flush()
+        record_change(db, changes.STAMP_CREATED, stamp_id=stamp.id, fingerprint=fingerprint)
         db.commit()
         db.refresh(stamp)
         
@@ -84,9 +169,15 @@ async def calibrate_stamp(
             stamp_id=stamp.id,
             name=stamp.name,
             fingerprint=fingerprint,
-            message="印章校正成功"
+            message="印章校正成功",
+            collisions=[
+                StampCollision(stamp_id=collision.stamp_id, mse=collision.mse, max_error=collision.max_error)
+                for collision in found
+            ]
         )
     
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -94,19 +185,96 @@ async def calibrate_stamp(
         raise HTTPException(status_code=500, detail=f"伺服器錯誤: {str(e)}")
 
 
+@app.post("/admin/stamps/calibrate/bulk")
+async def bulk_calibrate(
+    request: Request,
+    upload_format: str = Query('ndjson', alias='format'),
+    force: bool = False
+):
+    """
+    批次印章校正：請求本文為 NDJSON（每行一個 {name, points, description}）或 CSV
+    （第一列為欄位名稱 name, points, description，points 為 JSON 陣列字串）
+    
+    每 BULK_CHUNK_SIZE 筆為一個交易；回應為 NDJSON，依上傳順序每筆一行結果，最後一行為統計。
+    force 為 true 時，與既有印章無法區分的紀錄仍然建立。
+    """
+    if upload_format not in UPLOAD_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支援的上傳格式：{upload_format}（可用：{', '.join(UPLOAD_FORMATS)}）")
+    
+    try:
+        upload = await spool_upload(request.stream())
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"上傳內容超過 {BULK_MAX_UPLOAD_BYTES} 位元組")
+    
+    report = tempfile.TemporaryFile()
+    try:
+        # 指紋計算與資料庫寫入在執行緒池中進行，不佔用事件迴圈
+        summary = await run_in_threadpool(run_bulk_calibration, upload, upload_format, report, force)
+    except BaseException:
+        report.close()
+        raise
+    finally:
+        upload.close()
+    return StreamingResponse(iter_report(report, summary), media_type='application/x-ndjson')
+
+
 @app.get("/admin/stamps", response_model=List[StampResponse])
-async def list_stamps(
+def list_stamps(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_DEFAULT_LIMIT,
     skip: int = 0,
-    limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """列出所有印章"""
-    stamps = db.query(StampRegistry).offset(skip).limit(limit).all()
-    return stamps
+    """
+    列出印章（依 id 排序）
+    
+    還有下一頁時，回應標頭 X-Next-Cursor 為下一頁的 cursor。skip 為舊版的 offset 分頁，只在沒有 cursor 時使用。
+    """
+    return keyset_page(db.query(StampRegistry), StampRegistry.id, cursor, limit, response, skip=skip)
+
+
+@app.get("/admin/stamps/export")
+def export_stamps(export_format: str = Query('ndjson', alias='format')):
+    """以串流匯出所有印章（format：ndjson 或 csv）"""
+    statement = select(
+        StampRegistry.id, StampRegistry.name, StampRegistry.fingerprint, StampRegistry.description,
+        StampRegistry.created_at, StampRegistry.updated_at
+    ).order_by(StampRegistry.id)
+    return export_response(SessionLocal, statement, export_format, 'stamps')
+
+
+@app.get("/admin/stamps/collisions", response_model=CollisionReport)
+def collision_report(
+    limit: int = 1000,
+    db: Session = Depends(get_db)
+):
+    """
+    全註冊表碰撞報告：列出所有無法區分的印章組合（依 MSE 由小到大，最多 limit 組）
+    """
+    start = time.perf_counter()
+    stamp_ids, fingerprints = load_fingerprint_matrix(db)
+    pairs = find_all_collisions(stamp_ids, fingerprints)
+    return CollisionReport(
+        total_stamps=len(stamp_ids),
+        total_pairs=len(pairs),
+        elapsed_ms=(time.perf_counter() - start) * 1000,
+        tolerance_mse=collisions.VERIFICATION_TOLERANCE_MSE,
+        tolerance_max=collisions.VERIFICATION_TOLERANCE_MAX,
+        pairs=[
+            CollisionPair(
+                stamp_id=pair.stamp_id,
+                other_stamp_id=pair.other_stamp_id,
+                mse=pair.mse,
+                max_error=pair.max_error
+            )
+            for pair in pairs[:limit]
+        ]
+    )
 
 
 @app.get("/admin/stamps/{stamp_id}", response_model=StampResponse)
-async def get_stamp(
+def get_stamp(
     stamp_id: int,
     db: Session = Depends(get_db)
 ):
@@ -117,8 +285,23 @@ async def get_stamp(
     return stamp
 
 
+@app.get("/admin/stamps/{stamp_id}/collisions", response_model=List[StampCollision])
+def get_stamp_collisions(
+    stamp_id: int,
+    db: Session = Depends(get_db)
+):
+    """列出與指定印章無法區分的其他印章"""
+    stamp = db.query(StampRegistry).filter(StampRegistry.id == stamp_id).first()
+    if not stamp:
+        raise HTTPException(status_code=404, detail="印章不存在")
+    return [
+        StampCollision(stamp_id=collision.stamp_id, mse=collision.mse, max_error=collision.max_error)
+        for collision in find_collisions(db, stamp.fingerprint, exclude_stamp_id=stamp_id)
+    ]
+
+
 @app.delete("/admin/stamps/{stamp_id}")
-async def delete_stamp(
+def delete_stamp(
     stamp_id: int,
     db: Session = Depends(get_db)
 ):
@@ -128,6 +311,7 @@ async def delete_stamp(
         raise HTTPException(status_code=404, detail="印章不存在")
     
     db.delete(stamp)
+    record_change(db, changes.STAMP_DELETED, stamp_id=stamp_id)
     db.commit()
     return {"message": "印章已刪除"}
 
@@ -135,7 +319,7 @@ async def delete_stamp(
 # ==================== 客戶管理 ====================
 
 @app.post("/admin/clients", response_model=ClientResponse)
-async def create_client(
+def create_client(
     request: ClientCreate,
     db: Session = Depends(get_db)
 ):
@@ -157,6 +341,9 @@ async def create_client(
     )
     
     db.add(client)
+    db.flush()
+    # 驗證伺服器可能已將這個 Key 負向快取為無效，通知其清除
+    record_change(db, changes.CLIENT_CREATED, client_id=client.id)
     db.commit()
     db.refresh(client)
     
@@ -164,18 +351,32 @@ async def create_client(
 
 
 @app.get("/admin/clients", response_model=List[ClientResponse])
-async def list_clients(
+def list_clients(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_DEFAULT_LIMIT,
     skip: int = 0,
-    limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """列出所有客戶"""
-    clients = db.query(APIClient).offset(skip).limit(limit).all()
-    return clients
+    """
+    列出客戶（依 id 排序）
+    
+    還有下一頁時，回應標頭 X-Next-Cursor 為下一頁的 cursor。skip 為舊版的 offset 分頁，只在沒有 cursor 時使用。
+    """
+    return keyset_page(db.query(APIClient), APIClient.id, cursor, limit, response, skip=skip)
+
+
+@app.get("/admin/clients/export")
+def export_clients(export_format: str = Query('ndjson', alias='format')):
+    """以串流匯出所有客戶（format：ndjson 或 csv）"""
+    statement = select(
+        APIClient.id, APIClient.name, APIClient.api_key, APIClient.is_active, APIClient.created_at
+    ).order_by(APIClient.id)
+    return export_response(SessionLocal, statement, export_format, 'clients')
 
 
 @app.get("/admin/clients/{client_id}", response_model=ClientResponse)
-async def get_client(
+def get_client(
     client_id: int,
     db: Session = Depends(get_db)
 ):
@@ -187,7 +388,7 @@ async def get_client(
 
 
 @app.put("/admin/clients/{client_id}/toggle")
-async def toggle_client_status(
+def toggle_client_status(
     client_id: int,
     db: Session = Depends(get_db)
 ):
@@ -197,6 +398,7 @@ async def toggle_client_status(
         raise HTTPException(status_code=404, detail="客戶不存在")
     
     client.is_active = not client.is_active
+    record_change(db, changes.CLIENT_UPDATED, client_id=client.id)
     db.commit()
     db.refresh(client)
     
@@ -206,7 +408,7 @@ async def toggle_client_status(
 # ==================== 權限管理 ====================
 
 @app.post("/admin/permissions", response_model=PermissionResponse)
-async def create_permission(
+def create_permission(
     request: PermissionCreate,
     db: Session = Depends(get_db)
 ):
@@ -235,6 +437,10 @@ async def create_permission(
         else:
             # 重新啟用
             existing.is_active = True
+            record_change(
+                db, changes.PERMISSION_GRANTED,
+                client_id=request.client_id, stamp_id=request.stamp_id, fingerprint=stamp.fingerprint
+            )
             db.commit()
             db.refresh(existing)
             return existing
@@ -247,37 +453,95 @@ async def create_permission(
     )
     
     db.add(permission)
+    record_change(
+        db, changes.PERMISSION_GRANTED,
+        client_id=request.client_id, stamp_id=request.stamp_id, fingerprint=stamp.fingerprint
+    )
     db.commit()
     db.refresh(permission)
     
     return permission
 
 
-@app.get("/admin/permissions", response_model=List[PermissionResponse])
-async def list_permissions(
+@app.post("/admin/permissions/bulk", response_model=BulkPermissionResponse)
+def bulk_permissions(
+    request: BulkPermissionRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    批次授予與撤銷權限（同一個交易）
+
+    已授予的組合再次授予、未授予的組合撤銷皆不視為錯誤，只計入統計；
+    授予的客戶或印章不存在時返回 404，整個請求不生效。
+    """
+    result = bulk_update_permissions(
+        db,
+        [(pair.client_id, pair.stamp_id) for pair in request.grant],
+        [(pair.client_id, pair.stamp_id) for pair in request.revoke]
+    )
+    db.commit()
+    return result
+
+
+@app.get("/admin/permissions/matrix", response_model=PermissionMatrix, response_model_exclude_none=True)
+def get_permission_matrix(
+    encoding: str = 'runs',
     client_id: int = None,
-    stamp_id: int = None,
     db: Session = Depends(get_db)
 ):
-    """列出權限（可依客戶或印章過濾）"""
-    from sqlalchemy import or_
-    
-    query = db.query(StampPermission)
-    
+    """
+    客戶 × 印章權限矩陣（只列出有啟用權限的客戶）
+
+    encoding=runs 時每個客戶為印章 ID 的連續區段；encoding=bitset 時為 base64 位元集合，
+    第 i 個位元表示印章 stamp_id_base + i。
+    """
+    return permission_matrix(db, encoding, client_id)
+
+
+def permission_query(query, client_id: Optional[int], stamp_id: Optional[int]):
+    """套用列出權限的過濾條件（Query 與 select() 皆可）"""
     if client_id:
         query = query.filter(StampPermission.client_id == client_id)
     if stamp_id:
         query = query.filter(StampPermission.stamp_id == stamp_id)
-    
     # 只返回啟用的權限
-    query = query.filter(StampPermission.is_active == True)
+    return query.filter(StampPermission.is_active == True)
+
+
+@app.get("/admin/permissions", response_model=List[PermissionResponse])
+def list_permissions(
+    response: Response,
+    client_id: int = None,
+    stamp_id: int = None,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_DEFAULT_LIMIT,
+    db: Session = Depends(get_db)
+):
+    """
+    列出權限（可依客戶或印章過濾，依 id 排序）
     
-    permissions = query.all()
-    return permissions
+    還有下一頁時，回應標頭 X-Next-Cursor 為下一頁的 cursor。
+    """
+    query = permission_query(db.query(StampPermission), client_id, stamp_id)
+    return keyset_page(query, StampPermission.id, cursor, limit, response)
+
+
+@app.get("/admin/permissions/export")
+def export_permissions(
+    client_id: int = None,
+    stamp_id: int = None,
+    export_format: str = Query('ndjson', alias='format')
+):
+    """以串流匯出權限（過濾條件與列出權限相同，format：ndjson 或 csv）"""
+    statement = select(
+        StampPermission.id, StampPermission.client_id, StampPermission.stamp_id,
+        StampPermission.is_active, StampPermission.created_at
+    ).order_by(StampPermission.id)
+    return export_response(SessionLocal, permission_query(statement, client_id, stamp_id), export_format, 'permissions')
 
 
 @app.delete("/admin/permissions/{permission_id}")
-async def delete_permission(
+def delete_permission(
     permission_id: int,
     db: Session = Depends(get_db)
 ):
@@ -286,12 +550,57 @@ async def delete_permission(
     if not permission:
         raise HTTPException(status_code=404, detail="權限不存在")
     
-    permission.is_active = False
+    if permission.is_active:
+        permission.is_active = False
+        record_change(
+            db, changes.PERMISSION_REVOKED,
+            client_id=permission.client_id, stamp_id=permission.stamp_id
+        )
     db.commit()
     
     return {"message": "權限已刪除"}
 
 
+# ==================== 驗證統計 ====================
+
+@app.get("/admin/analytics/usage", response_model=UsageReport)
+def get_usage(
+    granularity: str = 'hour',
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    client_id: Optional[int] = None,
+    stamp_id: Optional[int] = None,
+    group_by: str = 'bucket',
+    db: Session = Depends(get_business_db)
+):
+    """
+    驗證次數與成功率（只讀取彙總表，不查詢 stamping_logs）
+
+    - granularity：hour（預設最近 24 小時）或 day（預設最近 30 天）
+    - start／end：時間範圍（含起點、不含終點）
+    - group_by：以逗號分隔的 bucket、client、stamp，空白表示只返回總計
+    """
+    fields = [field.strip() for field in group_by.split(',') if field.strip()]
+    return query_usage(db, granularity, start, end, client_id, stamp_id, fields)
+
+
+@app.get("/admin/analytics/rollup")
+def get_rollup_status(db: Session = Depends(get_business_db)):
+    """彙總進度與背景任務狀態"""
+    return {**rollup_status(db), 'scheduler': rollup_scheduler.stats()}
+
+
+@app.post("/admin/analytics/rollup", response_model=RollupRunResponse)
+def run_rollup():
+    """立即彙總已可彙總的日誌（只處理 ROLLUP_LAG_SECONDS 之前記錄的位置以內）"""
+    logs = 0
+    while True:
+        result = rollup_scheduler.run_once()
+        logs += result.logs
+        if not result.more:
+            return {'logs': logs, 'last_log_id': result.last_log_id}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -1,13 +1,18 @@
 """
 資料庫模型定義（管理端擁有完整 CRUD 權限）
+
+Base 為 stamp_core_db 的資料表；BusinessBase 為 app_business_db 中統計使用的資料表。
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Boolean, Date, DateTime, Text, JSON, ForeignKey, Double, Index, UniqueConstraint
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import secrets
 import hashlib
 
 Base = declarative_base()
+BusinessBase = declarative_base()
 
 
 class APIClient(Base):
@@ -37,9 +42,20 @@ class StampRegistry(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     fingerprint = Column(JSON, nullable=False)  # 存儲正規化指紋列表
+    # 指紋的各個值（與 fingerprint 相同，供碰撞偵測以索引做方框查詢）
+    fp_0 = Column(Double, nullable=True)
+    fp_1 = Column(Double, nullable=True)
+    fp_2 = Column(Double, nullable=True)
+    fp_3 = Column(Double, nullable=True)
+    fp_4 = Column(Double, nullable=True)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+    
+    # 指紋已排序且正規化，fp_4 除了所有點重合之外都是 1.0，不放入索引
+    __table_args__ = (
+        Index('idx_fingerprint', 'fp_0', 'fp_1', 'fp_2', 'fp_3'),
+    )
 
 
 class StampPermission(Base):
@@ -52,3 +68,83 @@ class StampPermission(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=func.now(), nullable=False)
 
+    # 與 init.sql 相同；批次授予權限以此唯一鍵做 upsert
+    __table_args__ = (
+        UniqueConstraint('client_id', 'stamp_id', name='uk_client_stamp'),
+    )
+
+
+class RegistryChange(Base):
+    """註冊表變更紀錄：驗證伺服器依 id 遞增讀取，只套用變更的部分"""
+    __tablename__ = 'registry_changes'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(32), nullable=False)
+    client_id = Column(Integer, nullable=True)
+    stamp_id = Column(Integer, nullable=True)
+    fingerprint = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=func.now(), nullable=False, index=True)
+
+
+# ==================== app_business_db（驗證日誌統計） ====================
+
+class StampingLog(BusinessBase):
+    """印章驗證日誌表（由驗證伺服器寫入；管理端讀取統計，並封存、刪除或還原過期的分割區）"""
+    __tablename__ = 'stamping_logs'
+    # 分割區的唯一鍵必須包含分割欄位 created_at（重送的日誌保留原本的 created_at，仍可去除重複）
+    __table_args__ = (UniqueConstraint('log_uuid', 'created_at', name='uk_log_uuid'),)
+
+    id = Column(Integer, primary_key=True)
+    log_uuid = Column(String(32), nullable=True)
+    client_id = Column(Integer, nullable=False, index=True)
+    stamp_id = Column(Integer, nullable=True, index=True)
+    status = Column(String(50), nullable=False, index=True)
+    fingerprint = Column(JSON, nullable=True)
+    error_message = Column(Text, nullable=True)
+    ip_address = Column(String(45), nullable=True)
+    user_agent = Column(String(500), nullable=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+
+class StampingRollupHourly(BusinessBase):
+    """驗證日誌每小時彙總（stamp_id 為 0 表示驗證失敗、沒有對應的印章）"""
+    __tablename__ = 'stamping_rollup_hourly'
+
+    bucket = Column(DateTime, primary_key=True)
+    client_id = Column(Integer, primary_key=True)
+    stamp_id = Column(Integer, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_hourly_client_bucket', 'client_id', 'bucket'),
+        Index('idx_hourly_stamp_bucket', 'stamp_id', 'bucket'),
+    )
+
+
+class StampingRollupDaily(BusinessBase):
+    """驗證日誌每日彙總（stamp_id 為 0 表示驗證失敗、沒有對應的印章）"""
+    __tablename__ = 'stamping_rollup_daily'
+
+    bucket = Column(Date, primary_key=True)
+    client_id = Column(Integer, primary_key=True)
+    stamp_id = Column(Integer, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_daily_client_bucket', 'client_id', 'bucket'),
+        Index('idx_daily_stamp_bucket', 'stamp_id', 'bucket'),
+    )
+
+
+class StampingRollupState(BusinessBase):
+    """彙總進度：已彙總到的 stamping_logs.id（高水位）"""
+    __tablename__ = 'stamping_rollup_state'
+
+    name = Column(String(64), primary_key=True)
+    last_log_id = Column(BigInteger, nullable=False, default=0)
+    # 上次記錄的 MAX(id) 與記錄時間：經過 ROLLUP_LAG_SECONDS 後才彙總到這個 id
+    observed_max_id = Column(BigInteger, nullable=False, default=0)
+    observed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
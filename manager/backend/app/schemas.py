@@ -2,8 +2,8 @@
 Pydantic 模型定義
 """
 from pydantic import BaseModel, Field
-from typing import List, Tuple, Optional
-from datetime import datetime
+from typing import Dict, List, Tuple, Optional, Union
+from datetime import date, datetime
 
 
 class CalibrateRequest(BaseModel):
@@ -16,6 +16,21 @@ class CalibrateRequest(BaseModel):
         max_items=5
     )
     description: Optional[str] = Field(None, description="印章描述")
+    reject_collisions: bool = Field(False, description="指紋與既有印章無法區分時返回 409，不建立印章")
+
+
+class BulkCalibrateRecord(BaseModel):
+    """批次校正上傳的單筆紀錄"""
+    name: str = Field(..., min_length=1, description="印章名稱")
+    points: List[Tuple[float, float]] = Field(..., description="5 個觸控點座標", min_length=5, max_length=5)
+    description: Optional[str] = Field(None, description="印章描述")
+
+
+class StampCollision(BaseModel):
+    """與指定指紋無法區分的既有印章"""
+    stamp_id: int
+    mse: float
+    max_error: float
 
 
 class CalibrateResponse(BaseModel):
@@ -24,6 +39,7 @@ class CalibrateResponse(BaseModel):
     name: str
     fingerprint: List[float]
     message: str
+    collisions: List[StampCollision] = Field(default_factory=list, description="無法區分的既有印章（依 MSE 由小到大）")
 
 
 class ClientCreate(BaseModel):
@@ -55,6 +71,91 @@ class PermissionResponse(BaseModel):
     created_at: datetime
 
 
+class PermissionPair(BaseModel):
+    """一組客戶與印章"""
+    client_id: int
+    stamp_id: int
+
+
+class BulkPermissionRequest(BaseModel):
+    """批次權限請求模型（授予與撤銷在同一個交易中完成）"""
+    grant: List[PermissionPair] = Field(default_factory=list, description="要授予的權限")
+    revoke: List[PermissionPair] = Field(default_factory=list, description="要撤銷的權限")
+
+
+class BulkPermissionResponse(BaseModel):
+    """批次權限回應模型"""
+    granted: int = Field(..., description="新授予（或重新啟用）的權限數量")
+    already_granted: int = Field(..., description="原本已授予的權限數量")
+    revoked: int = Field(..., description="撤銷的權限數量")
+    not_granted: int = Field(..., description="要撤銷但原本未授予的權限數量")
+
+
+class PermissionMatrixRow(BaseModel):
+    """權限矩陣中的一個客戶"""
+    client_id: int
+    count: int = Field(..., description="啟用的權限數量")
+    runs: Optional[List[List[int]]] = Field(None, description="runs 編碼：[[第一個印章 ID, 連續個數], ...]")
+    bits: Optional[str] = Field(None, description="bitset 編碼：base64，第 i 個位元（低位在前）表示印章 stamp_id_base + i")
+
+
+class PermissionMatrix(BaseModel):
+    """客戶 × 印章權限矩陣"""
+    encoding: str
+    stamp_id_base: int
+    stamp_id_count: int
+    total_permissions: int
+    clients: List[PermissionMatrixRow]
+
+
+class UsageRow(BaseModel):
+    """驗證統計的一列（只包含分組的欄位）"""
+    bucket: Optional[Union[datetime, date]] = None
+    client_id: Optional[int] = None
+    stamp_id: Optional[int] = Field(None, description="印章 ID（0 為驗證失敗、沒有對應印章）")
+    total: int
+    counts: Dict[str, int] = Field(..., description="各狀態（valid、invalid、error）的次數")
+    success_rate: Optional[float] = Field(None, description="valid 佔總次數的比例")
+
+
+class UsageReport(BaseModel):
+    """驗證統計（由彙總表查詢）"""
+    granularity: str
+    start: Union[datetime, date]
+    end: Union[datetime, date]
+    group_by: List[str]
+    last_log_id: int = Field(..., description="已彙總到的 stamping_logs.id")
+    rolled_up_at: Optional[datetime] = Field(None, description="上次彙總的時間")
+    total: int
+    counts: Dict[str, int]
+    success_rate: Optional[float]
+    rows: List[UsageRow]
+
+
+class RollupRunResponse(BaseModel):
+    """手動彙總回應模型"""
+    logs: int = Field(..., description="本次彙總的日誌筆數")
+    last_log_id: int
+
+
+class CollisionPair(BaseModel):
+    """一組無法區分的印章"""
+    stamp_id: int
+    other_stamp_id: int
+    mse: float
+    max_error: float
+
+
+class CollisionReport(BaseModel):
+    """全註冊表碰撞報告"""
+    total_stamps: int
+    total_pairs: int
+    elapsed_ms: float
+    tolerance_mse: float
+    tolerance_max: float
+    pairs: List[CollisionPair]
+
+
 class StampResponse(BaseModel):
     """印章回應模型"""
     id: int
@@ -0,0 +1,18 @@
+"""
+管理後台測試共用設定：以暫存目錄中的 SQLite 取代 MySQL，並讓測試以 `import app...` 載入服務程式碼
+
+    python -m pytest manager/backend/tests
+"""
+import os
+import sys
+import tempfile
+
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_ROOT not in sys.path:
+    sys.path.insert(0, SERVICE_ROOT)
+
+# 必須在匯入 app.core.database 之前設定
+DATABASE_DIR = tempfile.mkdtemp(prefix='smartstamp-manager-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DATABASE_DIR, 'core.db')}"
+os.environ['BUSINESS_DATABASE_URL'] = f"sqlite:///{os.path.join(DATABASE_DIR, 'business.db')}"
+os.environ['ROLLUP_ENABLED'] = 'false'
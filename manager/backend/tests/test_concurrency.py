@@ -0,0 +1,85 @@
+"""
+耗時的查詢在執行緒池中執行，不阻塞其他請求
+
+對 stamp_permissions 的查詢注入 1 秒延遲，GET /admin/permissions 進行中時
+/health 與 /admin/clients 必須在遠小於延遲的時間內回應。
+延遲的數字（p50、最大值、與舊版寫法的比較）見 benchmarks/manager_concurrency.py。
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from sqlalchemy import event, insert
+
+from app.core import database
+from app.main import app
+from app.models import APIClient, Base, StampPermission, StampRegistry
+
+SLOW_QUERY_S = 1.0
+# /health 與 /admin/clients 的延遲上限
+FAST_RESPONSE_S = SLOW_QUERY_S / 4
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    Base.metadata.create_all(database.engine)
+    with database.SessionLocal() as db:
+        db.execute(insert(StampRegistry), [
+            {'id': i, 'name': f'stamp-{i}', 'fingerprint': [0.1, 0.2, 0.3, 0.4, 1.0]} for i in range(1, 11)
+        ])
+        db.execute(insert(APIClient), [
+            {'id': i, 'name': f'client-{i}', 'api_key': f'sk_test_{i}'} for i in range(1, 6)
+        ])
+        db.execute(insert(StampPermission), [
+            {'client_id': client_id, 'stamp_id': stamp_id, 'is_active': True}
+            for client_id in range(1, 6) for stamp_id in range(1, 11)
+        ])
+        db.commit()
+    yield
+    Base.metadata.drop_all(database.engine)
+
+
+@pytest.fixture
+def slow_permission_queries():
+    """對 stamp_permissions 的每次查詢加入延遲（在執行查詢的執行緒中等待，與真正的慢查詢相同）"""
+    def delay(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM stamp_permissions' in statement:
+            time.sleep(SLOW_QUERY_S)
+
+    event.listen(database.engine, 'before_cursor_execute', delay)
+    yield
+    event.remove(database.engine, 'before_cursor_execute', delay)
+
+
+async def timed_get(client: httpx.AsyncClient, path: str):
+    start = time.perf_counter()
+    response = await client.get(path)
+    return response, time.perf_counter() - start
+
+
+async def probe_during_slow_request(probes: int = 4):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://manager') as client:
+        slow = asyncio.ensure_future(timed_get(client, '/admin/permissions'))
+        # 讓耗時的請求先進入執行緒池
+        await asyncio.sleep(0.05)
+        fast = []
+        for _ in range(probes):
+            for path in ('/health', '/admin/clients'):
+                response, elapsed = await timed_get(client, path)
+                fast.append((path, response.status_code, elapsed, slow.done()))
+            await asyncio.sleep(0.05)
+        return await slow, fast
+
+
+def test_slow_query_does_not_block_other_routes(seeded, slow_permission_queries):
+    (slow_response, slow_elapsed), fast = asyncio.run(probe_during_slow_request())
+
+    assert slow_response.status_code == 200
+    assert len(slow_response.json()) == 50
+    assert slow_elapsed >= SLOW_QUERY_S
+    for path, status_code, elapsed, slow_done in fast:
+        assert status_code == 200, path
+        assert not slow_done, f"{path} 應在耗時的請求完成前回應"
+        assert elapsed < FAST_RESPONSE_S, f"{path} 耗時 {elapsed * 1000:.1f} ms"
@@ -5,11 +5,23 @@ const api = axios.create({
   timeout: 10000
 })
 
+// 依 X-Next-Cursor 取得所有分頁，返回與單次請求相同形狀的 { data }
+const listAll = async (url: string, params: Record<string, unknown> = {}) => {
+  const data: any[] = []
+  let cursor: string | undefined
+  do {
+    const res = await api.get(url, { params: { ...params, cursor, limit: 1000 } })
+    data.push(...res.data)
+    cursor = res.headers['x-next-cursor']
+  } while (cursor)
+  return { data }
+}
+
 // 印章 API
 export const stampApi = {
-  calibrate: (data: { name: string; points: [number, number][]; description?: string }) =>
+  calibrate: (data: { name: string; points: [number, number][]; description?: string; reject_collisions?: boolean }) =>
     api.post('/admin/stamps/calibrate', data),
-  list: () => api.get('/admin/stamps'),
+  list: () => listAll('/admin/stamps'),
   get: (id: number) => api.get(`/admin/stamps/${id}`),
   delete: (id: number) => api.delete(`/admin/stamps/${id}`)
 }
@@ -17,7 +29,7 @@ export const stampApi = {
 // 客戶 API
 export const clientApi = {
   create: (data: { name: string }) => api.post('/admin/clients', data),
-  list: () => api.get('/admin/clients'),
+  list: () => listAll('/admin/clients'),
   get: (id: number) => api.get(`/admin/clients/${id}`),
   toggleStatus: (id: number) => api.put(`/admin/clients/${id}/toggle`)
 }
@@ -27,7 +39,25 @@ export const permissionApi = {
   create: (data: { client_id: number; stamp_id: number }) =>
     api.post('/admin/permissions', data),
   list: (params?: { client_id?: number; stamp_id?: number }) =>
-    api.get('/admin/permissions', { params }),
-  delete: (id: number) => api.delete(`/admin/permissions/${id}`)
+    listAll('/admin/permissions', params),
+  delete: (id: number) => api.delete(`/admin/permissions/${id}`),
+  bulk: (data: {
+    grant?: { client_id: number; stamp_id: number }[]
+    revoke?: { client_id: number; stamp_id: number }[]
+  }) => api.post('/admin/permissions/bulk', data),
+  matrix: (params?: { encoding?: 'runs' | 'bitset'; client_id?: number }) =>
+    api.get('/admin/permissions/matrix', { params })
 }
 
+// 驗證統計 API
+export const analyticsApi = {
+  usage: (params?: {
+    granularity?: 'hour' | 'day'
+    start?: string
+    end?: string
+    client_id?: number
+    stamp_id?: number
+    group_by?: string
+  }) => api.get('/admin/analytics/usage', { params }),
+  rollupStatus: () => api.get('/admin/analytics/rollup')
+}
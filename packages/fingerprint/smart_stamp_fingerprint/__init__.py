@@ -0,0 +1,26 @@
+"""
+Smart Stamp 印章指紋計算（stamp-server 與管理後台共用）
+
+- 單筆：get_normalized_fingerprint(points) → 5 個排序後的正規化距離
+- 批次：smart_stamp_fingerprint.batch.get_normalized_fingerprints(points) → (M, 5) 陣列（需要 numpy）
+
+兩者逐位元一致，並由 golden_vectors.json 固定結果：
+    python -m smart_stamp_fingerprint.golden
+"""
+from smart_stamp_fingerprint.scalar import (
+    FINGERPRINT_SIZE,
+    calculate_centroid,
+    calculate_max_error,
+    calculate_mse,
+    euclidean_distance,
+    get_normalized_fingerprint,
+)
+
+__all__ = [
+    'FINGERPRINT_SIZE',
+    'calculate_centroid',
+    'calculate_max_error',
+    'calculate_mse',
+    'euclidean_distance',
+    'get_normalized_fingerprint',
+]
@@ -0,0 +1,130 @@
+"""
+批次指紋計算：一次將 M 組 5 點座標轉換為 M 個指紋（需要 numpy）
+
+結果與 scalar.get_normalized_fingerprint 逐位元一致：
+- python_sum 依執行中的 Python 版本重現內建 sum() 的累加（3.12 起為 Neumaier 補償累加）
+- python_square 重現 d ** 2（libm 的 pow）：先以 d * d 計算，只有精確平方接近捨入中點、
+  pow 可能返回相鄰浮點數的元素才逐一以 ** 2 重新計算（假設 libm pow 的誤差小於 POW_ERROR_BOUND_ULP）
+- 其餘的減、除與平方根在 numpy 與 Python 中都是正確捨入的運算
+"""
+import sys
+from itertools import chain
+from typing import Sequence
+
+import numpy as np
+
+from smart_stamp_fingerprint.scalar import FINGERPRINT_SIZE
+
+
+def as_points_array(points) -> np.ndarray:
+    """
+    將座標資料轉為 (M, 5, 2) float64 陣列（已符合格式時不複製）
+
+    巢狀列表先檢查長度再以 np.fromiter 攤平讀入，比 np.asarray 逐層推斷形狀快約一倍。
+
+    Raises:
+        ValueError: 形狀不是 (M, 5, 2)
+    """
+    if not isinstance(points, np.ndarray):
+        if any(len(item) != FINGERPRINT_SIZE for item in points):
+            raise ValueError(f"每組座標必須是 {FINGERPRINT_SIZE} 個點")
+        rows = list(chain.from_iterable(points))
+        if any(len(point) != 2 for point in rows):
+            raise ValueError("每個點必須是 (x, y)")
+        flat = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 2)
+        return flat.reshape(-1, FINGERPRINT_SIZE, 2)
+
+    array = np.asarray(points, dtype=np.float64)
+    if array.ndim != 3 or array.shape[1:] != (FINGERPRINT_SIZE, 2):
+        raise ValueError(f"座標陣列的形狀必須是 (M, 5, 2)，但收到 {array.shape}")
+    return array
+
+
+# libm pow 的誤差上限（ULP，glibc 約 0.52）：精確平方離 d * d 不到 1 - POW_ERROR_BOUND_ULP 個 ULP 時，
+# pow 只可能返回 d * d，其餘元素以 ** 2 重新計算
+POW_ERROR_BOUND_ULP = 0.6
+# Dekker 分割常數 2 ** 27 + 1
+_SPLITTER = 134217729.0
+# 殘差計算精確的範圍（避免分割溢位與乘積下溢）
+_SQUARE_EXACT_RANGE = (2.0 ** -900, 2.0 ** 900)
+
+
+def python_sum(columns: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    逐元素重現內建 sum(columns) 的結果（起始值為整數 0）
+
+    Python 3.12 起 sum() 對浮點數使用 Neumaier 補償累加，3.11 以前依序相加。
+    """
+    total = columns[0] + 0.0
+    if sys.version_info < (3, 12):
+        for column in columns[1:]:
+            total = total + column
+        return total
+
+    compensation = np.zeros_like(total)
+    for column in columns[1:]:
+        t = total + column
+        compensation += np.where(np.abs(total) >= np.abs(column), (total - t) + column, (column - t) + total)
+        total = t
+    # 與 CPython 相同：補償值為 0 或非有限值時不加回
+    apply = (compensation != 0) & np.isfinite(compensation)
+    return np.where(apply, total + compensation, total)
+
+
+def python_square(values: np.ndarray) -> np.ndarray:
+    """
+    逐元素重現 value ** 2 的結果（平台 libm 的 pow，不一定正確捨入）
+
+    d * d 是正確捨入的平方；以 Dekker 分割求出精確的殘差，殘差小於 (1 - POW_ERROR_BOUND_ULP) ULP 時
+    pow 必定返回同一個值。其餘元素（約兩成）、2 的冪次與超出精確範圍的元素逐一以 ** 2 計算。
+    """
+    # 超出精確範圍的元素（平方或殘差可能溢位）都會重新計算
+    with np.errstate(over='ignore', invalid='ignore'):
+        squared = values * values
+        scaled = values * _SPLITTER
+        high = scaled - (scaled - values)
+        low = values - high
+        residual = ((high * high - squared) + 2.0 * high * low) + low * low
+
+    low_bound, high_bound = _SQUARE_EXACT_RANGE
+    safe = (
+        (np.abs(residual) < (1.0 - POW_ERROR_BOUND_ULP) * np.spacing(squared))
+        & (squared > low_bound) & (squared < high_bound)
+        # 2 的冪次下方相鄰浮點數的間距只有一半
+        & (np.frexp(squared)[0] != 0.5)
+    )
+    recheck = np.flatnonzero(~safe)
+    if len(recheck):
+        flat = squared.reshape(-1)
+        flat[recheck] = [value ** 2 for value in values.reshape(-1)[recheck].tolist()]
+    return squared
+
+
+def get_normalized_fingerprints(points) -> np.ndarray:
+    """
+    批次計算正規化指紋
+
+    Args:
+        points: M 組 5 點座標，(M, 5, 2) 陣列或巢狀列表
+
+    Returns:
+        (M, 5) float64 陣列，每列與 get_normalized_fingerprint 的結果逐位元相同
+    """
+    array = as_points_array(points)
+    xs = array[:, :, 0]
+    ys = array[:, :, 1]
+
+    # 質心：與單筆計算的 sum() 相同的累加，再除以 5
+    cx = python_sum([xs[:, i] for i in range(FINGERPRINT_SIZE)]) / FINGERPRINT_SIZE
+    cy = python_sum([ys[:, i] for i in range(FINGERPRINT_SIZE)]) / FINGERPRINT_SIZE
+
+    squared = python_square(xs - cx[:, None])
+    squared += python_square(ys - cy[:, None])
+    distances = np.sqrt(squared, out=squared)
+
+    # 正規化：最大距離為 0（所有點重合）的列維持全為 0
+    max_distance = distances.max(axis=1)
+    divisor = np.where(max_distance == 0, 1.0, max_distance)
+    distances /= divisor[:, None]
+    distances.sort(axis=1)
+    return distances
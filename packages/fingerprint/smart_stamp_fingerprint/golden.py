@@ -0,0 +1,89 @@
+"""
+Golden vectors：固定指紋計算的結果（逐位元比對）
+
+golden_vectors.json 記錄各種座標（隨機、不同尺度、負數、整數、重合與對稱的點）與原本 math_utils 計算的指紋。
+內建 sum() 在 Python 3.12 起改為補償累加，結果可能不同的項目另外記錄 3.11 以前的結果（fingerprint_sequential_sum）。
+修改指紋計算後執行以下指令，單筆與批次計算都必須與執行中的 Python 版本對應的位元完全相同：
+
+    python -m smart_stamp_fingerprint.golden
+
+指紋已儲存在 stamp_registry 中，結果的任何變動都會影響既有印章的比對，不應重新產生這份檔案。
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List
+
+from smart_stamp_fingerprint.scalar import get_normalized_fingerprint
+
+GOLDEN_VECTORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_vectors.json')
+
+
+def load_golden_vectors(path: str = GOLDEN_VECTORS_PATH) -> List[dict]:
+    """讀取 golden vectors：[{'name', 'points', 'fingerprint'}, ...]"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['vectors']
+
+
+def expected_fingerprint(vector: dict) -> List[float]:
+    """執行中的 Python 版本應得到的指紋（3.11 以前的 sum() 依序相加）"""
+    if sys.version_info < (3, 12):
+        return vector.get('fingerprint_sequential_sum', vector['fingerprint'])
+    return vector['fingerprint']
+
+
+def _same_bits(actual, expected) -> bool:
+    return len(actual) == len(expected) and all(
+        float(a).hex() == float(e).hex() for a, e in zip(actual, expected)
+    )
+
+
+def check_golden_vectors(path: str = GOLDEN_VECTORS_PATH, batch: bool = True) -> List[str]:
+    """
+    以單筆與批次計算比對所有 golden vectors
+
+    Args:
+        path: golden vectors 檔案
+        batch: 是否一併檢查批次計算（需要 numpy）
+
+    Returns:
+        不一致的項目說明（空列表表示全部一致）
+    """
+    vectors = load_golden_vectors(path)
+    failures = []
+    for vector in vectors:
+        expected = expected_fingerprint(vector)
+        actual = get_normalized_fingerprint(vector['points'])
+        if not _same_bits(actual, expected):
+            failures.append(f"scalar {vector['name']}: {actual} != {expected}")
+
+    if batch:
+        from smart_stamp_fingerprint.batch import get_normalized_fingerprints
+
+        fingerprints = get_normalized_fingerprints([vector['points'] for vector in vectors])
+        for vector, actual in zip(vectors, fingerprints):
+            expected = expected_fingerprint(vector)
+            if not _same_bits(actual.tolist(), expected):
+                failures.append(f"batch {vector['name']}: {actual.tolist()} != {expected}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default=GOLDEN_VECTORS_PATH, help='golden vectors 檔案')
+    parser.add_argument('--no-batch', action='store_true', help='不檢查批次計算（沒有安裝 numpy 時使用）')
+    args = parser.parse_args()
+
+    failures = check_golden_vectors(args.path, batch=not args.no_batch)
+    total = len(load_golden_vectors(args.path))
+    for failure in failures:
+        print(failure)
+    if failures:
+        print(f"{len(failures)} 項與 golden vectors 不一致（共 {total} 組）")
+        sys.exit(1)
+    print(f"{total} 組 golden vectors 全部一致（{'單筆' if args.no_batch else '單筆與批次'}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+單筆指紋計算：處理印章指紋計算
+包含質心計算、正規化、歐幾里得距離、MSE 等功能
+
+運算與原本 stamp-server 的 math_utils 逐位元相同（已儲存的指紋依此產生）：
+質心以內建 sum() 累加（Python 3.12 起為補償累加，結果與 3.11 以前的逐項相加不同），
+平方以 d ** 2 計算（呼叫平台 libm 的 pow）。batch 模組的向量化計算重現相同的結果。
+"""
+import math
+from typing import List, Sequence, Tuple
+
+# 指紋長度（觸控點數量）
+FINGERPRINT_SIZE = 5
+
+
+def calculate_centroid(points: Sequence[Tuple[float, float]]) -> Tuple[float, float]:
+    """
+    計算點集合的質心
+
+    Args:
+        points: 點座標列表 [(x, y), ...]
+
+    Returns:
+        質心座標 (cx, cy)
+    """
+    if not points:
+        raise ValueError("點列表不能為空")
+
+    n = len(points)
+    cx = sum(p[0] for p in points) / n
+    cy = sum(p[1] for p in points) / n
+    return (cx, cy)
+
+
+def euclidean_distance(p1: Tuple[float, float], p2: Tuple[float, float]) -> float:
+    """
+    計算兩點之間的歐幾里得距離
+
+    Args:
+        p1: 第一個點 (x, y)
+        p2: 第二個點 (x, y)
+
+    Returns:
+        距離值
+    """
+    return math.sqrt((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2)
+
+
+def get_normalized_fingerprint(points: Sequence[Tuple[float, float]]) -> List[float]:
+    """
+    輸入 5 點座標，計算相對於質心的距離比例 (0.0~1.0) 並排序
+
+    算法：
+    1. 計算質心
+    2. 計算每個點到質心的距離
+    3. 找出最大距離作為正規化因子
+    4. 將所有距離除以最大距離，得到 0.0~1.0 的比例
+    5. 排序後返回
+
+    單筆請求的快速路徑：5 個點展開為區域變數計算，除了返回的列表之外不建立中間列表或 tuple。
+
+    Args:
+        points: 5 個點座標 [(x, y), ...]，必須是 5 個點
+
+    Returns:
+        排序後的正規化距離列表 [0.0~1.0, ...]
+    """
+    if len(points) != FINGERPRINT_SIZE:
+        raise ValueError(f"必須提供 5 個點，但收到 {len(points)} 個")
+
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3), (x4, y4) = points
+
+    # 計算質心（以 sum() 累加，與 calculate_centroid 相同）
+    cx = sum((x0, x1, x2, x3, x4)) / 5
+    cy = sum((y0, y1, y2, y3, y4)) / 5
+
+    # 計算每個點到質心的距離（與 euclidean_distance 相同）
+    sqrt = math.sqrt
+    d0 = sqrt((x0 - cx) ** 2 + (y0 - cy) ** 2)
+    d1 = sqrt((x1 - cx) ** 2 + (y1 - cy) ** 2)
+    d2 = sqrt((x2 - cx) ** 2 + (y2 - cy) ** 2)
+    d3 = sqrt((x3 - cx) ** 2 + (y3 - cy) ** 2)
+    d4 = sqrt((x4 - cx) ** 2 + (y4 - cy) ** 2)
+
+    # 找出最大距離作為正規化因子
+    max_distance = max(d0, d1, d2, d3, d4)
+
+    if max_distance == 0:
+        # 所有點都在同一位置，返回 [0.0, 0.0, 0.0, 0.0, 0.0]
+        return [0.0] * 5
+
+    # 正規化後排序：將距離除以最大距離，得到 0.0~1.0 的比例
+    normalized = [d0 / max_distance, d1 / max_distance, d2 / max_distance, d3 / max_distance, d4 / max_distance]
+    normalized.sort()
+    return normalized
+
+
+def calculate_mse(fingerprint1: Sequence[float], fingerprint2: Sequence[float]) -> float:
+    """
+    計算兩個指紋之間的均方誤差 (Mean Squared Error)
+
+    Args:
+        fingerprint1: 第一個指紋列表
+        fingerprint2: 第二個指紋列表
+
+    Returns:
+        MSE 值
+    """
+    if len(fingerprint1) != len(fingerprint2):
+        raise ValueError("兩個指紋的長度必須相同")
+
+    n = len(fingerprint1)
+    mse = sum((f1 - f2) ** 2 for f1, f2 in zip(fingerprint1, fingerprint2)) / n
+    return mse
+
+
+def calculate_max_error(fingerprint1: Sequence[float], fingerprint2: Sequence[float]) -> float:
+    """
+    計算兩個指紋之間的最大絕對誤差
+
+    Args:
+        fingerprint1: 第一個指紋列表
+        fingerprint2: 第二個指紋列表
+
+    Returns:
+        最大絕對誤差值
+    """
+    if len(fingerprint1) != len(fingerprint2):
+        raise ValueError("兩個指紋的長度必須相同")
+
+    max_error = max(abs(f1 - f2) for f1, f2 in zip(fingerprint1, fingerprint2))
+    return max_error
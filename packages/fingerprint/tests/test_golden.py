@@ -0,0 +1,68 @@
+"""
+golden vectors 與批次 API 的逐位元一致性測試
+
+    python -m pytest packages/fingerprint/tests
+"""
+import random
+
+import pytest
+
+from smart_stamp_fingerprint import get_normalized_fingerprint
+from smart_stamp_fingerprint.golden import check_golden_vectors, expected_fingerprint, load_golden_vectors
+
+
+def bits(values):
+    return [float(value).hex() for value in values]
+
+
+def random_points(rng: random.Random, count: int):
+    """不同尺度與偏移的隨機座標（涵蓋觸控座標、極小與遠離原點的點）"""
+    points = []
+    for _ in range(count):
+        scale = rng.choice([1e-3, 1.0, 500.0, 1e6])
+        offset = rng.choice([0.0, 0.0, 1e4, -5e5])
+        points.append([(rng.uniform(-1, 1) * scale + offset, rng.uniform(-1, 1) * scale + offset) for _ in range(5)])
+    return points
+
+
+def test_golden_vectors_scalar():
+    assert check_golden_vectors(batch=False) == []
+
+
+def test_golden_vectors_batch():
+    pytest.importorskip('numpy')
+    assert check_golden_vectors(batch=True) == []
+
+
+@pytest.mark.parametrize('vector', load_golden_vectors(), ids=lambda vector: vector['name'])
+def test_golden_vector(vector):
+    assert bits(get_normalized_fingerprint(vector['points'])) == bits(expected_fingerprint(vector))
+
+
+def test_batch_matches_scalar_on_random_points():
+    pytest.importorskip('numpy')
+    from smart_stamp_fingerprint.batch import get_normalized_fingerprints
+
+    points = random_points(random.Random(20240611), 20000)
+    fingerprints = get_normalized_fingerprints(points)
+    mismatches = [
+        index for index, (item, row) in enumerate(zip(points, fingerprints.tolist()))
+        if bits(get_normalized_fingerprint(item)) != bits(row)
+    ]
+    assert mismatches == []
+
+
+def test_python_sum_and_square_match_builtins():
+    np = pytest.importorskip('numpy')
+    from smart_stamp_fingerprint.batch import python_square, python_sum
+
+    rng = np.random.default_rng(7)
+    columns = [rng.uniform(-1, 1, 50000) * 10.0 ** rng.integers(-8, 8, 50000) for _ in range(5)]
+    expected = [sum(values) for values in zip(*(column.tolist() for column in columns))]
+    assert bits(python_sum(columns).tolist()) == bits(expected)
+
+    # 1e300 的平方溢位：與 ** 2 相同，逐一計算時拋出 OverflowError
+    with pytest.raises(OverflowError):
+        python_square(np.array([1e300]))
+    values = np.concatenate([columns[0], [0.0, -0.0, 2.0 ** -600, 2.0 ** 500, 1.0, 0.5, 3.0]])
+    assert bits(python_square(values.copy()).tolist()) == bits([value ** 2 for value in values.tolist()])
@@ -1,10 +1,13 @@
 #!/bin/bash
-# Smart Stamp Solution - 生成 RS256 密鑰對腳本
+# Smart Stamp Solution - 生成 JWT 簽章密鑰對腳本
+# 用法：./scripts/generate_keys.sh [RS256|ES256|EdDSA]（預設 RS256，需與 stamp-server 的 JWT_ALGORITHM 相同）
 
 set -e
 
+ALGORITHM="${1:-RS256}"
+
 echo "=========================================="
-echo "生成 RS256 密鑰對"
+echo "生成 $ALGORITHM 密鑰對"
 echo "=========================================="
 echo ""
 
@@ -14,12 +17,26 @@ mkdir -p customer/demo/keys
 
 # 生成私鑰
 echo "[1/2] 生成私鑰..."
-openssl genrsa -out stamp-server/keys/private_key.pem 2048
+case "$ALGORITHM" in
+    RS256)
+        openssl genrsa -out stamp-server/keys/private_key.pem 2048
+        ;;
+    ES256)
+        openssl ecparam -name prime256v1 -genkey -noout | openssl pkcs8 -topk8 -nocrypt -out stamp-server/keys/private_key.pem
+        ;;
+    EdDSA)
+        openssl genpkey -algorithm ed25519 -out stamp-server/keys/private_key.pem
+        ;;
+    *)
+        echo "  ✗ 不支援的演算法: $ALGORITHM（可用值: RS256, ES256, EdDSA）"
+        exit 1
+        ;;
+esac
 echo "  ✓ 私鑰已生成: stamp-server/keys/private_key.pem"
 
 # 生成公鑰
 echo "[2/2] 生成公鑰..."
-openssl rsa -in stamp-server/keys/private_key.pem -pubout -out stamp-server/keys/public_key.pem
+openssl pkey -in stamp-server/keys/private_key.pem -pubout -out stamp-server/keys/public_key.pem
 echo "  ✓ 公鑰已生成: stamp-server/keys/public_key.pem"
 
 # 複製公鑰到 customer/demo
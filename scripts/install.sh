@@ -69,14 +69,15 @@ echo "安裝 Python 依賴..."
 if [ -d "stamp-server/venv" ]; then
     echo "  安裝 stamp-server 依賴..."
     stamp-server/venv/bin/pip install --upgrade pip setuptools wheel
-    stamp-server/venv/bin/pip install -r stamp-server/requirements.txt
+    # requirements.txt 以相對路徑引用 packages/fingerprint，需在服務目錄中安裝
+    (cd stamp-server && venv/bin/pip install -r requirements.txt)
 fi
 
 # manager/backend
 if [ -d "manager/backend/venv" ]; then
     echo "  安裝 manager/backend 依賴..."
     manager/backend/venv/bin/pip install --upgrade pip setuptools wheel
-    manager/backend/venv/bin/pip install -r manager/backend/requirements.txt
+    (cd manager/backend && venv/bin/pip install -r requirements.txt)
 fi
 
 # 安裝 Node.js 依賴
@@ -27,10 +27,16 @@ CREATE TABLE IF NOT EXISTS stamp_registry (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(255) NOT NULL COMMENT '印章名稱',
     fingerprint JSON NOT NULL COMMENT '正規化指紋（JSON 陣列）',
+    fp_0 DOUBLE NULL COMMENT '指紋第 1 個值（碰撞偵測用，與 fingerprint 相同）',
+    fp_1 DOUBLE NULL COMMENT '指紋第 2 個值',
+    fp_2 DOUBLE NULL COMMENT '指紋第 3 個值',
+    fp_3 DOUBLE NULL COMMENT '指紋第 4 個值',
+    fp_4 DOUBLE NULL COMMENT '指紋第 5 個值',
     description TEXT COMMENT '印章描述',
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '建立時間',
     updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新時間',
-    INDEX idx_name (name)
+    INDEX idx_name (name),
+    INDEX idx_fingerprint (fp_0, fp_1, fp_2, fp_3)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='印章註冊表';
 
 -- 印章權限表（綁定客戶與印章）
@@ -48,11 +54,23 @@ CREATE TABLE IF NOT EXISTS stamp_permissions (
     FOREIGN KEY (stamp_id) REFERENCES stamp_registry(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='印章權限表';
 
+-- 註冊表變更紀錄（管理後台在同一交易中寫入，驗證伺服器依 id 遞增讀取以同步記憶體中的快取）
+CREATE TABLE IF NOT EXISTS registry_changes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL COMMENT '變更類型：stamp_created, stamp_deleted, client_created, client_updated, permission_granted, permission_revoked',
+    client_id INT NULL COMMENT '相關客戶 ID',
+    stamp_id INT NULL COMMENT '相關印章 ID',
+    fingerprint JSON NULL COMMENT '印章指紋（stamp_created / permission_granted 時附上，驗證伺服器不需再查詢）',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '建立時間',
+    INDEX idx_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='註冊表變更紀錄';
+
 USE app_business_db;
 
 -- 印章驗證日誌表
 CREATE TABLE IF NOT EXISTS stamping_logs (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT AUTO_INCREMENT,
+    log_uuid CHAR(32) NULL COMMENT '日誌唯一識別碼（重送本機暫存時避免重複寫入）',
     client_id INT NOT NULL COMMENT '客戶 ID',
     stamp_id INT NULL COMMENT '印章 ID（驗證失敗時為 NULL）',
     status VARCHAR(50) NOT NULL COMMENT '狀態：valid, invalid, error',
@@ -64,8 +82,48 @@ CREATE TABLE IF NOT EXISTS stamping_logs (
     INDEX idx_client_id (client_id),
     INDEX idx_stamp_id (stamp_id),
     INDEX idx_status (status),
-    INDEX idx_created_at (created_at)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='印章驗證日誌表';
+    INDEX idx_created_at (created_at),
+    PRIMARY KEY (id, created_at),
+    UNIQUE KEY uk_log_uuid (log_uuid, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='印章驗證日誌表'
+-- 依 created_at 每月分割：管理後台以 python -m app.core.log_archive ensure 由 pmax 切出每月的分割區，
+-- 過期的分割區以 archive 封存後刪除
+PARTITION BY RANGE COLUMNS(created_at) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- 驗證日誌每小時彙總（管理後台依 id 遞增彙總 stamping_logs，分析端點只讀取彙總表）
+CREATE TABLE IF NOT EXISTS stamping_rollup_hourly (
+    bucket DATETIME NOT NULL COMMENT '小時（整點）',
+    client_id INT NOT NULL COMMENT '客戶 ID',
+    stamp_id INT NOT NULL COMMENT '印章 ID（0 表示驗證失敗、沒有對應印章）',
+    status VARCHAR(50) NOT NULL COMMENT '狀態：valid, invalid, error',
+    count BIGINT NOT NULL DEFAULT 0 COMMENT '日誌筆數',
+    PRIMARY KEY (bucket, client_id, stamp_id, status),
+    INDEX idx_hourly_client_bucket (client_id, bucket),
+    INDEX idx_hourly_stamp_bucket (stamp_id, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='驗證日誌每小時彙總';
+
+-- 驗證日誌每日彙總
+CREATE TABLE IF NOT EXISTS stamping_rollup_daily (
+    bucket DATE NOT NULL COMMENT '日期',
+    client_id INT NOT NULL COMMENT '客戶 ID',
+    stamp_id INT NOT NULL COMMENT '印章 ID（0 表示驗證失敗、沒有對應印章）',
+    status VARCHAR(50) NOT NULL COMMENT '狀態：valid, invalid, error',
+    count BIGINT NOT NULL DEFAULT 0 COMMENT '日誌筆數',
+    PRIMARY KEY (bucket, client_id, stamp_id, status),
+    INDEX idx_daily_client_bucket (client_id, bucket),
+    INDEX idx_daily_stamp_bucket (stamp_id, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='驗證日誌每日彙總';
+
+-- 彙總進度（高水位）
+CREATE TABLE IF NOT EXISTS stamping_rollup_state (
+    name VARCHAR(64) NOT NULL PRIMARY KEY COMMENT '彙總名稱',
+    last_log_id BIGINT NOT NULL DEFAULT 0 COMMENT '已彙總到的 stamping_logs.id',
+    observed_max_id BIGINT NOT NULL DEFAULT 0 COMMENT '上次記錄的 MAX(id)，經過 ROLLUP_LAG_SECONDS 後才彙總到這裡',
+    observed_at DATETIME NULL COMMENT '記錄 observed_max_id 的時間',
+    updated_at DATETIME NULL COMMENT '上次彙總的時間'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='驗證日誌彙總進度';
 
 -- ==================== 完成 ====================
 
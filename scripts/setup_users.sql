@@ -18,6 +18,12 @@ CREATE USER IF NOT EXISTS 'admin_dashboard'@'%' IDENTIFIED BY 'admin_pass';
 -- 授予 admin_dashboard 對 stamp_core_db 的完整權限
 GRANT ALL PRIVILEGES ON stamp_core_db.* TO 'admin_dashboard'@'%';
 
+-- 授予 admin_dashboard 讀取驗證日誌與維護彙總表的權限（驗證統計）
+GRANT SELECT ON app_business_db.stamping_logs TO 'admin_dashboard'@'%';
+GRANT ALL PRIVILEGES ON app_business_db.stamping_rollup_hourly TO 'admin_dashboard'@'%';
+GRANT ALL PRIVILEGES ON app_business_db.stamping_rollup_daily TO 'admin_dashboard'@'%';
+GRANT ALL PRIVILEGES ON app_business_db.stamping_rollup_state TO 'admin_dashboard'@'%';
+
 -- 刷新權限
 FLUSH PRIVILEGES;
 
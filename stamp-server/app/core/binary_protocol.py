@@ -0,0 +1,125 @@
+"""
+二進位驗證協定：供高頻率印章裝置使用的固定長度格式（POST /api/v1/verify/binary）
+
+請求本文固定 80 位元組：10 個 little-endian float64，依序為 x1, y1, x2, y2, ..., x5, y5。
+只檢查長度與數值是否有限，不經過 JSON 解析與 Pydantic 驗證。
+
+回應本文為 17 位元組的標頭加上兩個 UTF-8 字串：
+    status      uint8   0 = valid、1 = invalid、2 = error
+    stamp_id    int64   沒有時為 -1
+    jwt 長度    uint32
+    message 長度 uint32
+    jwt_token、message
+HTTP 狀態碼與 /api/v1/verify 相同；非 200 的回應中 message 即 JSON 版本的 detail。
+
+WebSocket 工作階段（/api/v1/verify/ws）的二進位訊框在前面加上請求 ID：
+    請求：request_id（uint32）+ 80 位元組座標
+    回應：request_id（uint32）+ code（uint16，對應 HTTP 狀態碼）+ 上述回應本文
+"""
+import math
+import struct
+from typing import List, Optional, Tuple
+
+MEDIA_TYPE = 'application/octet-stream'
+
+REQUEST_FORMAT = struct.Struct('<10d')
+RESPONSE_HEADER = struct.Struct('<BqII')
+SESSION_REQUEST_HEADER = struct.Struct('<I')
+SESSION_RESPONSE_HEADER = struct.Struct('<IH')
+
+STATUS_VALID = 0
+STATUS_INVALID = 1
+STATUS_ERROR = 2
+STATUS_CODES = {'valid': STATUS_VALID, 'invalid': STATUS_INVALID, 'error': STATUS_ERROR}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+def error_status(status_code: int) -> str:
+    """非 200 回應的 status：指紋不匹配或無法計算（400）為 invalid，其餘為 error"""
+    return 'invalid' if status_code == 400 else 'error'
+
+
+def encode_points(points) -> bytes:
+    """將 5 點座標編碼為請求本文（裝置端與測試使用）"""
+    return REQUEST_FORMAT.pack(*(value for point in points for value in point))
+
+
+def decode_points(body: bytes) -> List[Tuple[float, float]]:
+    """
+    解碼請求本文
+
+    Returns:
+        5 點座標 [(x, y), ...]
+
+    Raises:
+        ValueError: 長度不是 80 位元組，或座標不是有限的數值
+    """
+    if len(body) != REQUEST_FORMAT.size:
+        raise ValueError(f"請求本文必須是 {REQUEST_FORMAT.size} 位元組，但收到 {len(body)} 位元組")
+    values = REQUEST_FORMAT.unpack(body)
+    if not all(map(math.isfinite, values)):
+        raise ValueError("座標必須是有限的數值")
+    return list(zip(values[0::2], values[1::2]))
+
+
+def encode_response(status: str, message: str, stamp_id: Optional[int] = None, jwt_token: Optional[str] = None) -> bytes:
+    """編碼回應本文"""
+    token = jwt_token.encode('ascii') if jwt_token else b''
+    text = message.encode('utf-8')
+    header = RESPONSE_HEADER.pack(
+        STATUS_CODES[status],
+        -1 if stamp_id is None else stamp_id,
+        len(token),
+        len(text)
+    )
+    return header + token + text
+
+
+def decode_response(data: bytes) -> dict:
+    """解碼回應本文（欄位與 VerifyResponse 相同）"""
+    status, stamp_id, token_length, text_length = RESPONSE_HEADER.unpack_from(data)
+    start = RESPONSE_HEADER.size
+    token = data[start:start + token_length].decode('ascii')
+    message = data[start + token_length:start + token_length + text_length].decode('utf-8')
+    return {
+        'status': STATUS_NAMES[status],
+        'stamp_id': None if stamp_id < 0 else stamp_id,
+        'jwt_token': token or None,
+        'message': message,
+    }
+
+
+def encode_session_request(request_id: int, points) -> bytes:
+    """編碼 WebSocket 工作階段的請求訊框（裝置端與測試使用）"""
+    return SESSION_REQUEST_HEADER.pack(request_id) + encode_points(points)
+
+
+def split_session_request(frame: bytes) -> Tuple[int, bytes]:
+    """
+    取出 WebSocket 工作階段請求訊框的請求 ID 與座標本文（座標以 decode_points 解碼）
+
+    Raises:
+        ValueError: 訊框短於請求 ID
+    """
+    if len(frame) < SESSION_REQUEST_HEADER.size:
+        raise ValueError(f"訊框至少需要 {SESSION_REQUEST_HEADER.size} 位元組的請求 ID")
+    request_id, = SESSION_REQUEST_HEADER.unpack_from(frame)
+    return request_id, frame[SESSION_REQUEST_HEADER.size:]
+
+
+def encode_session_response(
+    request_id: int,
+    code: int,
+    status: str,
+    message: str,
+    stamp_id: Optional[int] = None,
+    jwt_token: Optional[str] = None
+) -> bytes:
+    """編碼 WebSocket 工作階段的回應訊框"""
+    return SESSION_RESPONSE_HEADER.pack(request_id, code) + encode_response(status, message, stamp_id, jwt_token)
+
+
+def decode_session_response(frame: bytes) -> dict:
+    """解碼 WebSocket 工作階段的回應訊框（request_id、code 加上 VerifyResponse 的欄位）"""
+    request_id, code = SESSION_RESPONSE_HEADER.unpack_from(frame)
+    return {'request_id': request_id, 'code': code, **decode_response(frame[SESSION_RESPONSE_HEADER.size:])}
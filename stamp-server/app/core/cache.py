@@ -0,0 +1,464 @@
+"""
+快取模組：驗證伺服器的行程內快取
+包含通用的 LRU + TTL 快取，以及以 client_id 為鍵的印章指紋快取
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.change_feed import PERMISSION_GRANTED, PERMISSION_REVOKED, STAMP_DELETED
+from app.core.fingerprint_index import FingerprintGridIndex
+from app.core.matcher import (
+    FINGERPRINT_SIZE, MatchResult, as_fingerprint_matrix, find_best_within, find_best_within_many
+)
+
+# 指紋快取配置（可配置）
+# 最多快取的客戶數量，超過時淘汰最久未使用的客戶
+FINGERPRINT_CACHE_MAX_CLIENTS = int(os.getenv('FINGERPRINT_CACHE_MAX_CLIENTS', '1024'))
+# 快取存活時間（秒），過期後下一次請求會重新查詢資料庫
+FINGERPRINT_CACHE_TTL = float(os.getenv('FINGERPRINT_CACHE_TTL', '60'))
+# 客戶印章數量達到此門檻時改用網格索引查詢，低於門檻時線性掃描較快
+# （門檻可用 benchmarks.fingerprint_index 量測）
+FINGERPRINT_INDEX_MIN_STAMPS = int(os.getenv('FINGERPRINT_INDEX_MIN_STAMPS', '1000'))
+# 使用共享快照時最多保留的快照後變更筆數，超過時（通常是建立者長時間無法重建）改回從資料庫載入
+FINGERPRINT_SNAPSHOT_MAX_OVERLAY = int(os.getenv('FINGERPRINT_SNAPSHOT_MAX_OVERLAY', '10000'))
+
+
+class TTLCache:
+    """有容量上限（LRU 淘汰）與存活時間（TTL）的執行緒安全快取"""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        初始化快取
+
+        Args:
+            maxsize: 最大項目數量，超過時淘汰最久未使用的項目
+            ttl: 項目存活時間（秒）
+            clock: 時間來源（預設 time.monotonic）
+        """
+        if maxsize <= 0:
+            raise ValueError("快取容量必須大於 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """取得快取值；不存在或已過期時返回 default"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """寫入快取值，可指定個別的存活時間"""
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """取得快取值但不更新統計與使用順序（已過期的項目也會返回）"""
+        with self._lock:
+            item = self._data.get(key)
+            return default if item is None else item[0]
+
+    def values(self) -> List[Any]:
+        """所有快取值的快照"""
+        with self._lock:
+            return [value for value, _ in self._data.values()]
+
+    def invalidate(self, key: Hashable) -> bool:
+        """移除單一項目，返回是否確實移除"""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """移除所有符合條件的項目，返回移除數量"""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """清空快取"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """取得快取統計資料"""
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+@dataclass
+class ClientStamps:
+    """
+    單一客戶可用的印章集合（已解碼為連續的數值陣列）
+
+    stamp_ids[i] 對應 fingerprints[i]；印章數量較多時會另外建立網格索引。
+    有權限但沒有指紋或指紋格式不符的印章無法比對，只記錄在 unmatchable 中。
+    """
+    stamp_ids: np.ndarray
+    fingerprints: np.ndarray
+    unmatchable: Set[int] = field(default_factory=set)
+    index: Optional[FingerprintGridIndex] = field(default=None, repr=False)
+
+    @classmethod
+    def build(
+        cls,
+        stamp_ids: Sequence[int],
+        fingerprints: List[Sequence[float]],
+        unmatchable: Iterable[int] = ()
+    ) -> 'ClientStamps':
+        """由印章 ID 與指紋列表建立"""
+        return cls(
+            stamp_ids=np.asarray(stamp_ids, dtype=np.int64),
+            fingerprints=as_fingerprint_matrix(fingerprints),
+            unmatchable=set(unmatchable)
+        )
+
+    @property
+    def permission_count(self) -> int:
+        """有效權限數量（含無法比對的印章）"""
+        return len(self.stamp_ids) + len(self.unmatchable)
+
+    def __len__(self) -> int:
+        """可比對的印章數量"""
+        return len(self.stamp_ids)
+
+    def __contains__(self, stamp_id: int) -> bool:
+        return stamp_id in self.unmatchable or bool((self.stamp_ids == stamp_id).any())
+
+    def add_stamp(self, stamp_id: int, fingerprint: Optional[Sequence[float]]) -> bool:
+        """
+        新增一枚印章（授予權限時呼叫），已存在時不做任何事
+
+        陣列以新物件取代而不是原地修改，正在使用舊陣列的比對不受影響。
+
+        Returns:
+            是否確實新增
+        """
+        if stamp_id in self:
+            return False
+        # 與 load_client_stamps 相同：沒有指紋或格式不符的印章只計入權限
+        if not fingerprint or len(fingerprint) != FINGERPRINT_SIZE:
+            self.unmatchable.add(stamp_id)
+            return True
+        self.stamp_ids = np.append(self.stamp_ids, np.int64(stamp_id))
+        self.fingerprints = np.vstack([self.fingerprints, as_fingerprint_matrix(fingerprint)])
+        if self.index is not None:
+            self.index.insert(stamp_id, fingerprint)
+        return True
+
+    def remove_stamp(self, stamp_id: int) -> bool:
+        """
+        移除一枚印章（撤銷權限或刪除印章時呼叫），不存在時不做任何事
+
+        Returns:
+            是否確實移除
+        """
+        if stamp_id in self.unmatchable:
+            self.unmatchable.remove(stamp_id)
+            return True
+        keep = self.stamp_ids != stamp_id
+        if keep.all():
+            return False
+        self.stamp_ids = self.stamp_ids[keep]
+        self.fingerprints = self.fingerprints[keep]
+        if self.index is not None:
+            self.index.delete(stamp_id)
+        return True
+
+    def best_match(self, fingerprint: Sequence[float], max_error_tolerance: float) -> Optional[MatchResult]:
+        """
+        找出最大誤差小於容差的印章中 MSE 最小者
+
+        印章數量達到 FINGERPRINT_INDEX_MIN_STAMPS 時第一次查詢會建立網格索引，
+        之後以索引查詢；否則以單次向量化運算線性掃描。兩者結果相同。
+        """
+        index = self._usable_index(max_error_tolerance)
+        if index is not None:
+            return index.query(fingerprint, max_error_tolerance)
+        return find_best_within(self.stamp_ids, self.fingerprints, fingerprint, max_error_tolerance)
+
+    def best_matches(self, fingerprints, max_error_tolerance: float) -> List[Optional[MatchResult]]:
+        """批次版的 best_match：依輸入順序返回每個指紋的比對結果"""
+        index = self._usable_index(max_error_tolerance)
+        if index is not None:
+            return [index.query(fingerprint, max_error_tolerance) for fingerprint in fingerprints]
+        return find_best_within_many(self.stamp_ids, self.fingerprints, fingerprints, max_error_tolerance)
+
+    def _usable_index(self, max_error_tolerance: float) -> Optional[FingerprintGridIndex]:
+        """印章數量達到門檻時建立（或取得）網格索引"""
+        if self.index is None and len(self) >= FINGERPRINT_INDEX_MIN_STAMPS:
+            self.index = FingerprintGridIndex.build(
+                self.stamp_ids, self.fingerprints, cell_size=2 * max_error_tolerance
+            )
+        if self.index is not None and self.index.cell_size >= 2 * max_error_tolerance:
+            return self.index
+        return None
+
+
+async def load_client_stamps(core_db, client_id: int) -> ClientStamps:
+    """
+    從核心資料庫載入客戶可用的印章並解碼指紋（單次 JOIN 查詢）
+
+    Args:
+        core_db: 核心資料庫非同步 session
+        client_id: 客戶 ID
+
+    Returns:
+        ClientStamps
+    """
+    from app.models import StampRegistry, StampPermission
+
+    result = await core_db.execute(
+        select(StampRegistry.id, StampRegistry.fingerprint)
+        .join(StampPermission, StampPermission.stamp_id == StampRegistry.id)
+        .where(
+            StampPermission.client_id == client_id,
+            StampPermission.is_active == True
+        )
+    )
+    rows = result.all()
+
+    stamp_ids = []
+    fingerprints = []
+    unmatchable = []
+    for stamp_id, stored_fingerprint in rows:
+        # 沒有指紋或格式不符的印章無法比對，只計入權限
+        if not stored_fingerprint or len(stored_fingerprint) != FINGERPRINT_SIZE:
+            unmatchable.append(stamp_id)
+            continue
+        stamp_ids.append(stamp_id)
+        fingerprints.append(stored_fingerprint)
+
+    return ClientStamps.build(stamp_ids, fingerprints, unmatchable)
+
+
+class FingerprintCache:
+    """
+    以 client_id 為鍵的印章指紋快取
+
+    使用共享快照（registry_snapshot）時，未命中的客戶直接由快照的陣列切片建立，
+    再套用快照之後的變更（overlay），不查詢資料庫。
+    """
+
+    def __init__(self, maxsize: int = FINGERPRINT_CACHE_MAX_CLIENTS, ttl: float = FINGERPRINT_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # 載入中的客戶：同一客戶同時未命中時只查詢一次資料庫
+        self._loading: Dict[int, asyncio.Future] = {}
+        # 每次失效都會遞增；載入期間若發生失效，載入結果不寫入快取
+        self._generation = 0
+        # 共享快照與快照之後的變更（變更 id → (類型, client_id, stamp_id, 指紋)）
+        self.snapshot = None
+        self._overlay: Dict[int, tuple] = {}
+        self.snapshot_loads = 0
+        # 最後一次完整重新同步的時間：在此之前開始讀取資料庫的快照可能遺漏變更，不再使用
+        self._resync_at = 0.0
+
+    @property
+    def overlay_size(self) -> int:
+        return len(self._overlay)
+
+    @property
+    def generation(self) -> int:
+        """每次變更或清除快取時遞增（WebSocket 工作階段據此判斷保留的印章是否需要重新取得）"""
+        return self._generation
+
+    async def get_client_stamps(self, client_id: int, core_db) -> ClientStamps:
+        """
+        取得客戶可用的印章；快取未命中時從共享快照或資料庫載入
+
+        Args:
+            client_id: 客戶 ID
+            core_db: 核心資料庫非同步 session（僅在未命中且沒有快照時使用）
+        """
+        stamps = self._cache.get(client_id)
+        if stamps is not None:
+            return stamps
+
+        if self.snapshot is not None:
+            stamps = self._from_snapshot(client_id)
+            self._cache.set(client_id, stamps)
+            self.snapshot_loads += 1
+            return stamps
+
+        pending = self._loading.get(client_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[client_id] = future
+        generation = self._generation
+        try:
+            stamps = await load_client_stamps(core_db, client_id)
+        except Exception as e:
+            future.set_exception(e)
+            # 標記例外已被取用，沒有其他等待者時不會產生警告
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._loading.pop(client_id, None)
+
+        if generation == self._generation:
+            self._cache.set(client_id, stamps)
+        future.set_result(stamps)
+        return stamps
+
+    def _from_snapshot(self, client_id: int) -> ClientStamps:
+        """由快照的陣列切片建立客戶的印章（不複製），再依序套用快照之後的變更"""
+        found = self.snapshot.lookup(client_id)
+        if found is None:
+            stamps = ClientStamps.build([], [])
+        else:
+            stamp_ids, fingerprints, unmatchable = found
+            stamps = ClientStamps(stamp_ids, fingerprints, set(unmatchable.tolist()))
+
+        for change_id in sorted(self._overlay):
+            kind, change_client_id, stamp_id, fingerprint, _ = self._overlay[change_id]
+            if kind == STAMP_DELETED:
+                stamps.remove_stamp(stamp_id)
+            elif change_client_id != client_id:
+                continue
+            elif kind == PERMISSION_GRANTED:
+                stamps.add_stamp(stamp_id, fingerprint)
+            elif kind == PERMISSION_REVOKED:
+                stamps.remove_stamp(stamp_id)
+        return stamps
+
+    def use_snapshot(self, snapshot) -> None:
+        """
+        改用新的共享快照（None 表示改回從資料庫載入）
+
+        快照已包含的變更從 overlay 移除；已快取的客戶清空，之後由新快照重新建立。
+        id 不大於快照 change_id 的變更可能較晚 commit 而不在快照中，只有在快照開始讀取資料庫
+        （collected_at）之前就已讀取到的變更才確定包含在快照中。
+        完整重新同步之前開始讀取資料庫的快照不使用，繼續從資料庫載入。
+        """
+        if snapshot is not None and snapshot.collected_at < self._resync_at:
+            snapshot = None
+        self.snapshot = snapshot
+        if snapshot is None:
+            self._overlay = {}
+        else:
+            self._overlay = {
+                change_id: change for change_id, change in self._overlay.items()
+                if change_id > snapshot.change_id or change[-1] >= snapshot.collected_at
+            }
+        self.clear()
+
+    def apply_change(
+        self,
+        change_id: int,
+        kind: str,
+        client_id: Optional[int],
+        stamp_id: Optional[int],
+        fingerprint: Optional[Sequence[float]],
+        late: bool = False
+    ) -> None:
+        """
+        套用一筆印章或權限變更
+
+        使用快照時，快照之後的變更（以及較晚 commit、可能未包含在快照中的變更）連同讀取到的時間
+        記錄在 overlay，之後由快照建立的客戶也會套用；重複套用同一筆變更不會有影響。
+        """
+        if self.snapshot is not None and (late or change_id > self.snapshot.change_id):
+            self._overlay[change_id] = (kind, client_id, stamp_id, fingerprint, time.time())
+            if len(self._overlay) > FINGERPRINT_SNAPSHOT_MAX_OVERLAY:
+                print("警告：共享快照之後的變更過多，改回從資料庫載入")
+                self.use_snapshot(None)
+
+        if kind == PERMISSION_GRANTED:
+            self.apply_permission_granted(client_id, stamp_id, fingerprint)
+        elif kind == PERMISSION_REVOKED:
+            self.apply_permission_revoked(client_id, stamp_id)
+        elif kind == STAMP_DELETED:
+            self.apply_stamp_deleted(stamp_id)
+
+    def apply_permission_granted(self, client_id: int, stamp_id: int, fingerprint: Optional[Sequence[float]]) -> bool:
+        """將授予的權限套用到已快取的客戶（未快取的客戶下次載入時自然包含），返回是否有變更"""
+        self._generation += 1
+        stamps = self._cache.peek(client_id)
+        return stamps is not None and stamps.add_stamp(stamp_id, fingerprint)
+
+    def apply_permission_revoked(self, client_id: int, stamp_id: int) -> bool:
+        """從已快取的客戶移除被撤銷的印章，返回是否有變更"""
+        self._generation += 1
+        stamps = self._cache.peek(client_id)
+        return stamps is not None and stamps.remove_stamp(stamp_id)
+
+    def apply_stamp_deleted(self, stamp_id: int) -> int:
+        """從所有已快取的客戶移除被刪除的印章，返回受影響的客戶數量"""
+        self._generation += 1
+        return sum(1 for stamps in self._cache.values() if stamps.remove_stamp(stamp_id))
+
+    def invalidate_client(self, client_id: int) -> bool:
+        """使單一客戶的快取失效"""
+        self._generation += 1
+        return self._cache.invalidate(client_id)
+
+    def invalidate_stamp(self, stamp_id: int) -> int:
+        """使所有包含該印章的客戶快取失效（印章更新或刪除時呼叫）"""
+        self._generation += 1
+        return self._cache.invalidate_where(lambda _, stamps: stamp_id in stamps)
+
+    def clear(self) -> None:
+        """清空所有客戶的快取"""
+        self._generation += 1
+        self._cache.clear()
+
+    def resync(self) -> None:
+        """可能遺漏了變更時呼叫：清空快取並改從資料庫載入，直到映射在此之後建立的共享快照"""
+        self._resync_at = time.time()
+        self.use_snapshot(None)
+
+    def stats(self) -> dict:
+        """取得快取統計資料"""
+        return {**self._cache.stats(), 'snapshot_loads': self.snapshot_loads}
+
+
+# 全域指紋快取
+fingerprint_cache = FingerprintCache()
@@ -0,0 +1,279 @@
+"""
+註冊表變更同步模組：依 id 遞增讀取管理後台寫入的 registry_changes，只把變更套用到記憶體中的快取
+
+每個 worker 各自輪詢（預設每 0.5 秒一次以主鍵範圍查詢），驗證請求本身不需要查詢資料庫確認資料是否變更。
+"""
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select
+
+from app.models import RegistryChange
+
+# 變更同步配置（可配置）
+# 是否啟用變更同步（停用時快取只依 TTL 失效）
+CHANGE_FEED_ENABLED = os.getenv('CHANGE_FEED_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# 輪詢間隔（秒）
+CHANGE_FEED_INTERVAL = float(os.getenv('CHANGE_FEED_INTERVAL', '0.5'))
+# 每次最多讀取的變更筆數（讀滿時立即再讀下一批）
+CHANGE_FEED_BATCH_SIZE = int(os.getenv('CHANGE_FEED_BATCH_SIZE', '1000'))
+# id 不連續時等待缺漏 id 出現的時間（秒）：AUTO_INCREMENT 的 id 不保證依 commit 順序出現，
+# 較晚 commit 的交易可能拿到較小的 id；逾時後無法確定是否遺漏變更，清空快取並重新建立共享快照
+CHANGE_FEED_GAP_TIMEOUT = float(os.getenv('CHANGE_FEED_GAP_TIMEOUT', '10'))
+# 同時追蹤的缺漏範圍上限（每段範圍不限 id 數量；超過時放棄最早的範圍並完整重新同步）
+CHANGE_FEED_MAX_GAPS = int(os.getenv('CHANGE_FEED_MAX_GAPS', '100'))
+# 失敗時的重試間隔上限（秒）
+CHANGE_FEED_MAX_BACKOFF = 5.0
+
+# 變更類型（與 manager/backend/app/core/changes.py 相同）
+STAMP_CREATED = 'stamp_created'
+STAMP_DELETED = 'stamp_deleted'
+CLIENT_CREATED = 'client_created'
+CLIENT_UPDATED = 'client_updated'
+PERMISSION_GRANTED = 'permission_granted'
+PERMISSION_REVOKED = 'permission_revoked'
+
+
+class RegistryChangeFeed:
+    """registry_changes 的增量讀取器"""
+
+    def __init__(
+        self,
+        session_factory,
+        fingerprint_cache,
+        api_key_cache,
+        interval: float = CHANGE_FEED_INTERVAL,
+        batch_size: int = CHANGE_FEED_BATCH_SIZE,
+        gap_timeout: float = CHANGE_FEED_GAP_TIMEOUT
+    ):
+        """
+        初始化讀取器
+
+        Args:
+            session_factory: 核心資料庫的非同步 Session 工廠
+            fingerprint_cache: 指紋快取
+            api_key_cache: API Key 快取
+            interval: 輪詢間隔（秒）
+            batch_size: 每次最多讀取的筆數
+            gap_timeout: 等待缺漏 id 的時間（秒）
+        """
+        self.session_factory = session_factory
+        self.fingerprint_cache = fingerprint_cache
+        self.api_key_cache = api_key_cache
+        self.interval = interval
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        # 已讀取的最大 id；None 表示尚未取得起點
+        self.last_id: Optional[int] = None
+        # 尚未取得起點前映射了註冊表快照時，起點不超過快照的 change_id
+        self._rewind_to: Optional[int] = None
+        # 尚未出現的 id 範圍：起點 → (終點（不含）, 放棄等待的時間)
+        self._gaps: Dict[int, Tuple[int, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # 套用每筆變更後呼叫的監聽器 (kind, client_id, stamp_id)
+        self.listeners: List[Callable[[str, Optional[int], Optional[int]], None]] = []
+
+        # 統計資料
+        self.applied = 0
+        self.errors = 0
+        self.resyncs = 0
+        self.last_success: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """啟動背景輪詢任務（應用程式啟動時呼叫）"""
+        if self.running:
+            return
+        try:
+            await self._establish_baseline()
+        except Exception as e:
+            # 稍後由背景任務重試；在那之前快取只依 TTL 失效
+            self.errors += 1
+            print(f"警告：讀取變更紀錄起點失敗，稍後重試: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止背景任務（只有讀取，直接取消即可）"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _establish_baseline(self) -> None:
+        """
+        以目前最大的 id 作為起點
+
+        起點之前的變更已反映在資料庫中；若取得起點前已有請求載入快取，
+        載入時間與起點之間的變更無從得知，因此清空快取。
+        已映射註冊表快照時從快照的 change_id 開始，補上快照之後的變更。
+        """
+        async with self.session_factory() as db:
+            max_id = (await db.execute(select(func.max(RegistryChange.id)))).scalar()
+        self.last_id = max_id or 0
+        if self._rewind_to is not None:
+            self.last_id = min(self.last_id, self._rewind_to)
+            self._rewind_to = None
+        self.fingerprint_cache.clear()
+        self.api_key_cache.clear()
+        self.last_success = time.monotonic()
+
+    async def poll(self) -> int:
+        """讀取並套用一批變更，返回讀取的筆數"""
+        if self.last_id is None:
+            await self._establish_baseline()
+            return 0
+
+        now = time.monotonic()
+        expired = [first for first, (_, deadline) in self._gaps.items() if deadline <= now]
+        if expired:
+            for first in expired:
+                del self._gaps[first]
+            self.resync(f"等待缺漏的變更紀錄 id 逾時（{len(expired)} 段）")
+
+        condition = or_(
+            RegistryChange.id > self.last_id,
+            *(RegistryChange.id.between(first, end - 1) for first, (end, _) in self._gaps.items())
+        )
+
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(
+                    RegistryChange.id,
+                    RegistryChange.kind,
+                    RegistryChange.client_id,
+                    RegistryChange.stamp_id,
+                    RegistryChange.fingerprint
+                )
+                .where(condition)
+                .order_by(RegistryChange.id)
+                .limit(self.batch_size)
+            )
+            rows = result.all()
+
+        for row in rows:
+            late = self._fill_gap(row.id)
+            if not late and row.id > self.last_id:
+                self._track_gap(self.last_id + 1, row.id, now)
+                self.last_id = row.id
+            self.apply(row.id, row.kind, row.client_id, row.stamp_id, row.fingerprint, late=late)
+
+        self.last_success = time.monotonic()
+        return len(rows)
+
+    def _track_gap(self, first: int, end: int, now: float) -> None:
+        """記錄 [first, end) 之間尚未出現的 id（以範圍記錄，大量寫入的交易也能完整追蹤）"""
+        if first >= end:
+            return
+        if len(self._gaps) >= CHANGE_FEED_MAX_GAPS:
+            oldest = min(self._gaps, key=lambda start: self._gaps[start][1])
+            del self._gaps[oldest]
+            self.resync("缺漏的變更紀錄 id 範圍過多")
+        self._gaps[first] = (end, now + self.gap_timeout)
+
+    def _fill_gap(self, change_id: int) -> bool:
+        """缺漏的 id 出現時從範圍中移除，返回是否為缺漏的 id"""
+        for first, (end, deadline) in self._gaps.items():
+            if first <= change_id < end:
+                break
+        else:
+            return False
+        del self._gaps[first]
+        if first < change_id:
+            self._gaps[first] = (change_id, deadline)
+        if change_id + 1 < end:
+            self._gaps[change_id + 1] = (end, deadline)
+        return True
+
+    def resync(self, reason: str) -> None:
+        """
+        無法確定是否遺漏變更時完整重新同步
+
+        清空指紋與 API Key 快取；指紋快取停用目前的共享快照、改從資料庫載入，
+        直到映射在此之後才開始讀取資料庫的快照（建立者看到沒有可用的快照時會重建）。
+        """
+        print(f"警告：{reason}，清空快取並重新建立註冊表快照")
+        self.fingerprint_cache.resync()
+        self.api_key_cache.clear()
+        self.resyncs += 1
+
+    def rewind(self, change_id: int) -> None:
+        """
+        從較早的 id 重新讀取（改用較舊的共享快照時呼叫，快照之後的變更需要重新套用）
+
+        尚未取得起點時（例如資料庫無法連線）記錄下來，取得起點時從該 id 開始。
+        """
+        if self.last_id is None:
+            self._rewind_to = change_id
+        elif change_id < self.last_id:
+            self.last_id = change_id
+
+    def apply(
+        self,
+        change_id: int,
+        kind: str,
+        client_id: Optional[int],
+        stamp_id: Optional[int],
+        fingerprint: Optional[List[float]],
+        late: bool = False
+    ) -> None:
+        """
+        將單筆變更套用到快取
+
+        Args:
+            late: 是否為較晚出現的缺漏 id（可能未包含在 id 較大的共享快照中）
+        """
+        if kind in (PERMISSION_GRANTED, PERMISSION_REVOKED, STAMP_DELETED):
+            self.fingerprint_cache.apply_change(change_id, kind, client_id, stamp_id, fingerprint, late=late)
+        elif kind in (CLIENT_CREATED, CLIENT_UPDATED):
+            # 清除該客戶的 API Key 快取與無效 Key 的負向快取
+            self.api_key_cache.invalidate_client(client_id)
+        elif kind == STAMP_CREATED:
+            # 新印章尚未授權給任何客戶，快取不需要變更
+            pass
+        else:
+            # 未知的變更類型：使相關項目失效，由下一次請求重新載入
+            if client_id is not None:
+                self.api_key_cache.invalidate_client(client_id)
+                self.fingerprint_cache.invalidate_client(client_id)
+            if stamp_id is not None:
+                self.fingerprint_cache.invalidate_stamp(stamp_id)
+        for listener in self.listeners:
+            listener(kind, client_id, stamp_id)
+        self.applied += 1
+
+    async def _run(self) -> None:
+        """背景任務：持續輪詢；讀滿一批時立即讀取下一批"""
+        backoff = self.interval
+        while True:
+            try:
+                count = await self.poll()
+                backoff = self.interval
+            except Exception as e:
+                self.errors += 1
+                print(f"警告：讀取變更紀錄失敗，{backoff:.1f} 秒後重試: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, CHANGE_FEED_MAX_BACKOFF)
+                continue
+            if count < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        """取得同步狀態（最後讀取的 id、距離上次成功讀取的秒數等）"""
+        return {
+            'running': self.running,
+            'last_id': self.last_id,
+            'applied': self.applied,
+            'errors': self.errors,
+            'pending_gaps': sum(end - first for first, (end, _) in self._gaps.items()),
+            'resyncs': self.resyncs,
+            'seconds_since_success': time.monotonic() - self.last_success if self.last_success else None,
+        }
@@ -0,0 +1,152 @@
+"""
+指紋空間索引：以 [0,1]^5 上的均勻網格加速「最大誤差容差（L∞ 方框）內 MSE 最小的印章」查詢
+支援逐筆新增與刪除，印章校正或移除時不需重建整個索引
+"""
+import itertools
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.matcher import FINGERPRINT_SIZE, MatchResult, calculate_errors, select_best
+
+
+class FingerprintGridIndex:
+    """
+    指紋均勻網格索引
+
+    每個維度切成寬度為 cell_size 的格子，印章依指紋落在的格子分桶。
+    cell_size 不小於兩倍容差時，方框查詢在每個維度最多只會跨越 2 格，
+    因此每次查詢最多檢查 2^5 個格子，與印章總數無關。
+    """
+
+    def __init__(self, cell_size: float, capacity: int = 64):
+        """
+        初始化索引
+
+        Args:
+            cell_size: 格子寬度（建議為最大誤差容差的兩倍）
+            capacity: 初始容量
+        """
+        if cell_size <= 0:
+            raise ValueError("格子寬度必須大於 0")
+        self.cell_size = cell_size
+        # 每個維度的格子數量（指紋值介於 0.0~1.0）
+        self._cells_per_dim = int(np.floor(1.0 / cell_size)) + 1
+        self._stamp_ids = np.zeros(capacity, dtype=np.int64)
+        self._fingerprints = np.zeros((capacity, FINGERPRINT_SIZE), dtype=np.float64)
+        self._slot_of: Dict[int, int] = {}
+        self._cell_of_slot: Dict[int, int] = {}
+        self._cells: Dict[int, List[int]] = {}
+        self._free: List[int] = []
+        self._size = 0
+
+    @classmethod
+    def build(cls, stamp_ids: Sequence[int], fingerprints: np.ndarray, cell_size: float) -> 'FingerprintGridIndex':
+        """由既有的印章建立索引"""
+        index = cls(cell_size=cell_size, capacity=max(len(stamp_ids), 1))
+        for stamp_id, fingerprint in zip(stamp_ids, fingerprints):
+            index.insert(int(stamp_id), fingerprint)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, stamp_id: int) -> bool:
+        return stamp_id in self._slot_of
+
+    def _coords(self, values: np.ndarray) -> np.ndarray:
+        """指紋值 → 各維度的格子座標"""
+        coords = np.floor(values / self.cell_size).astype(np.int64)
+        return np.clip(coords, 0, self._cells_per_dim - 1)
+
+    def _key(self, coords: Sequence[int]) -> int:
+        """格子座標 → 單一整數鍵"""
+        key = 0
+        for c in coords:
+            key = key * self._cells_per_dim + int(c)
+        return key
+
+    def _grow(self) -> None:
+        """容量不足時加倍"""
+        capacity = len(self._stamp_ids) * 2
+        stamp_ids = np.zeros(capacity, dtype=np.int64)
+        fingerprints = np.zeros((capacity, FINGERPRINT_SIZE), dtype=np.float64)
+        stamp_ids[:self._size] = self._stamp_ids[:self._size]
+        fingerprints[:self._size] = self._fingerprints[:self._size]
+        self._stamp_ids = stamp_ids
+        self._fingerprints = fingerprints
+
+    def insert(self, stamp_id: int, fingerprint: Sequence[float]) -> None:
+        """新增印章；已存在時以新指紋取代"""
+        values = np.asarray(fingerprint, dtype=np.float64)
+        if values.shape != (FINGERPRINT_SIZE,):
+            raise ValueError(f"指紋長度必須為 {FINGERPRINT_SIZE}")
+
+        self.delete(stamp_id)
+
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self._stamp_ids):
+                self._grow()
+            slot = self._size
+            self._size += 1
+
+        key = self._key(self._coords(values))
+        self._stamp_ids[slot] = stamp_id
+        self._fingerprints[slot] = values
+        self._slot_of[stamp_id] = slot
+        self._cell_of_slot[slot] = key
+        self._cells.setdefault(key, []).append(slot)
+
+    def delete(self, stamp_id: int) -> bool:
+        """刪除印章，返回是否確實刪除"""
+        slot = self._slot_of.pop(stamp_id, None)
+        if slot is None:
+            return False
+
+        key = self._cell_of_slot.pop(slot)
+        bucket = self._cells[key]
+        bucket.remove(slot)
+        if not bucket:
+            del self._cells[key]
+        self._free.append(slot)
+        return True
+
+    def candidates(self, fingerprint: Sequence[float], max_error_tolerance: float) -> np.ndarray:
+        """取得方框 [f - tol, f + tol] 所涵蓋格子內的所有印章位置（可能包含方框外的印章）"""
+        values = np.asarray(fingerprint, dtype=np.float64)
+        low = self._coords(values - max_error_tolerance)
+        high = self._coords(values + max_error_tolerance)
+
+        slots: List[int] = []
+        ranges = [range(int(lo), int(hi) + 1) for lo, hi in zip(low, high)]
+        for coords in itertools.product(*ranges):
+            bucket = self._cells.get(self._key(coords))
+            if bucket:
+                slots.extend(bucket)
+        return np.asarray(slots, dtype=np.int64)
+
+    def query(self, fingerprint: Sequence[float], max_error_tolerance: float) -> Optional[MatchResult]:
+        """
+        找出最大誤差小於容差的印章中 MSE 最小者
+
+        Args:
+            fingerprint: 待比對的指紋
+            max_error_tolerance: 最大誤差容差（L∞ 方框半徑）
+
+        Returns:
+            MatchResult（index 為索引內部位置），方框內沒有印章時返回 None
+        """
+        slots = self.candidates(fingerprint, max_error_tolerance)
+        if len(slots) == 0:
+            return None
+
+        stamp_ids = self._stamp_ids[slots]
+        fingerprints = self._fingerprints[slots]
+        mse, max_error = calculate_errors(fingerprints, fingerprint)
+        best = select_best(stamp_ids, fingerprints, fingerprint, mse, max_error, max_error_tolerance)
+        if best is None:
+            return None
+        return replace(best, index=int(slots[best.index]))
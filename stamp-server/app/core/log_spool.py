@@ -0,0 +1,254 @@
+"""
+驗證日誌本機暫存（spool）：app_business_db 變慢或無法連線時，日誌先寫入本機的附加式檔案
+
+記錄格式：4 位元組長度 + 4 位元組 CRC32（little-endian）+ JSON（UTF-8）。
+寫入只附加到目前的 segment（*.open），多筆寫入共用一次 fsync（LOG_SPOOL_FSYNC_INTERVAL 內的寫入合併），
+fsync 完成後寫入者才返回。segment 達到大小上限或需要重送時封存為 *.log，由寫入器的重送任務讀取。
+
+每個 worker 各自寫入自己的 segment 並持有檔案鎖；行程中斷後留下的 *.open
+（沒有行程持有鎖）會在下次啟動時封存並重送。
+"""
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows：沒有檔案鎖，只能以單一 worker 執行
+    fcntl = None
+
+# 暫存配置（可配置）
+# 是否啟用本機暫存（停用時日誌寫入失敗會在記憶體中重試，佇列已滿時錯誤會傳回請求）
+LOG_SPOOL_ENABLED = os.getenv('LOG_SPOOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# 暫存目錄（必須是持久化的磁碟）
+LOG_SPOOL_DIR = os.getenv('LOG_SPOOL_DIR', 'log_spool')
+# 合併 fsync 的等待時間（秒）
+LOG_SPOOL_FSYNC_INTERVAL = float(os.getenv('LOG_SPOOL_FSYNC_INTERVAL', '0.005'))
+# 單一 segment 的大小上限（位元組）
+LOG_SPOOL_SEGMENT_BYTES = int(os.getenv('LOG_SPOOL_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+
+RECORD_HEADER = struct.Struct('<II')
+OPEN_SUFFIX = '.open'
+SEALED_SUFFIX = '.log'
+CORRUPT_SUFFIX = '.corrupt'
+
+
+def encode_record(row: dict) -> bytes:
+    """將一筆日誌編碼為長度前綴的記錄"""
+    payload = json.dumps(
+        {**row, 'created_at': row['created_at'].isoformat()},
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_records(data: bytes) -> Tuple[List[dict], int]:
+    """
+    解碼 segment 內容
+
+    Returns:
+        (日誌列表, 有效資料的位元組數)；有效位元組數小於檔案長度表示尾端有不完整或損壞的記錄
+    """
+    rows = []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        row = json.loads(payload)
+        row['created_at'] = datetime.fromisoformat(row['created_at'])
+        rows.append(row)
+        offset = start + length
+    return rows, offset
+
+
+def _try_lock(fd: int) -> bool:
+    """非阻塞地取得檔案鎖"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class LogSpool:
+    """本機附加式日誌暫存（每個 worker 一個實例，只在事件迴圈上使用）"""
+
+    def __init__(
+        self,
+        directory: str = LOG_SPOOL_DIR,
+        fsync_interval: float = LOG_SPOOL_FSYNC_INTERVAL,
+        segment_bytes: int = LOG_SPOOL_SEGMENT_BYTES
+    ):
+        """
+        初始化暫存
+
+        Args:
+            directory: 暫存目錄
+            fsync_interval: 合併 fsync 的等待時間（秒）
+            segment_bytes: 單一 segment 的大小上限（位元組）
+        """
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self._fd: Optional[int] = None
+        self._path: Optional[str] = None
+        self._size = 0
+        # 等待下一次 fsync 的寫入者
+        self._sync_future: Optional[asyncio.Future] = None
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self._seal_requested = False
+
+        # 統計資料
+        self.appended = 0
+        self.fsyncs = 0
+
+    def open(self) -> None:
+        """建立目錄並封存其他已結束行程留下的 segment（應用程式啟動時呼叫）"""
+        self._sync_lock = asyncio.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(OPEN_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                # 仍由其他 worker 持有鎖的 segment 正在寫入中
+                if _try_lock(fd):
+                    os.rename(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+            finally:
+                os.close(fd)
+
+    @property
+    def active_bytes(self) -> int:
+        return self._size
+
+    def _open_segment(self) -> None:
+        """開啟新的 segment 並持有檔案鎖（檔名依時間排序）"""
+        name = f'spool-{time.time_ns():020d}-{os.getpid()}{OPEN_SUFFIX}'
+        self._path = os.path.join(self.directory, name)
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        _try_lock(self._fd)
+        self._size = 0
+
+    async def append(self, rows: List[dict]) -> None:
+        """附加一組日誌；返回時資料已 fsync 到磁碟"""
+        if not rows:
+            return
+        if self._fd is None:
+            self._open_segment()
+        data = b''.join(encode_record(row) for row in rows)
+        os.write(self._fd, data)
+        self._size += len(data)
+        self.appended += len(rows)
+        await self._wait_for_sync()
+
+    async def seal(self) -> None:
+        """封存目前的 segment（確保已 fsync），讓重送任務可以讀取"""
+        if self._fd is None or self._size == 0:
+            return
+        self._seal_requested = True
+        await self._wait_for_sync()
+
+    def _wait_for_sync(self) -> asyncio.Future:
+        """加入下一次 fsync；同一段時間內的寫入共用一次 fsync"""
+        if self._sync_future is None:
+            self._sync_future = asyncio.get_running_loop().create_future()
+            asyncio.create_task(self._sync(self._sync_future))
+        return asyncio.shield(self._sync_future)
+
+    async def _sync(self, future: asyncio.Future) -> None:
+        """等待 fsync_interval 後 fsync 目前的 segment，需要時換到新的 segment"""
+        async with self._sync_lock:
+            await asyncio.sleep(self.fsync_interval)
+            self._sync_future = None
+            fd, path = self._fd, self._path
+            if fd is None:
+                future.set_result(None)
+                return
+            seal = self._seal_requested or self._size >= self.segment_bytes
+            if seal:
+                # 之後的寫入進入新的 segment，由下一次 fsync 處理
+                self._seal_requested = False
+                self._fd = None
+                self._path = None
+                self._size = 0
+            try:
+                await asyncio.to_thread(os.fsync, fd)
+                if seal:
+                    os.rename(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+                    os.close(fd)
+                self.fsyncs += 1
+            except Exception as e:
+                future.set_exception(e)
+                future.exception()
+                return
+            future.set_result(None)
+
+    async def close(self) -> None:
+        """fsync 並封存目前的 segment（應用程式關閉時呼叫）"""
+        await self.seal()
+
+    def sealed_segments(self) -> List[str]:
+        """等待重送的 segment（依建立時間排序）"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if name.endswith(SEALED_SUFFIX)]
+
+    def pending_bytes(self) -> int:
+        """尚未重送的資料量（位元組，含目前的 segment）"""
+        total = self._size
+        for path in self.sealed_segments():
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def claim(self, path: str) -> Optional[int]:
+        """
+        取得 segment 的重送權（多個 worker 不會同時重送同一個檔案）
+
+        Returns:
+            持有鎖的檔案描述子，已由其他 worker 處理或已刪除時返回 None
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        if not _try_lock(fd):
+            os.close(fd)
+            return None
+        # 取得鎖之前檔案可能已被其他 worker 重送並刪除
+        if not os.path.exists(path):
+            os.close(fd)
+            return None
+        return fd
+
+    @staticmethod
+    def read_segment(fd: int) -> bytes:
+        """讀取整個 segment"""
+        chunks = []
+        while True:
+            chunk = os.read(fd, 1 << 20)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def quarantine(self, path: str) -> str:
+        """將含有損壞記錄的 segment 改名保留，供人工檢查"""
+        target = path[:-len(SEALED_SUFFIX)] + CORRUPT_SUFFIX
+        os.rename(path, target)
+        return target
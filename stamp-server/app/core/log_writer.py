@@ -0,0 +1,415 @@
+"""
+驗證日誌批次寫入模組
+請求只把日誌放入有上限的記憶體佇列，由背景任務依數量或時間門檻以多筆 INSERT 寫入 stamping_logs
+
+寫入資料庫失敗或超過 LOG_DB_WRITE_TIMEOUT 秒時，日誌改寫入本機暫存（log_spool），
+之後的日誌直接寫入暫存，直到背景重送任務確認資料庫恢復並把暫存以批次寫回。
+每筆日誌帶有唯一的 log_uuid，重送以 INSERT IGNORE 寫入，同一筆日誌只會寫入一次。
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, text
+
+from app.core.log_spool import LogSpool, decode_records
+from app.models import StampingLog
+
+# 批次寫入配置（可配置）
+# 佇列上限：超過時依溢出策略處理
+LOG_QUEUE_MAX_SIZE = int(os.getenv('LOG_QUEUE_MAX_SIZE', '10000'))
+# 每批最多寫入的筆數
+LOG_FLUSH_BATCH_SIZE = int(os.getenv('LOG_FLUSH_BATCH_SIZE', '500'))
+# 最長等待時間（秒）：未滿一批時，最多等待這麼久就寫入
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '0.2'))
+# 佇列已滿時的處理方式：
+#   inline - 在請求中直接寫入資料庫（預設，保證每筆請求都有日誌）
+#   block  - 等待佇列有空位（對請求施加背壓）
+#   drop   - 丟棄並計數（會違反「每筆請求都必須記錄」的要求，僅供壓力測試使用）
+LOG_OVERFLOW_POLICY = os.getenv('LOG_OVERFLOW_POLICY', 'inline')
+# 寫入失敗時的重試間隔上限（秒）
+LOG_RETRY_MAX_BACKOFF = float(os.getenv('LOG_RETRY_MAX_BACKOFF', '5'))
+# 關閉時每批最多重試的次數：沒有暫存且資料庫仍無法寫入時丟棄剩餘的日誌，避免關閉無限期等待
+LOG_CLOSE_MAX_RETRIES = int(os.getenv('LOG_CLOSE_MAX_RETRIES', '3'))
+# 單次寫入資料庫的時間上限（秒），超過時改寫入本機暫存
+LOG_DB_WRITE_TIMEOUT = float(os.getenv('LOG_DB_WRITE_TIMEOUT', '2'))
+# 檢查資料庫是否恢復並重送暫存的間隔（秒）
+LOG_SPOOL_REPLAY_INTERVAL = float(os.getenv('LOG_SPOOL_REPLAY_INTERVAL', '1'))
+
+OVERFLOW_POLICIES = ('inline', 'block', 'drop')
+
+
+def build_log_row(
+    client_id: int,
+    status: str,
+    stamp_id: Optional[int] = None,
+    fingerprint: Optional[List[float]] = None,
+    error_message: Optional[str] = None,
+    http_request=None
+) -> dict:
+    """
+    建立一筆 stamping_logs 資料
+
+    created_at 在請求當下決定，而不是使用資料庫寫入時間，避免批次延遲影響日誌時間。
+    log_uuid 用來在重送暫存時避免重複寫入。
+    """
+    return {
+        'log_uuid': uuid.uuid4().hex,
+        'client_id': client_id,
+        'stamp_id': stamp_id,
+        'status': status,
+        'fingerprint': fingerprint,
+        'error_message': error_message,
+        'ip_address': http_request.client.host if http_request and http_request.client else None,
+        'user_agent': http_request.headers.get('user-agent') if http_request else None,
+        'created_at': datetime.now(),
+    }
+
+
+class StampingLogWriter:
+    """stamping_logs 的非同步批次寫入器"""
+
+    def __init__(
+        self,
+        session_factory,
+        max_size: int = LOG_QUEUE_MAX_SIZE,
+        batch_size: int = LOG_FLUSH_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        overflow_policy: str = LOG_OVERFLOW_POLICY,
+        spool: Optional[LogSpool] = None,
+        write_timeout: float = LOG_DB_WRITE_TIMEOUT,
+        replay_interval: float = LOG_SPOOL_REPLAY_INTERVAL
+    ):
+        """
+        初始化寫入器
+
+        Args:
+            session_factory: 業務資料庫的非同步 Session 工廠
+            max_size: 佇列上限
+            batch_size: 每批最多寫入的筆數
+            flush_interval: 未滿一批時的最長等待時間（秒）
+            overflow_policy: 佇列已滿時的處理方式（inline / block / drop）
+            spool: 本機暫存（None 表示不使用，寫入失敗時在記憶體中重試）
+            write_timeout: 單次寫入資料庫的時間上限（秒）
+            replay_interval: 重送暫存的間隔（秒）
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow_policy}，可用值: {', '.join(OVERFLOW_POLICIES)}")
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.spool = spool
+        self.write_timeout = write_timeout
+        self.replay_interval = replay_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._replay_task: Optional[asyncio.Task] = None
+        self._closing = False
+        # 關閉時已放棄寫入：之後的日誌直接丟棄
+        self._abandoned = False
+        # 資料庫寫入失敗後為 True：新的日誌直接寫入暫存，直到重送任務確認資料庫恢復
+        self.spooling = False
+
+        # 統計資料
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.inline_writes = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self.spooled = 0
+        self.replayed = 0
+        self.corrupt_segments = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """啟動背景寫入任務（應用程式啟動時呼叫）"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._closing = False
+        self._abandoned = False
+        self._task = asyncio.create_task(self._run())
+        if self.spool is not None:
+            # 封存先前中斷的行程留下的暫存，由重送任務寫回資料庫
+            self.spool.open()
+            self._replay_task = asyncio.create_task(self._replay_run())
+
+    async def stop(self) -> None:
+        """
+        停止背景任務；任務會先寫完佇列中剩餘的日誌再結束（應用程式關閉時呼叫）
+
+        資料庫無法寫入時剩餘的日誌寫入暫存，下次啟動時重送；沒有暫存時每批最多重試
+        LOG_CLOSE_MAX_RETRIES 次，之後丟棄剩餘的日誌。
+        """
+        if self._task is None:
+            return
+        if self._replay_task is not None:
+            # 重送中斷不影響正確性：已寫入的日誌重送時會被略過
+            self._replay_task.cancel()
+            try:
+                await self._replay_task
+            except asyncio.CancelledError:
+                pass
+            self._replay_task = None
+        self._closing = True
+        await self._task
+        self._task = None
+        if self.spool is not None:
+            await self.spool.close()
+
+    async def enqueue(self, row: dict) -> None:
+        """
+        加入一筆日誌
+
+        寫入器未啟動時直接寫入資料庫；佇列已滿時依溢出策略處理。
+        """
+        if not self.running:
+            await self._write_inline([row])
+            return
+
+        try:
+            self._queue.put_nowait(row)
+            self.enqueued += 1
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == 'block':
+            await self._queue.put(row)
+            self.enqueued += 1
+        elif self.overflow_policy == 'inline':
+            await self._write_inline([row])
+        else:
+            self.dropped += 1
+
+    async def write_many(self, rows: List[dict]) -> None:
+        """
+        以單一多筆 INSERT 直接寫入一組日誌（批次驗證使用，不經過佇列）
+
+        資料庫無法寫入時改寫入暫存；沒有暫存時錯誤會傳回給呼叫端。
+        """
+        if rows:
+            await self._write_inline(rows)
+
+    async def _write_inline(self, rows: List[dict]) -> None:
+        """在請求中直接寫入（資料庫無法寫入時改寫入暫存；沒有暫存時錯誤會傳回給呼叫端）"""
+        if not await self._write_or_spool(rows):
+            self.inline_writes += len(rows)
+            self.written += len(rows)
+
+    async def _write(self, rows: List[dict], ignore_duplicates: bool = False) -> None:
+        """
+        以單一多筆 INSERT 寫入一批日誌（超過 write_timeout 秒視為失敗）
+
+        Args:
+            ignore_duplicates: 略過 log_uuid 已存在的日誌（重送暫存時使用）
+        """
+        statement = insert(StampingLog)
+        if ignore_duplicates:
+            statement = statement.prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+
+        async def execute():
+            async with self.session_factory() as db:
+                await db.execute(statement, rows)
+                await db.commit()
+
+        await asyncio.wait_for(execute(), self.write_timeout)
+
+    async def _write_or_spool(self, rows: List[dict]) -> bool:
+        """
+        寫入資料庫，失敗或逾時時改寫入暫存
+
+        逾時的寫入可能已經 commit；重送時以 log_uuid 略過，不會重複。
+
+        Returns:
+            是否寫入暫存
+        """
+        if self.spool is not None and self.spooling:
+            await self._spool(rows)
+            return True
+        try:
+            await self._write(rows)
+            return False
+        except Exception as e:
+            self.failed_flushes += 1
+            if self.spool is None:
+                raise
+            if not self.spooling:
+                print(f"警告：寫入驗證日誌失敗，改寫入本機暫存直到資料庫恢復: {e!r}")
+            self.spooling = True
+        await self._spool(rows)
+        return True
+
+    async def _spool(self, rows: List[dict]) -> None:
+        await self.spool.append(rows)
+        self.spooled += len(rows)
+
+    async def _flush(self, rows: List[dict]) -> None:
+        """
+        寫入一批日誌；資料庫與暫存都失敗時保留該批並以指數退避重試
+
+        關閉時每批最多重試 LOG_CLOSE_MAX_RETRIES 次，仍失敗時丟棄該批與之後的日誌。
+        """
+        backoff = 0.1
+        attempts = 0
+        while True:
+            if self._closing and self._abandoned:
+                self.dropped += len(rows)
+                return
+            started = time.perf_counter()
+            try:
+                spooled = await self._write_or_spool(rows)
+            except Exception as e:
+                attempts += 1
+                if self._closing and attempts > LOG_CLOSE_MAX_RETRIES:
+                    self._abandoned = True
+                    self.dropped += len(rows)
+                    print(f"警告：關閉時仍無法寫入驗證日誌，丟棄此批（{len(rows)} 筆）與佇列中剩餘的日誌: {e}")
+                    return
+                print(f"警告：寫入驗證日誌失敗（{len(rows)} 筆），{backoff:.1f} 秒後重試: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, LOG_RETRY_MAX_BACKOFF)
+                continue
+
+            if not spooled:
+                elapsed = time.perf_counter() - started
+                self.flushes += 1
+                self.written += len(rows)
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+                self.total_flush_seconds += elapsed
+            return
+
+    async def replay_spool(self) -> int:
+        """
+        確認資料庫可寫入後，把暫存的日誌寫回 stamping_logs，返回寫回的筆數
+
+        資料庫仍無法連線時拋出例外，之後的日誌繼續寫入暫存。
+        """
+        if self.spooling:
+            async def probe():
+                async with self.session_factory() as db:
+                    await db.execute(text('SELECT 1'))
+            await asyncio.wait_for(probe(), self.write_timeout)
+            self.spooling = False
+            print("資料庫已恢復，開始重送本機暫存的驗證日誌")
+
+        if self.spool.active_bytes:
+            await self.spool.seal()
+        total = 0
+        for path in self.spool.sealed_segments():
+            total += await self._replay_segment(path)
+        return total
+
+    async def _replay_segment(self, path: str) -> int:
+        """重送單一 segment；全部寫入後刪除檔案（中途失敗時保留，下次重送時已寫入的部分會被略過）"""
+        fd = self.spool.claim(path)
+        if fd is None:
+            return 0
+        try:
+            data = self.spool.read_segment(fd)
+            rows, valid_bytes = decode_records(data)
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                await self._write(batch, ignore_duplicates=True)
+                self.replayed += len(batch)
+            if valid_bytes < len(data):
+                # 尾端是行程中斷時未寫完的記錄（該次寫入尚未 fsync，請求未收到回應）
+                self.corrupt_segments += 1
+                target = self.spool.quarantine(path)
+                print(f"警告：暫存檔尾端有 {len(data) - valid_bytes} 位元組無法解析，已保留為 {target}")
+            else:
+                os.unlink(path)
+        finally:
+            os.close(fd)
+        return len(rows)
+
+    async def _replay_run(self) -> None:
+        """背景任務：定期重送暫存；資料庫無法連線時逐步拉長間隔"""
+        backoff = self.replay_interval
+        while True:
+            await asyncio.sleep(backoff)
+            if not self.spooling and not self.spool.active_bytes and not self.spool.sealed_segments():
+                continue
+            try:
+                await self.replay_spool()
+                backoff = self.replay_interval
+            except Exception as e:
+                if not self.spooling:
+                    self.spooling = True
+                print(f"警告：重送驗證日誌暫存失敗，{backoff:.1f} 秒後重試: {e!r}")
+                backoff = min(backoff * 2, LOG_RETRY_MAX_BACKOFF)
+
+    async def _collect(self) -> List[dict]:
+        """取出一批日誌：累積到 batch_size 筆或等待 flush_interval 秒"""
+        rows: List[dict] = []
+        if self._closing:
+            while len(rows) < self.batch_size and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            return rows
+
+        try:
+            rows.append(await asyncio.wait_for(self._queue.get(), self.flush_interval))
+        except asyncio.TimeoutError:
+            return rows
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_size:
+            if not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                rows.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return rows
+
+    async def _run(self) -> None:
+        """背景任務：持續取出並寫入日誌，關閉時寫完佇列中剩餘的日誌後結束"""
+        while True:
+            rows = await self._collect()
+            if rows:
+                await self._flush(rows)
+            elif self._closing:
+                return
+
+    def stats(self) -> dict:
+        """取得寫入器統計資料（佇列深度、寫入延遲等）"""
+        return {
+            'running': self.running,
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'queue_max_size': self.max_size,
+            'overflow_policy': self.overflow_policy,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'inline_writes': self.inline_writes,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_ms': self.last_flush_seconds * 1000,
+            'max_flush_ms': self.max_flush_seconds * 1000,
+            'avg_flush_ms': self.total_flush_seconds / self.flushes * 1000 if self.flushes else 0.0,
+            'spool': {
+                'enabled': self.spool is not None,
+                'spooling': self.spooling,
+                'spooled': self.spooled,
+                'replayed': self.replayed,
+                'pending_bytes': self.spool.pending_bytes() if self.spool else 0,
+                'corrupt_segments': self.corrupt_segments,
+            },
+        }
@@ -0,0 +1,222 @@
+"""
+指紋比對模組：以向量化方式一次比對客戶的所有印章
+
+向量化的 MSE 以 d * d 依欄位順序累加，與 calculate_mse（d ** 2 與 sum()）可能差幾個 ULP，
+只用來篩選候選；MSE 接近最小值的候選再以 calculate_mse 逐筆重算後選出，
+比對結果（印章、MSE、最大誤差）與 math_utils.calculate_mse / calculate_max_error 逐筆比對完全一致。
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.math_utils import calculate_mse
+
+# 每枚印章指紋的長度
+FINGERPRINT_SIZE = 5
+# 批次比對時每個區塊最多計算的 (輸入 × 印章) 組數，限制暫存陣列的記憶體用量
+BATCH_CHUNK_PAIRS = 1 << 18
+# 向量化 MSE 與 calculate_mse 的相對誤差遠小於此值；MSE 在最小值此範圍內的候選都以 calculate_mse 重算
+MSE_RECHECK_RELATIVE = 1e-12
+
+
+@dataclass(frozen=True)
+class MatchResult:
+    """比對結果：MSE 最小的候選印章"""
+    index: int
+    stamp_id: int
+    mse: float
+    max_error: float
+
+
+def as_fingerprint_matrix(fingerprints) -> np.ndarray:
+    """將指紋資料轉為連續的 (N, 5) float64 陣列（已符合格式時不複製）"""
+    matrix = np.ascontiguousarray(fingerprints, dtype=np.float64)
+    return matrix.reshape(-1, FINGERPRINT_SIZE)
+
+
+def calculate_errors(fingerprints: np.ndarray, fingerprint: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    計算單一指紋與 N 枚印章指紋之間的 MSE（近似值，見模組說明）與最大絕對誤差
+
+    Args:
+        fingerprints: (N, 5) 印章指紋陣列
+        fingerprint: 待比對的指紋（長度 5）
+
+    Returns:
+        (mse, max_error)，皆為長度 N 的陣列
+    """
+    target = np.asarray(fingerprint, dtype=np.float64)
+    if target.shape != (FINGERPRINT_SIZE,):
+        raise ValueError("兩個指紋的長度必須相同")
+
+    return _errors_from_diff(fingerprints - target)
+
+
+def _errors_from_diff(diff: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """由差值陣列（最後一維為指紋維度）計算近似 MSE 與最大絕對誤差"""
+    squared = diff * diff
+
+    total = squared[..., 0].copy()
+    for column in range(1, FINGERPRINT_SIZE):
+        total += squared[..., column]
+    mse = total / FINGERPRINT_SIZE
+
+    max_error = np.abs(diff).max(axis=-1)
+    return mse, max_error
+
+
+def _recheck(
+    candidates: np.ndarray,
+    mse: np.ndarray,
+    fingerprints: np.ndarray,
+    fingerprint: Sequence[float]
+) -> Tuple[np.ndarray, List[float]]:
+    """
+    以 calculate_mse 重算近似 MSE 接近最小值的候選
+
+    Args:
+        candidates: 候選在輸入陣列中的位置（非空）
+        mse: 全部印章的近似 MSE
+        fingerprints: (N, 5) 印章指紋陣列
+        fingerprint: 待比對的指紋
+
+    Returns:
+        (重算的候選位置, 對應的精確 MSE)
+    """
+    approx = mse[candidates]
+    lowest = approx.min()
+    near = candidates[approx <= lowest + lowest * MSE_RECHECK_RELATIVE + np.finfo(np.float64).tiny]
+    target = [float(value) for value in fingerprint]
+    return near, [calculate_mse(target, fingerprints[index].tolist()) for index in near]
+
+
+def _result(stamp_ids: np.ndarray, max_error: np.ndarray, index: int, mse: float) -> MatchResult:
+    return MatchResult(
+        index=index,
+        stamp_id=int(stamp_ids[index]),
+        mse=mse,
+        max_error=float(max_error[index])
+    )
+
+
+def find_best_match(
+    stamp_ids: np.ndarray,
+    fingerprints: np.ndarray,
+    fingerprint: Sequence[float]
+) -> Optional[MatchResult]:
+    """
+    找出 MSE 最小的印章
+
+    MSE 相同時取第一枚，與逐筆比對時「mse < best_mse 才更新」的行為一致。
+
+    Args:
+        stamp_ids: (N,) 印章 ID
+        fingerprints: (N, 5) 印章指紋陣列
+        fingerprint: 待比對的指紋
+
+    Returns:
+        MatchResult，沒有任何印章時返回 None
+    """
+    if len(stamp_ids) == 0:
+        return None
+
+    mse, max_error = calculate_errors(fingerprints, fingerprint)
+    near, exact = _recheck(np.arange(len(stamp_ids)), mse, fingerprints, fingerprint)
+    best = min(range(len(near)), key=lambda k: (exact[k], near[k]))
+    return _result(stamp_ids, max_error, int(near[best]), exact[best])
+
+
+def select_best(
+    stamp_ids: np.ndarray,
+    fingerprints: np.ndarray,
+    fingerprint: Sequence[float],
+    mse: np.ndarray,
+    max_error: np.ndarray,
+    max_error_tolerance: float
+) -> Optional[MatchResult]:
+    """
+    在最大誤差小於容差的候選中選出 MSE 最小者
+
+    MSE 相同時取印章 ID 最小者，讓線性掃描與空間索引的結果一致。
+
+    Args:
+        stamp_ids: (N,) 印章 ID
+        fingerprints: (N, 5) 印章指紋陣列
+        fingerprint: 待比對的指紋
+        mse: calculate_errors 計算的近似 MSE
+        max_error: calculate_errors 計算的最大誤差
+        max_error_tolerance: 最大誤差容差
+
+    Returns:
+        MatchResult（index 為候選在輸入陣列中的位置，mse 為 calculate_mse 的結果），沒有候選時返回 None
+    """
+    inside = np.flatnonzero(max_error < max_error_tolerance)
+    if len(inside) == 0:
+        return None
+
+    near, exact = _recheck(inside, mse, fingerprints, fingerprint)
+    best = min(range(len(near)), key=lambda k: (exact[k], stamp_ids[near[k]]))
+    return _result(stamp_ids, max_error, int(near[best]), exact[best])
+
+
+def find_best_within(
+    stamp_ids: np.ndarray,
+    fingerprints: np.ndarray,
+    fingerprint: Sequence[float],
+    max_error_tolerance: float
+) -> Optional[MatchResult]:
+    """
+    線性掃描：找出最大誤差小於容差（L∞ 方框內）的印章中 MSE 最小者
+
+    Args:
+        stamp_ids: (N,) 印章 ID
+        fingerprints: (N, 5) 印章指紋陣列
+        fingerprint: 待比對的指紋
+        max_error_tolerance: 最大誤差容差
+
+    Returns:
+        MatchResult，方框內沒有任何印章時返回 None
+    """
+    if len(stamp_ids) == 0:
+        return None
+
+    mse, max_error = calculate_errors(fingerprints, fingerprint)
+    return select_best(stamp_ids, fingerprints, fingerprint, mse, max_error, max_error_tolerance)
+
+
+def find_best_within_many(
+    stamp_ids: np.ndarray,
+    fingerprints: np.ndarray,
+    targets,
+    max_error_tolerance: float
+) -> List[Optional[MatchResult]]:
+    """
+    批次比對：對 M 個輸入指紋各自找出容差內 MSE 最小的印章
+
+    以廣播一次計算 (M, N) 組誤差（依 BATCH_CHUNK_PAIRS 分塊），
+    每個輸入的結果與 find_best_within 逐一比對完全相同。
+
+    Args:
+        stamp_ids: (N,) 印章 ID
+        fingerprints: (N, 5) 印章指紋陣列
+        targets: (M, 5) 待比對的指紋
+        max_error_tolerance: 最大誤差容差
+
+    Returns:
+        長度 M 的列表，依輸入順序排列
+    """
+    targets = as_fingerprint_matrix(targets)
+    if len(stamp_ids) == 0:
+        return [None] * len(targets)
+
+    results: List[Optional[MatchResult]] = []
+    rows_per_chunk = max(1, BATCH_CHUNK_PAIRS // len(stamp_ids))
+    for start in range(0, len(targets), rows_per_chunk):
+        block = targets[start:start + rows_per_chunk]
+        mse, max_error = _errors_from_diff(fingerprints[np.newaxis, :, :] - block[:, np.newaxis, :])
+        for row in range(len(block)):
+            results.append(select_best(
+                stamp_ids, fingerprints, block[row], mse[row], max_error[row], max_error_tolerance
+            ))
+    return results
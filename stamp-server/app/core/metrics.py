@@ -0,0 +1,234 @@
+"""
+監控指標模組：驗證流程各階段的延遲直方圖、結果計數與連線池狀態
+以 Prometheus 文字格式輸出（GET /metrics）
+
+記錄指標只是更新記憶體中的數字（在事件迴圈上執行，不加鎖），格式化只在抓取時進行；
+METRICS_ENABLED=false 時計時器不做任何事，/metrics 端點停用。
+"""
+import bisect
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# 是否啟用監控指標
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# 延遲直方圖的分桶上限（秒）
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """組成 {name="value",...} 標籤字串"""
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """只增不減的計數器"""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labelvalues, value in self._values.items():
+            yield f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}'
+
+
+class _Timer:
+    """計時器：離開 with 區塊時將經過時間寫入直方圖"""
+
+    __slots__ = ('_histogram', '_labelvalues', '_started')
+
+    def __init__(self, histogram: 'Histogram', labelvalues: LabelValues):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started, *self._labelvalues)
+        return False
+
+
+class _NullTimer:
+    """停用監控指標時使用的空計時器"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """分桶直方圖（累計次數於輸出時計算）"""
+
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每組標籤：[各分桶次數（最後一格為 +Inf）, 總和]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        state = self._values.get(labelvalues)
+        if state is None:
+            state = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def time(self, *labelvalues: str):
+        """以 with 區塊計時：`with histogram.time('stage'):`"""
+        if not METRICS_ENABLED:
+            return _NULL_TIMER
+        return _Timer(self, labelvalues)
+
+    def samples(self) -> Iterable[str]:
+        for labelvalues, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class CallbackMetric:
+    """抓取時才由 callback 取得數值的指標（連線池、佇列深度、快取統計等）"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        type: str = 'gauge'
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.type = type
+        self._collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for labelvalues, value in self._collect():
+            yield f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}'
+
+
+class Registry:
+    """指標註冊表"""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """輸出 Prometheus 文字格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                # 單一指標取值失敗不影響其他指標
+                print(f"警告：收集監控指標 {metric.name} 失敗: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+def pool_stats(engines: Dict[str, object]) -> Dict[str, Dict[str, int]]:
+    """
+    取得各引擎的連線池狀態
+
+    Args:
+        engines: {名稱: Engine 或 AsyncEngine}
+
+    Returns:
+        {名稱: {'size', 'checked_out', 'checked_in', 'overflow'}}，不支援的連線池類型會略過對應欄位
+    """
+    result = {}
+    for name, engine in engines.items():
+        pool = getattr(engine, 'sync_engine', engine).pool
+        stats = {}
+        for key, method in (('size', 'size'), ('checked_out', 'checkedout'),
+                            ('checked_in', 'checkedin'), ('overflow', 'overflow')):
+            func = getattr(pool, method, None)
+            if func is not None:
+                stats[key] = func()
+        result[name] = stats
+    return result
+
+
+# 全域註冊表與驗證流程指標
+registry = Registry()
+
+VERIFY_STAGE_SECONDS = registry.register(Histogram(
+    'stamp_verify_stage_seconds',
+    '驗證流程各階段耗時（秒）',
+    ('endpoint', 'stage')
+))
+
+VERIFY_DURATION_SECONDS = registry.register(Histogram(
+    'stamp_verify_duration_seconds',
+    '驗證請求總耗時（秒）',
+    ('endpoint',)
+))
+
+VERIFY_OUTCOMES = registry.register(Counter(
+    'stamp_verify_outcomes_total',
+    '驗證結果次數（valid / invalid / error / forbidden）；批次驗證以項目計數',
+    ('endpoint', 'outcome')
+))
+
+VERIFY_REJECTIONS = registry.register(Counter(
+    'stamp_verify_rejections_total',
+    '在驗證前被拒絕的請求次數（rate_limited：429 / overloaded：503）',
+    ('endpoint', 'reason')
+))
@@ -0,0 +1,243 @@
+"""
+限流與准入控制模組：每個客戶的令牌桶，以及全域的並行數上限
+
+令牌桶以 client_id 為鍵，在查詢資料庫之前檢查（由 API Key 快取取得 client_id，不查詢資料庫；
+尚未快取的 Key 第一次查詢後即會快取，無效的 Key 由負向快取擋下）。客戶的個別額度由
+RATE_LIMIT_CLIENT_OVERRIDES 設定。每個令牌桶只保存三個數字，閒置到令牌補滿的令牌桶與新建的令牌桶等價，
+會被移除，記憶體用量只與近期活躍的客戶數量成正比。
+
+限流與並行數都是單一 worker 的行程內狀態；以 N 個 worker 執行時，整體上限為設定值的 N 倍。
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+# 限流配置（可配置）
+# 是否啟用每個客戶的限流
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# 預設每秒補充的令牌數（每筆驗證消耗 1 個，批次驗證每個項目消耗 1 個）
+RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', '100'))
+# 預設令牌桶容量（允許的瞬間突發量）
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '1000'))
+# 個別客戶的額度：「client_id=每秒令牌數/容量」，以逗號分隔，例如 "12=500/2000,15=5/10"
+RATE_LIMIT_CLIENT_OVERRIDES = os.getenv('RATE_LIMIT_CLIENT_OVERRIDES', '')
+
+# 准入控制配置（可配置）
+# 同時處理的驗證請求上限（0 表示不限制）
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '256'))
+# 超過上限時最多等待的請求數量，等待佇列已滿時立即返回 503
+ADMISSION_MAX_WAITING = int(os.getenv('ADMISSION_MAX_WAITING', '512'))
+# 等待處理的時間上限（秒），逾時返回 503
+ADMISSION_WAIT_TIMEOUT = float(os.getenv('ADMISSION_WAIT_TIMEOUT', '0.5'))
+
+Limit = Tuple[float, float]
+
+
+def parse_overrides(value: str) -> Dict[int, Limit]:
+    """
+    解析 RATE_LIMIT_CLIENT_OVERRIDES
+
+    Returns:
+        {client_id: (每秒令牌數, 容量)}
+    """
+    overrides = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            client_id, limit = item.split('=', 1)
+            rate, burst = limit.split('/', 1)
+            overrides[int(client_id)] = (float(rate), float(burst))
+        except ValueError:
+            raise ValueError(f"RATE_LIMIT_CLIENT_OVERRIDES 格式錯誤: {item}（應為 client_id=每秒令牌數/容量）")
+    return overrides
+
+
+class RateLimiter:
+    """以 client_id 為鍵的令牌桶（只在事件迴圈上使用，不加鎖）"""
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        burst: float = RATE_LIMIT_BURST,
+        overrides: Optional[Dict[int, Limit]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        初始化限流器
+
+        Args:
+            rate: 預設每秒補充的令牌數
+            burst: 預設令牌桶容量
+            overrides: 個別客戶的額度 {client_id: (每秒令牌數, 容量)}
+            clock: 時間來源（預設 time.monotonic）
+        """
+        if rate <= 0 or burst <= 0:
+            raise ValueError("限流的每秒令牌數與容量必須大於 0")
+        self.rate = rate
+        self.burst = burst
+        self.overrides = overrides or {}
+        self._clock = clock
+        # client_id → [令牌數, 上次更新時間, 補滿所需秒數]；依最後使用時間排序，閒置的令牌桶在最前面
+        self._buckets: "OrderedDict[int, list]" = OrderedDict()
+
+        # 統計資料
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    def limit_for(self, client_id: int) -> Limit:
+        """客戶的額度（沒有個別設定時使用預設值）"""
+        return self.overrides.get(client_id, (self.rate, self.burst))
+
+    def acquire(self, client_id: int, tokens: float = 1.0) -> float:
+        """
+        嘗試消耗令牌
+
+        Args:
+            client_id: 客戶 ID
+            tokens: 消耗的令牌數
+
+        Returns:
+            0 表示允許；否則為需要等待的秒數（超過容量的請求返回 inf）
+        """
+        now = self._clock()
+        self._evict_idle(now)
+        rate, burst = self.limit_for(client_id)
+
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            available = burst
+        else:
+            available = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(client_id)
+
+        if tokens > burst:
+            self.limited += 1
+            return math.inf
+        if available < tokens:
+            # 新的令牌桶一定有 burst 個令牌，只有既有的令牌桶會走到這裡
+            self.limited += 1
+            bucket[0], bucket[1] = available, now
+            return (tokens - available) / rate
+
+        available -= tokens
+        if bucket is None:
+            self._buckets[client_id] = [available, now, burst / rate]
+        else:
+            bucket[0], bucket[1], bucket[2] = available, now, burst / rate
+        self.allowed += 1
+        return 0.0
+
+    def _evict_idle(self, now: float) -> None:
+        """從最久未使用的令牌桶開始，移除已補滿的令牌桶（與新建的令牌桶等價）"""
+        buckets = self._buckets
+        while buckets:
+            client_id, (_, updated_at, refill_seconds) = next(iter(buckets.items()))
+            if now - updated_at < refill_seconds:
+                return
+            del buckets[client_id]
+            self.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def stats(self) -> dict:
+        """取得限流統計資料"""
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'overrides': len(self.overrides),
+            'active_clients': len(self._buckets),
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'evicted': self.evicted,
+        }
+
+
+class ServerOverloaded(Exception):
+    """並行數已達上限，且等待佇列已滿或等待逾時"""
+
+
+class AdmissionController:
+    """全域並行數上限與有上限的等待佇列"""
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_waiting: int = ADMISSION_MAX_WAITING,
+        wait_timeout: float = ADMISSION_WAIT_TIMEOUT
+    ):
+        """
+        初始化准入控制
+
+        Args:
+            max_concurrent: 同時處理的請求上限（0 表示不限制）
+            max_waiting: 最多等待的請求數量
+            wait_timeout: 等待處理的時間上限（秒）
+        """
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # 統計資料
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        取得處理資格：`async with admission.admit():`
+
+        Raises:
+            ServerOverloaded: 等待佇列已滿或等待逾時
+        """
+        if self.max_concurrent <= 0:
+            yield
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                self.rejected_queue_full += 1
+                raise ServerOverloaded("等待佇列已滿")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise ServerOverloaded("等待逾時")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        """取得准入控制統計資料"""
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_waiting': self.max_waiting,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected_queue_full': self.rejected_queue_full,
+            'rejected_timeout': self.rejected_timeout,
+        }
@@ -0,0 +1,567 @@
+"""
+共享的註冊表快照：以記憶體映射（mmap）讓同一台機器上的所有 worker 共用一份印章指紋陣列，
+資料庫無法連線時也能以快照繼續驗證（stale-while-revalidate）
+
+檔案結構（little-endian，每個區段補齊至 8 位元組）：
+    表頭（96 位元組）：magic、格式版本、generation、change_id、建立時間、開始讀取資料庫的時間、各區段筆數、CRC32
+    client_ids         int64[客戶數]        已排序
+    offsets            int64[客戶數 + 1]    客戶 i 的印章位於 [offsets[i], offsets[i+1])
+    stamp_ids          int64[權限筆數]
+    fingerprints       float64[權限筆數, 5]
+    unmatchable_offsets  int64[客戶數 + 1]  客戶 i 無法比對的印章位於 [unmatchable_offsets[i], unmatchable_offsets[i+1])
+    unmatchable_ids    int64[無法比對筆數]   有權限但沒有指紋或指紋格式不符的印章
+    key_client_ids     int64[Key 數]        啟用中的客戶（依 Key 雜湊排序）
+    name_offsets       int64[Key 數 + 1]    客戶名稱位於 names[name_offsets[i]:name_offsets[i+1]]
+    key_hashes         uint8[Key 數, 32]    API Key 的 SHA-256（不保存明文 Key）
+    names              uint8[名稱總長度]     UTF-8
+
+CRC32 涵蓋整個檔案（計算時表頭的 CRC 欄位視為 0），映射時驗證，不符的檔案不會被使用。
+
+只有一個 worker（以檔案鎖選出）會從資料庫建立快照；新快照先寫入暫存檔再以 os.replace 取代，
+已映射舊檔案的 worker 不受影響，偵測到檔案更換後才映射新的 generation。
+worker 以唯讀方式映射，取得客戶印章時直接使用檔案中的陣列切片，不複製資料。
+
+也可以手動匯出快照（例如放在持久化目錄，重新開機後 /dev/shm 清空時仍能立即啟動）：
+
+    python -m app.core.registry_snapshot export --output /var/lib/smart-stamp/registry.bin
+    python -m app.core.registry_snapshot inspect /var/lib/smart-stamp/registry.bin
+"""
+import argparse
+import asyncio
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.matcher import FINGERPRINT_SIZE
+
+try:
+    import fcntl
+except ImportError:  # Windows：沒有檔案鎖，只能以單一 worker 執行
+    fcntl = None
+
+# 快照配置（可配置）
+# 是否啟用共享快照
+REGISTRY_SNAPSHOT_ENABLED = os.getenv('REGISTRY_SNAPSHOT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# 快照目錄（預設為 /dev/shm 下依資料庫連線字串區分的目錄，同一台機器上的 worker 共用）
+REGISTRY_SNAPSHOT_DIR = os.getenv('REGISTRY_SNAPSHOT_DIR')
+# 檢查快照是否更換、以及建立者重建快照的間隔（秒）
+REGISTRY_SNAPSHOT_INTERVAL = float(os.getenv('REGISTRY_SNAPSHOT_INTERVAL', '2'))
+# 超過此秒數未能從資料庫確認資料為最新時，/health 回報 degraded
+REGISTRY_SNAPSHOT_STALE_AFTER = float(os.getenv('REGISTRY_SNAPSHOT_STALE_AFTER', '10'))
+
+SNAPSHOT_MAGIC = b'SSRS'
+SNAPSHOT_VERSION = 4
+SNAPSHOT_FILENAME = 'registry.bin'
+BUILDER_LOCK_FILENAME = 'builder.lock'
+KEY_HASH_SIZE = 32
+
+# magic, version, generation, change_id, created_at, collected_at, client_count, entry_count,
+# unmatchable_count, key_count, names_size, crc32
+HEADER_FORMAT = '<4sIQqddQQQQQI'
+HEADER_SIZE = 96
+CRC_OFFSET = struct.calcsize(HEADER_FORMAT) - 4
+
+
+def _sections(client_count: int, entry_count: int, unmatchable_count: int, key_count: int, names_size: int):
+    """各區段的名稱、dtype 與元素數量（寫入與讀取共用）"""
+    return (
+        ('client_ids', '<i8', client_count),
+        ('offsets', '<i8', client_count + 1),
+        ('stamp_ids', '<i8', entry_count),
+        ('fingerprints', '<f8', entry_count * FINGERPRINT_SIZE),
+        ('unmatchable_offsets', '<i8', client_count + 1),
+        ('unmatchable_ids', '<i8', unmatchable_count),
+        ('key_client_ids', '<i8', key_count),
+        ('name_offsets', '<i8', key_count + 1),
+        ('key_hashes', 'u1', key_count * KEY_HASH_SIZE),
+        ('names', 'u1', names_size),
+    )
+
+
+def _padding(nbytes: int) -> int:
+    return -nbytes % 8
+
+
+def default_snapshot_dir(database_url: str) -> str:
+    """預設的快照目錄：不同資料庫的伺服器在同一台機器上不會共用快照"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    digest = hashlib.sha256(database_url.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(base, f'smart-stamp-{digest}')
+
+
+def write_snapshot(path: str, generation: int, change_id: int, collected_at: float, **arrays: np.ndarray) -> None:
+    """
+    寫入快照（先寫暫存檔再以 os.replace 原子性地取代）
+
+    Args:
+        path: 快照檔案路徑
+        generation: 快照世代（每次重建遞增）
+        change_id: 建立快照時 registry_changes 的最大 id
+        collected_at: 開始讀取資料庫的時間（time.time()），在此之前 commit 的變更都包含在快照中
+        arrays: collect_registry 返回的各區段陣列
+    """
+    counts = (
+        len(arrays['client_ids']), len(arrays['stamp_ids']), len(arrays['unmatchable_ids']),
+        len(arrays['key_client_ids']), len(arrays['names'])
+    )
+    layout = _sections(*counts)
+    header = bytearray(struct.pack(
+        HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, generation, change_id, time.time(), collected_at, *counts, 0
+    ).ljust(HEADER_SIZE, b'\0'))
+
+    body = []
+    for name, dtype, count in layout:
+        data = np.ascontiguousarray(arrays[name], dtype=dtype).reshape(-1)
+        if len(data) != count:
+            raise ValueError(f"快照區段 {name} 的長度不符")
+        body.append(data.tobytes())
+        body.append(b'\0' * _padding(data.nbytes))
+
+    crc = zlib.crc32(header)
+    for chunk in body:
+        crc = zlib.crc32(chunk, crc)
+    struct.pack_into('<I', header, CRC_OFFSET, crc)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.registry-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for chunk in body:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def file_identity(path: str) -> Optional[Tuple[int, int, int]]:
+    """檔案識別（裝置、inode、修改時間），用來判斷快照是否已被取代"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns
+
+
+class RegistrySnapshot:
+    """唯讀映射的快照（映射時驗證格式版本、大小與 CRC32）"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < HEADER_SIZE:
+                raise ValueError("快照檔案不完整")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        self.size = stat.st_size
+
+        (magic, version, self.generation, self.change_id, self.created_at, self.collected_at,
+         client_count, entry_count, unmatchable_count, key_count, names_size,
+         crc) = struct.unpack_from(HEADER_FORMAT, self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("不是註冊表快照檔案")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"不支援的快照格式版本: {version}")
+
+        layout = _sections(client_count, entry_count, unmatchable_count, key_count, names_size)
+        expected = HEADER_SIZE
+        for _, dtype, count in layout:
+            nbytes = np.dtype(dtype).itemsize * count
+            expected += nbytes + _padding(nbytes)
+        if self.size != expected:
+            raise ValueError("快照檔案大小不符")
+        if self._checksum() != crc:
+            raise ValueError("快照檔案 CRC32 不符")
+
+        offset = HEADER_SIZE
+        for name, dtype, count in layout:
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+            setattr(self, name, array)
+            offset += array.nbytes + _padding(array.nbytes)
+        self.fingerprints = self.fingerprints.reshape(entry_count, FINGERPRINT_SIZE)
+        self.key_hashes = self.key_hashes.reshape(key_count, KEY_HASH_SIZE)
+        # API Key 雜湊 → 位置，第一次查詢時才建立（通常只在資料庫無法連線時使用）
+        self._key_index: Optional[Dict[bytes, int]] = None
+
+    def _checksum(self) -> int:
+        header = bytearray(self._mmap[:HEADER_SIZE])
+        struct.pack_into('<I', header, CRC_OFFSET, 0)
+        with memoryview(self._mmap) as view:
+            return zlib.crc32(view[HEADER_SIZE:], zlib.crc32(header))
+
+    def __len__(self) -> int:
+        return len(self.client_ids)
+
+    def lookup(self, client_id: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        取得客戶的印章（檔案中的陣列切片，不複製）
+
+        Returns:
+            (stamp_ids, fingerprints, unmatchable_ids)，快照中沒有該客戶時返回 None
+        """
+        i = int(np.searchsorted(self.client_ids, client_id))
+        if i == len(self.client_ids) or self.client_ids[i] != client_id:
+            return None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        unmatchable = self.unmatchable_ids[int(self.unmatchable_offsets[i]):int(self.unmatchable_offsets[i + 1])]
+        return self.stamp_ids[start:end], self.fingerprints[start:end], unmatchable
+
+    def lookup_key(self, key_hash: str) -> Optional[dict]:
+        """
+        以 API Key 的 SHA-256（十六進位）查詢客戶
+
+        Returns:
+            與 resolve_api_key 相同格式的客戶資訊；快照中沒有該 Key（或客戶已停用）時返回 None
+        """
+        if self._key_index is None:
+            self._key_index = {row.tobytes(): i for i, row in enumerate(self.key_hashes)}
+        i = self._key_index.get(bytes.fromhex(key_hash))
+        if i is None:
+            return None
+        start, end = int(self.name_offsets[i]), int(self.name_offsets[i + 1])
+        return {
+            'client_id': int(self.key_client_ids[i]),
+            'client_name': self.names[start:end].tobytes().decode('utf-8'),
+            'api_key_hash': key_hash
+        }
+
+
+async def collect_registry(core_db) -> dict:
+    """
+    從核心資料庫讀取建立快照所需的資料
+
+    先讀取 registry_changes 的最大 id 再讀取權限：之後的變更由各 worker 的變更同步補上，
+    重複套用同一筆變更不會有影響。id 較小但較晚 commit 的變更可能不在快照中，
+    因此另外記錄開始讀取的時間 collected_at：在此之前已讀取到的變更必定包含在快照中。
+    """
+    from app.models import APIClient, RegistryChange, StampPermission, StampRegistry
+
+    collected_at = time.time()
+    change_id = (await core_db.execute(select(func.max(RegistryChange.id)))).scalar() or 0
+    result = await core_db.stream(
+        select(StampPermission.client_id, StampRegistry.id, StampRegistry.fingerprint)
+        .join(StampRegistry, StampPermission.stamp_id == StampRegistry.id)
+        .where(StampPermission.is_active == True)
+        .order_by(StampPermission.client_id, StampRegistry.id)
+        .execution_options(yield_per=5000)
+    )
+
+    client_ids, offsets, unmatchable_offsets = [], [0], [0]
+    stamp_ids, fingerprints, unmatchable_ids = [], [], []
+    async for client_id, stamp_id, fingerprint in result:
+        if not client_ids or client_ids[-1] != client_id:
+            if client_ids:
+                offsets.append(len(stamp_ids))
+                unmatchable_offsets.append(len(unmatchable_ids))
+            client_ids.append(client_id)
+        # 與 load_client_stamps 相同：沒有指紋或格式不符的印章只計入權限
+        if not fingerprint or len(fingerprint) != FINGERPRINT_SIZE:
+            unmatchable_ids.append(stamp_id)
+            continue
+        stamp_ids.append(stamp_id)
+        fingerprints.append(fingerprint)
+    if client_ids:
+        offsets.append(len(stamp_ids))
+        unmatchable_offsets.append(len(unmatchable_ids))
+
+    # 啟用中的客戶：只保存 Key 的雜湊，依雜湊排序
+    result = await core_db.execute(
+        select(APIClient.id, APIClient.name, APIClient.api_key).where(APIClient.is_active == True)
+    )
+    keys = sorted(
+        (hashlib.sha256(api_key.encode('utf-8')).digest(), client_id, name.encode('utf-8'))
+        for client_id, name, api_key in result.all()
+    )
+    name_offsets = [0]
+    for _, _, name in keys:
+        name_offsets.append(name_offsets[-1] + len(name))
+
+    return {
+        'change_id': change_id,
+        'collected_at': collected_at,
+        'client_ids': np.asarray(client_ids, dtype=np.int64),
+        'offsets': np.asarray(offsets, dtype=np.int64),
+        'stamp_ids': np.asarray(stamp_ids, dtype=np.int64),
+        'fingerprints': np.asarray(fingerprints, dtype=np.float64).reshape(-1, FINGERPRINT_SIZE),
+        'unmatchable_offsets': np.asarray(unmatchable_offsets, dtype=np.int64),
+        'unmatchable_ids': np.asarray(unmatchable_ids, dtype=np.int64),
+        'key_client_ids': np.asarray([client_id for _, client_id, _ in keys], dtype=np.int64),
+        'name_offsets': np.asarray(name_offsets, dtype=np.int64),
+        'key_hashes': np.frombuffer(b''.join(digest for digest, _, _ in keys), dtype=np.uint8),
+        'names': np.frombuffer(b''.join(name for _, _, name in keys), dtype=np.uint8),
+    }
+
+
+class RegistrySnapshotManager:
+    """
+    快照的建立與映射
+
+    取得建立者鎖的 worker 在啟動時與有變更時重建快照；所有 worker 定期檢查快照檔案，
+    被取代時映射新的 generation 並交給指紋快取與 API Key 快取使用。
+    已有快照檔案時先映射再於背景重建，資料庫無法連線時也能立即開始服務。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        session_factory,
+        fingerprint_cache,
+        api_key_cache,
+        change_feed,
+        interval: float = REGISTRY_SNAPSHOT_INTERVAL,
+        stale_after: float = REGISTRY_SNAPSHOT_STALE_AFTER
+    ):
+        """
+        初始化
+
+        Args:
+            directory: 快照目錄
+            session_factory: 核心資料庫的非同步 Session 工廠（只有建立者使用）
+            fingerprint_cache: 指紋快取
+            api_key_cache: API Key 快取（資料庫無法連線時改查快照）
+            change_feed: 註冊表變更同步（映射較舊的快照時需要從快照的 change_id 重新讀取）
+            interval: 檢查與重建的間隔（秒）
+            stale_after: 超過此秒數未能確認資料為最新時視為 stale
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, SNAPSHOT_FILENAME)
+        self.session_factory = session_factory
+        self.fingerprint_cache = fingerprint_cache
+        self.api_key_cache = api_key_cache
+        self.change_feed = change_feed
+        self.interval = interval
+        self.stale_after = stale_after
+        self.snapshot: Optional[RegistrySnapshot] = None
+        self.is_builder = False
+        self._lock_file = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_build = 0.0
+
+        # 統計資料
+        self.builds = 0
+        self.swaps = 0
+        self.errors = 0
+        self.last_build_seconds = 0.0
+
+    async def start(self) -> None:
+        """
+        建立目錄、嘗試成為建立者並映射快照（應用程式啟動時呼叫）
+
+        已有快照檔案時直接映射，重建交給背景任務；還沒有快照時建立者先建立一次。
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._try_become_builder()
+        self.refresh()
+        if self.is_builder and self.snapshot is None:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                self.errors += 1
+                print(f"警告：建立註冊表快照失敗: {e}")
+            self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止背景任務並釋放建立者鎖"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+            self.is_builder = False
+
+    def _try_become_builder(self) -> None:
+        """以非阻塞的檔案鎖選出建立者；建立者結束時鎖自動釋放，由其他 worker 接手"""
+        if self.is_builder:
+            return
+        if fcntl is None:
+            self.is_builder = True
+            return
+        lock_file = open(os.path.join(self.directory, BUILDER_LOCK_FILENAME), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return
+        self._lock_file = lock_file
+        self.is_builder = True
+
+    async def rebuild(self) -> None:
+        """從資料庫建立新的快照並取代舊檔案"""
+        started = time.perf_counter()
+        async with self.session_factory() as db:
+            data = await collect_registry(db)
+        current = self.snapshot
+        generation = current.generation + 1 if current is not None else time.time_ns()
+        await asyncio.to_thread(write_snapshot, self.path, generation, **data)
+        self._last_build = time.monotonic()
+        self.builds += 1
+        self.last_build_seconds = time.perf_counter() - started
+
+    def refresh(self) -> bool:
+        """快照檔案被取代時映射新的 generation，返回是否更換"""
+        identity = file_identity(self.path)
+        if identity is None or (self.snapshot is not None and self.snapshot.identity == identity):
+            return False
+        try:
+            snapshot = RegistrySnapshot(self.path)
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            print(f"警告：映射註冊表快照失敗: {e}")
+            return False
+
+        # 舊的映射在沒有任何陣列參照後才會釋放，正在使用舊陣列的請求不受影響
+        self.snapshot = snapshot
+        self.fingerprint_cache.use_snapshot(snapshot)
+        self.api_key_cache.snapshot = snapshot
+        self.change_feed.rewind(snapshot.change_id)
+        self.swaps += 1
+        return True
+
+    def _needs_rebuild(self) -> bool:
+        """
+        建立者啟動後重建一次（映射的可能是舊的匯出檔），之後讀取到快照之後的變更
+        （或較晚 commit 的變更），或指紋快取未使用快照（變更過多或完整重新同步）時重建，
+        兩次重建至少間隔 interval 秒
+        """
+        if self.snapshot is None or self.builds == 0:
+            return True
+        if time.monotonic() - self._last_build < self.interval:
+            return False
+        last_id = self.change_feed.last_id
+        return (
+            self.fingerprint_cache.snapshot is None
+            or self.fingerprint_cache.overlay_size > 0
+            or (last_id is not None and last_id > self.snapshot.change_id)
+        )
+
+    async def _run(self) -> None:
+        """背景任務：接手建立者、重建與映射快照"""
+        backoff = self.interval
+        while True:
+            await asyncio.sleep(backoff)
+            try:
+                self._try_become_builder()
+                if self.is_builder and self._needs_rebuild():
+                    await self.rebuild()
+                self.refresh()
+                backoff = self.interval
+            except Exception as e:
+                # 資料庫無法連線時繼續使用目前的快照，逐步拉長重試間隔
+                self.errors += 1
+                print(f"警告：更新註冊表快照失敗，{backoff:.1f} 秒後重試: {e}")
+                backoff = min(backoff * 2, 30.0)
+
+    def stale_seconds(self) -> Optional[float]:
+        """距離上次從資料庫確認資料為最新（變更同步成功讀取）的秒數"""
+        return self.change_feed.stats()['seconds_since_success']
+
+    def is_stale(self) -> bool:
+        """是否正以可能過時的快照服務（資料庫持續無法連線）"""
+        if self.snapshot is None:
+            return False
+        stale_seconds = self.stale_seconds()
+        return stale_seconds is None or stale_seconds > self.stale_after
+
+    def stats(self) -> dict:
+        """取得快照狀態"""
+        snapshot = self.snapshot
+        return {
+            'path': self.path,
+            'stale': self.is_stale(),
+            'stale_seconds': self.stale_seconds(),
+            'stale_key_lookups': self.api_key_cache.stale_lookups,
+            'is_builder': self.is_builder,
+            'generation': snapshot.generation if snapshot else None,
+            'change_id': snapshot.change_id if snapshot else None,
+            'clients': len(snapshot) if snapshot else 0,
+            'entries': len(snapshot.stamp_ids) if snapshot else 0,
+            'api_keys': len(snapshot.key_client_ids) if snapshot else 0,
+            'file_bytes': snapshot.size if snapshot else 0,
+            'age_seconds': time.time() - snapshot.created_at if snapshot else None,
+            'overlay': self.fingerprint_cache.overlay_size,
+            'builds': self.builds,
+            'swaps': self.swaps,
+            'errors': self.errors,
+            'last_build_ms': self.last_build_seconds * 1000,
+        }
+
+
+async def export_snapshot(path: str) -> dict:
+    """從核心資料庫匯出快照到指定路徑，返回快照摘要"""
+    from app.core.database import AsyncSessionLocalCore
+
+    started = time.perf_counter()
+    async with AsyncSessionLocalCore() as db:
+        data = await collect_registry(db)
+    generation = time.time_ns()
+    write_snapshot(path, generation, **data)
+    return {**describe_snapshot(path), 'export_ms': (time.perf_counter() - started) * 1000}
+
+
+def describe_snapshot(path: str) -> dict:
+    """載入（並驗證）快照，返回摘要與載入耗時"""
+    started = time.perf_counter()
+    snapshot = RegistrySnapshot(path)
+    load_ms = (time.perf_counter() - started) * 1000
+    return {
+        'path': os.path.abspath(path),
+        'version': SNAPSHOT_VERSION,
+        'generation': snapshot.generation,
+        'change_id': snapshot.change_id,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.created_at)),
+        'collected_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.collected_at)),
+        'clients': len(snapshot),
+        'entries': len(snapshot.stamp_ids),
+        'api_keys': len(snapshot.key_client_ids),
+        'file_bytes': snapshot.size,
+        'load_ms': load_ms,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='匯出或檢查註冊表快照')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='從 stamp_core_db 匯出快照')
+    export_parser.add_argument(
+        '--output',
+        help='輸出路徑（預設為伺服器使用的快照目錄中的 registry.bin）'
+    )
+    inspect_parser = subparsers.add_parser('inspect', help='驗證快照檔案並顯示摘要')
+    inspect_parser.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        from app.core.database import DATABASE_URL_CORE
+
+        output = args.output or os.path.join(
+            REGISTRY_SNAPSHOT_DIR or default_snapshot_dir(DATABASE_URL_CORE), SNAPSHOT_FILENAME
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        summary = asyncio.run(export_snapshot(output))
+    else:
+        summary = describe_snapshot(args.path)
+
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,119 @@
 """
 安全性模組：處理 JWT 簽章與 API Key 驗證
 """
+import asyncio
 import os
+import hashlib
 import secrets
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
 from cryptography.hazmat.backends import default_backend
 
+from app.core.cache import TTLCache
+
+# JWT 簽章配置（可配置）
+# 簽章演算法：RS256（預設，RSA 2048）、ES256（ECDSA P-256）、EdDSA（Ed25519）
+JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'RS256')
+# 簽章執行方式：thread（執行緒池，預設）、process（行程池）、inline（直接在事件迴圈上執行）
+JWT_SIGNING_EXECUTOR = os.getenv('JWT_SIGNING_EXECUTOR', 'thread')
+# 簽章池大小，0 表示使用 CPU 核心數
+JWT_SIGNING_WORKERS = int(os.getenv('JWT_SIGNING_WORKERS', '0'))
+
+SUPPORTED_ALGORITHMS = ('RS256', 'ES256', 'EdDSA')
+SIGNING_EXECUTORS = ('thread', 'process', 'inline')
+
+# API Key 快取配置（可配置）
+# 已驗證客戶的快取數量與存活時間（秒）
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv('API_KEY_CACHE_MAX_ENTRIES', '4096'))
+API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', '300'))
+# 無效 API Key 的負向快取：短時間內重複的無效 Key 不再查詢資料庫
+API_KEY_NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv('API_KEY_NEGATIVE_CACHE_MAX_ENTRIES', '16384'))
+API_KEY_NEGATIVE_CACHE_TTL = float(os.getenv('API_KEY_NEGATIVE_CACHE_TTL', '5'))
+# 資料庫無法連線時由註冊表快照取得的結果只快取這段時間（秒），之後再嘗試資料庫
+API_KEY_STALE_CACHE_TTL = float(os.getenv('API_KEY_STALE_CACHE_TTL', '5'))
+
+
+def generate_private_key(algorithm: str):
+    """依簽章演算法生成私鑰（僅用於開發）"""
+    if algorithm == 'RS256':
+        return rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=2048,
+            backend=default_backend()
+        )
+    if algorithm == 'ES256':
+        return ec.generate_private_key(ec.SECP256R1(), backend=default_backend())
+    if algorithm == 'EdDSA':
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"不支援的簽章演算法: {algorithm}，可用值: {', '.join(SUPPORTED_ALGORITHMS)}")
+
+
+def check_key_type(private_key, algorithm: str) -> None:
+    """確認私鑰類型與簽章演算法相符"""
+    if algorithm == 'RS256':
+        valid = isinstance(private_key, rsa.RSAPrivateKey)
+    elif algorithm == 'ES256':
+        valid = isinstance(private_key, ec.EllipticCurvePrivateKey) and isinstance(private_key.curve, ec.SECP256R1)
+    elif algorithm == 'EdDSA':
+        valid = isinstance(private_key, ed25519.Ed25519PrivateKey)
+    else:
+        raise ValueError(f"不支援的簽章演算法: {algorithm}，可用值: {', '.join(SUPPORTED_ALGORITHMS)}")
+
+    if not valid:
+        raise ValueError(f"私鑰類型 {type(private_key).__name__} 與簽章演算法 {algorithm} 不符")
+
+
+# 行程池中每個子行程各自持有的私鑰（由 _init_signing_worker 載入）
+_worker_private_key = None
+_worker_algorithm = None
+
+
+def _init_signing_worker(private_key_pem: bytes, algorithm: str) -> None:
+    """行程池子行程初始化：載入私鑰"""
+    global _worker_private_key, _worker_algorithm
+    _worker_private_key = serialization.load_pem_private_key(private_key_pem, password=None)
+    _worker_algorithm = algorithm
+
+
+def _sign_in_worker(payload: dict) -> str:
+    """在行程池子行程中簽署 JWT"""
+    return jwt.encode(payload, _worker_private_key, algorithm=_worker_algorithm)
+
 
 class SecurityManager:
     """安全管理器：處理 JWT 簽章與驗證"""
     
-    def __init__(self, private_key_path: Optional[str] = None):
+    def __init__(
+        self,
+        private_key_path: Optional[str] = None,
+        algorithm: str = JWT_ALGORITHM,
+        executor: str = JWT_SIGNING_EXECUTOR,
+        workers: int = JWT_SIGNING_WORKERS
+    ):
         """
         初始化安全管理器
         
         Args:
-            private_key_path: RS256 私鑰檔案路徑。如果未提供，會自動生成（僅用於開發）
+            private_key_path: 私鑰檔案路徑（類型需與 algorithm 相符）。如果未提供，會自動生成（僅用於開發）
+            algorithm: 簽章演算法（RS256 / ES256 / EdDSA）
+            executor: 非同步簽章的執行方式（thread / process / inline）
+            workers: 簽章池大小，0 表示使用 CPU 核心數
         """
+        if algorithm not in SUPPORTED_ALGORITHMS:
+            raise ValueError(f"不支援的簽章演算法: {algorithm}，可用值: {', '.join(SUPPORTED_ALGORITHMS)}")
+        if executor not in SIGNING_EXECUTORS:
+            raise ValueError(f"未知的簽章執行方式: {executor}，可用值: {', '.join(SIGNING_EXECUTORS)}")
+        self.algorithm = algorithm
+        self.executor_kind = executor
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+        
         if private_key_path and os.path.exists(private_key_path):
             # 從檔案載入私鑰
             with open(private_key_path, 'rb') as f:
@@ -29,55 +122,110 @@ class SecurityManager:
                     password=None,
                     backend=default_backend()
                 )
+            check_key_type(self.private_key, algorithm)
         else:
             # 開發模式：自動生成私鑰（生產環境應使用預先生成的密鑰對）
             print("警告：使用自動生成的私鑰（僅用於開發）")
-            self.private_key = rsa.generate_private_key(
-                public_exponent=65537,
-                key_size=2048,
-                backend=default_backend()
-            )
+            self.private_key = generate_private_key(algorithm)
     
-    def sign_jwt(self, stamp_id: int, status: str = 'valid', expires_in_minutes: int = 60) -> str:
+    def build_payload(self, stamp_id: int, status: str = 'valid', expires_in_minutes: int = 60) -> dict:
         """
-        使用 RS256 私鑰簽署 JWT
+        建立 JWT payload
         
         Args:
             stamp_id: 印章 ID
             status: 驗證狀態（預設 'valid'）
             expires_in_minutes: JWT 過期時間（分鐘）
-        
-        Returns:
-            簽署後的 JWT 字串
         """
         # 生成 nonce
         nonce = secrets.token_urlsafe(16)
         
-        # 建立 payload
         now = datetime.utcnow()
-        payload = {
+        return {
             'stamp_id': stamp_id,
             'status': status,
             'nonce': nonce,
             'iat': now,
             'exp': now + timedelta(minutes=expires_in_minutes)
         }
+    
+    def sign_jwt(self, stamp_id: int, status: str = 'valid', expires_in_minutes: int = 60) -> str:
+        """
+        使用私鑰簽署 JWT（同步執行）
         
-        # 使用 RS256 簽署
-        token = jwt.encode(
-            payload,
-            self.private_key,
-            algorithm='RS256'
-        )
+        Args:
+            stamp_id: 印章 ID
+            status: 驗證狀態（預設 'valid'）
+            expires_in_minutes: JWT 過期時間（分鐘）
         
-        return token
+        Returns:
+            簽署後的 JWT 字串
+        """
+        payload = self.build_payload(stamp_id, status, expires_in_minutes)
+        return jwt.encode(payload, self.private_key, algorithm=self.algorithm)
+    
+    def _get_executor(self) -> Executor:
+        """第一次使用時才建立簽章池"""
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_signing_worker,
+                    initargs=(self.get_private_key_pem(), self.algorithm)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='jwt-signer'
+                )
+        return self._executor
+    
+    async def sign_jwt_async(self, stamp_id: int, status: str = 'valid', expires_in_minutes: int = 60) -> str:
+        """
+        在簽章池中簽署 JWT，不阻塞事件迴圈
+        
+        Args:
+            stamp_id: 印章 ID
+            status: 驗證狀態（預設 'valid'）
+            expires_in_minutes: JWT 過期時間（分鐘）
+        
+        Returns:
+            簽署後的 JWT 字串
+        """
+        if self.executor_kind == 'inline':
+            return self.sign_jwt(stamp_id, status, expires_in_minutes)
+        
+        payload = self.build_payload(stamp_id, status, expires_in_minutes)
+        loop = asyncio.get_running_loop()
+        if self.executor_kind == 'process':
+            return await loop.run_in_executor(self._get_executor(), _sign_in_worker, payload)
+        return await loop.run_in_executor(
+            self._get_executor(), jwt.encode, payload, self.private_key, self.algorithm
+        )
+    
+    def close(self) -> None:
+        """關閉簽章池（應用程式關閉時呼叫）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def get_private_key_pem(self) -> bytes:
+        """取得私鑰的 PKCS#8 PEM（僅供行程池子行程載入使用）"""
+        return self.private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
     
     def get_public_key_pem(self) -> str:
         """
         取得公鑰的 PEM 格式（用於分發給客戶端驗證）
         
+        公鑰格式依簽章演算法而定（RSA / EC P-256 / Ed25519），
+        客戶端驗證時需指定相同的演算法（見 self.algorithm）。
+        
         Returns:
-            公鑰的 PEM 字串
+            公鑰的 PEM 字串（SubjectPublicKeyInfo）
         """
         public_key = self.private_key.public_key()
         pem = public_key.public_bytes(
@@ -87,24 +235,110 @@ class SecurityManager:
         return pem.decode('utf-8')
 
 
-def verify_api_key(api_key: str, db_session) -> Optional[dict]:
+def hash_api_key(api_key: str) -> str:
+    """計算 API Key 的 SHA-256 雜湊（快取只保存雜湊值，不保存明文 Key）"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+class APIKeyCache:
+    """API Key 解析快取：包含已驗證客戶的正向快取與無效 Key 的負向快取"""
+    
+    def __init__(
+        self,
+        maxsize: int = API_KEY_CACHE_MAX_ENTRIES,
+        ttl: float = API_KEY_CACHE_TTL,
+        negative_maxsize: int = API_KEY_NEGATIVE_CACHE_MAX_ENTRIES,
+        negative_ttl: float = API_KEY_NEGATIVE_CACHE_TTL
+    ):
+        self._clients = TTLCache(maxsize=maxsize, ttl=ttl)
+        # 負向快取獨立存放，避免大量猜測的 Key 把有效客戶擠出快取
+        self._unknown = TTLCache(maxsize=negative_maxsize, ttl=negative_ttl)
+        # 每次失效都會遞增；查詢資料庫期間若發生失效，查詢結果不寫入快取
+        self._generation = 0
+        # 註冊表快照（由 RegistrySnapshotManager 設定），資料庫無法連線時改查快照
+        self.snapshot = None
+        self.stale_lookups = 0
+    
+    @property
+    def generation(self) -> int:
+        """每次使快取失效或清空時遞增"""
+        return self._generation
+    
+    def get(self, key_hash: str):
+        """
+        查詢快取
+        
+        Returns:
+            (是否命中, 客戶資訊或 None)
+        """
+        client_info = self._clients.get(key_hash)
+        if client_info is not None:
+            return True, client_info
+        if self._unknown.get(key_hash) is not None:
+            return True, None
+        return False, None
+    
+    def peek_client_id(self, key_hash: str) -> Optional[int]:
+        """已快取的 Key 所屬的客戶 ID（不更新統計，限流決定額度時使用）"""
+        client_info = self._clients.peek(key_hash)
+        return client_info['client_id'] if client_info else None
+    
+    def set(self, key_hash: str, client_info: Optional[dict], ttl: Optional[float] = None) -> None:
+        """寫入查詢結果；client_info 為 None 時寫入負向快取，ttl 未指定時使用各快取的預設值"""
+        if client_info is None:
+            self._unknown.set(key_hash, True, ttl=ttl)
+        else:
+            self._clients.set(key_hash, client_info, ttl=ttl)
+    
+    def invalidate_client(self, client_id: int) -> int:
+        """
+        使單一客戶的快取失效（客戶啟用狀態變更時呼叫）
+        
+        負向快取無法得知 Key 所屬的客戶，因此一併清空，
+        讓剛重新啟用的客戶不必等待負向快取過期。
+        """
+        self._generation += 1
+        self._unknown.clear()
+        return self._clients.invalidate_where(lambda _, info: info['client_id'] == client_id)
+    
+    def clear(self) -> None:
+        """清空所有快取"""
+        self._generation += 1
+        self._clients.clear()
+        self._unknown.clear()
+    
+    def stats(self) -> dict:
+        """取得快取統計資料"""
+        return {
+            'clients': self._clients.stats(),
+            'unknown_keys': self._unknown.stats()
+        }
+
+
+# 全域 API Key 快取
+api_key_cache = APIKeyCache()
+
+
+async def resolve_api_key(api_key: str, db_session) -> Optional[dict]:
     """
-    驗證 API Key 並返回客戶資訊
+    直接從資料庫查詢 API Key（不經快取）
     
     Args:
         api_key: API Key 字串
-        db_session: 資料庫 session
+        db_session: 核心資料庫非同步 session
     
     Returns:
         客戶資訊字典，如果無效則返回 None
     """
     from app.models import APIClient
     
-    # 從資料庫查詢 API Key
-    client = db_session.query(APIClient).filter(
-        APIClient.api_key == api_key,
-        APIClient.is_active == True
-    ).first()
+    result = await db_session.execute(
+        select(APIClient.id, APIClient.name).where(
+            APIClient.api_key == api_key,
+            APIClient.is_active == True
+        ).limit(1)
+    )
+    client = result.first()
     
     if not client:
         return None
@@ -112,6 +346,43 @@ def verify_api_key(api_key: str, db_session) -> Optional[dict]:
     return {
         'client_id': client.id,
         'client_name': client.name,
-        'api_key': client.api_key
+        'api_key_hash': hash_api_key(api_key)
     }
 
+
+async def verify_api_key(api_key: str, db_session) -> Optional[dict]:
+    """
+    驗證 API Key 並返回客戶資訊（優先使用快取）
+    
+    Args:
+        api_key: API Key 字串
+        db_session: 核心資料庫非同步 session（僅在快取未命中時使用）
+    
+    Returns:
+        客戶資訊字典，如果無效則返回 None。
+        相同客戶在快取期間會取得同一個字典，呼叫端不應修改其內容。
+    
+    資料庫無法連線時改查註冊表快照（可能略舊），結果只短暫快取，之後再嘗試資料庫。
+    查詢期間若客戶的快取被設為失效（例如剛停用），查詢結果可能已過時，只返回而不寫入快取。
+    """
+    key_hash = hash_api_key(api_key)
+    hit, client_info = api_key_cache.get(key_hash)
+    if hit:
+        return client_info
+    
+    generation = api_key_cache.generation
+    try:
+        client_info = await resolve_api_key(api_key, db_session)
+    except (SQLAlchemyError, OSError):
+        snapshot = api_key_cache.snapshot
+        if snapshot is None:
+            raise
+        api_key_cache.stale_lookups += 1
+        client_info = snapshot.lookup_key(key_hash)
+        if generation == api_key_cache.generation:
+            api_key_cache.set(key_hash, client_info, ttl=API_KEY_STALE_CACHE_TTL)
+        return client_info
+    
+    if generation == api_key_cache.generation:
+        api_key_cache.set(key_hash, client_info)
+    return client_info
@@ -0,0 +1,299 @@
+"""
+WebSocket 驗證工作階段（/api/v1/verify/ws）：持續蓋印的裝置以單一長連線送出座標
+
+連線時只驗證一次 X-API-Key，客戶資訊與可用印章在工作階段期間保留在記憶體中（印章在指紋快取
+有變更時才重新取得）。裝置可以不等回應連續送出請求，以請求 ID 對應回應；每個工作階段同時處理的
+請求數有上限，達到上限時伺服器暫停讀取，由 TCP 流量控制讓裝置端送出變慢。
+
+客戶被停用（registry_changes 的 client_updated）時，該客戶的工作階段會重新驗證 API Key 並關閉。
+工作階段只存在於單一 worker 的記憶體中。
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.change_feed import CLIENT_CREATED, CLIENT_UPDATED
+from app.core.security import verify_api_key
+
+# WebSocket 工作階段配置（可配置）
+# 每個 worker 同時存在的工作階段上限
+WS_MAX_SESSIONS = int(os.getenv('WS_MAX_SESSIONS', '1024'))
+# 每個工作階段同時處理的請求上限（達到上限時暫停讀取）
+WS_SESSION_MAX_IN_FLIGHT = int(os.getenv('WS_SESSION_MAX_IN_FLIGHT', '32'))
+# 沒有收到任何訊框的時間上限（秒），逾時關閉
+WS_SESSION_IDLE_TIMEOUT = float(os.getenv('WS_SESSION_IDLE_TIMEOUT', '60'))
+# 重新驗證 API Key 的間隔（秒）：變更同步停用或中斷時，停用的客戶最晚在此時間後關閉
+WS_SESSION_REVALIDATE_INTERVAL = float(os.getenv('WS_SESSION_REVALIDATE_INTERVAL', '60'))
+
+# WebSocket 關閉代碼（RFC 6455）
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def split_text_request(text: str) -> Tuple[Any, Any]:
+    """
+    取出文字訊框 {"id": ..., "points": [[x, y], ...]} 的請求 ID 與座標（座標以 validate_points 檢查）
+
+    Raises:
+        ValueError: 不是 JSON 物件
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"不是有效的 JSON: {e.msg}")
+    if not isinstance(data, dict):
+        raise ValueError("訊框必須是 JSON 物件")
+    return data.get('id'), data.get('points')
+
+
+def validate_points(points: Any) -> List[Tuple[float, float]]:
+    """
+    檢查座標是 5 個由有限數值組成的 [x, y]
+
+    Raises:
+        ValueError: 格式不符
+    """
+    if not isinstance(points, list) or len(points) != 5:
+        raise ValueError("points 必須是 5 個 [x, y] 座標")
+    result = []
+    for point in points:
+        if not isinstance(point, list) or len(point) != 2:
+            raise ValueError("points 必須是 5 個 [x, y] 座標")
+        x, y = point
+        if type(x) not in (int, float) or type(y) not in (int, float) or not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError("座標必須是有限的數值")
+        result.append((float(x), float(y)))
+    return result
+
+
+def encode_text_response(
+    request_id: Any,
+    code: int,
+    status: str,
+    message: str,
+    stamp_id: Optional[int] = None,
+    jwt_token: Optional[str] = None,
+    retry_after: Optional[int] = None
+) -> str:
+    """編碼文字回應（VerifyResponse 的欄位加上 id、code，限流時另有 retry_after）"""
+    response = {
+        'id': request_id,
+        'code': code,
+        'status': status,
+        'stamp_id': stamp_id,
+        'jwt_token': jwt_token,
+        'message': message,
+    }
+    if retry_after is not None:
+        response['retry_after'] = retry_after
+    return json.dumps(response, ensure_ascii=False)
+
+
+class VerifySession:
+    """單一裝置的驗證工作階段"""
+
+    def __init__(self, websocket, api_key: str, client_info: dict, session_factory, max_in_flight: int = WS_SESSION_MAX_IN_FLIGHT):
+        """
+        初始化工作階段
+
+        Args:
+            websocket: 已驗證 API Key 的 WebSocket 連線
+            api_key: 連線時的 API Key（重新驗證時使用）
+            client_info: verify_api_key 的結果
+            session_factory: 核心資料庫的非同步 Session 工廠（重新取得印章或驗證 API Key 時使用）
+            max_in_flight: 同時處理的請求上限
+        """
+        self.websocket = websocket
+        self.api_key = api_key
+        self.client_info = client_info
+        self.session_factory = session_factory
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.validated_at = time.monotonic()
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self._stamps = None
+        self._stamps_generation: Optional[int] = None
+        self._send_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 統計資料
+        self.received = 0
+
+    @property
+    def client_id(self) -> int:
+        return self.client_info['client_id']
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def client_stamps(self, fingerprint_cache):
+        """工作階段保留的客戶印章；指紋快取有變更（generation 改變）時才重新取得"""
+        generation = fingerprint_cache.generation
+        if self._stamps is None or generation != self._stamps_generation:
+            async with self.session_factory() as db:
+                self._stamps = await fingerprint_cache.get_client_stamps(self.client_id, db)
+            self._stamps_generation = generation
+        return self._stamps
+
+    def needs_revalidation(self, interval: float = WS_SESSION_REVALIDATE_INTERVAL) -> bool:
+        return time.monotonic() - self.validated_at >= interval
+
+    async def revalidate(self) -> bool:
+        """
+        重新驗證 API Key；失效時關閉工作階段
+
+        資料庫無法連線時維持原本的結果，稍後再試。
+
+        Returns:
+            API Key 是否仍然有效
+        """
+        try:
+            async with self.session_factory() as db:
+                client_info = await verify_api_key(self.api_key, db)
+        except Exception as e:
+            print(f"警告：重新驗證工作階段的 API Key 失敗，稍後重試: {e}")
+            return True
+        self.validated_at = time.monotonic()
+        if not client_info:
+            await self.close(CLOSE_POLICY_VIOLATION, "API Key 已失效或客戶已停用")
+            return False
+        self.client_info = client_info
+        # 同步停用或中斷時的權限變更不會反映在 generation，重新驗證時一併重新取得印章
+        self._stamps = None
+        return True
+
+    def track(self, task: asyncio.Task) -> None:
+        """追蹤處理中的請求，完成後釋放名額"""
+        self._tasks.add(task)
+
+        def done(finished: asyncio.Task) -> None:
+            self._tasks.discard(finished)
+            self.slots.release()
+
+        task.add_done_callback(done)
+
+    async def drain(self) -> None:
+        """等待處理中的請求完成（連線結束後，已完成驗證的請求仍會寫入日誌）"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def send(self, message) -> None:
+        """送出回應（多個請求共用連線，依序送出）；連線已關閉時略過"""
+        if self.closed:
+            return
+        async with self._send_lock:
+            try:
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+            except Exception:
+                # 裝置已中斷連線，回應無處可送
+                self.closed = True
+
+    async def close(self, code: int, reason: str) -> None:
+        """關閉工作階段（可重複呼叫）"""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        async with self._send_lock:
+            try:
+                await self.websocket.close(code=code, reason=reason)
+            except Exception:
+                pass
+
+
+class SessionRegistry:
+    """單一 worker 內的工作階段索引（依 client_id）"""
+
+    def __init__(self, max_sessions: int = WS_MAX_SESSIONS):
+        """
+        初始化索引
+
+        Args:
+            max_sessions: 同時存在的工作階段上限
+        """
+        self.max_sessions = max_sessions
+        self._by_client: Dict[int, Set[VerifySession]] = {}
+        self._count = 0
+        self._revalidations: Set[asyncio.Task] = set()
+
+        # 統計資料
+        self.opened = 0
+        self.rejected = 0
+        self.revoked = 0
+        self.idle_closed = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def register(self, session: VerifySession) -> bool:
+        """登記新的工作階段；已達上限時返回 False"""
+        if self._count >= self.max_sessions:
+            self.rejected += 1
+            return False
+        self._by_client.setdefault(session.client_id, set()).add(session)
+        self._count += 1
+        self.opened += 1
+        return True
+
+    def unregister(self, session: VerifySession) -> None:
+        sessions = self._by_client.get(session.client_id)
+        if sessions is None or session not in sessions:
+            return
+        sessions.discard(session)
+        if not sessions:
+            del self._by_client[session.client_id]
+        self._count -= 1
+
+    def sessions_for(self, client_id: int) -> List[VerifySession]:
+        return list(self._by_client.get(client_id, ()))
+
+    def on_change(self, kind: str, client_id: Optional[int], stamp_id: Optional[int]) -> None:
+        """
+        註冊表變更的監聽器（由 RegistryChangeFeed 呼叫）
+
+        客戶建立或更新時（API Key 快取已被清除），該客戶的工作階段立即重新驗證，停用的客戶會被關閉。
+        印章與權限的變更由 VerifySession.client_stamps 依指紋快取的 generation 處理。
+        """
+        if kind not in (CLIENT_CREATED, CLIENT_UPDATED) or client_id not in self._by_client:
+            return
+        for session in self.sessions_for(client_id):
+            task = asyncio.create_task(self.revalidate(session))
+            self._revalidations.add(task)
+            task.add_done_callback(self._revalidations.discard)
+
+    async def revalidate(self, session: VerifySession) -> bool:
+        """重新驗證工作階段的 API Key，返回是否仍然有效（失效的工作階段已關閉）"""
+        valid = await session.revalidate()
+        if not valid:
+            self.revoked += 1
+        return valid
+
+    async def close_all(self, code: int = CLOSE_GOING_AWAY, reason: str = "伺服器關閉中") -> None:
+        """關閉所有工作階段並等待處理中的請求完成（應用程式關閉時呼叫）"""
+        sessions = [session for sessions in self._by_client.values() for session in sessions]
+        await asyncio.gather(*(session.close(code, reason) for session in sessions), return_exceptions=True)
+        # 等待處理中的請求寫入日誌佇列，之後才停止日誌寫入器
+        await asyncio.gather(*(session.drain() for session in sessions), return_exceptions=True)
+
+    def stats(self) -> dict:
+        """取得工作階段統計資料"""
+        return {
+            'active': self._count,
+            'clients': len(self._by_client),
+            'max_sessions': self.max_sessions,
+            'in_flight': sum(session.in_flight for sessions in self._by_client.values() for session in sessions),
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'revoked': self.revoked,
+            'idle_closed': self.idle_closed,
+        }
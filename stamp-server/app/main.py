@@ -2,17 +2,46 @@
 Smart Stamp 核心驗證伺服器
 只做一件事：告訴客戶這個印章是否有效
 """
-from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, WebSocket
+from fastapi.responses import PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Tuple, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
+import asyncio
+import math
 import os
 
-from app.core.database import get_core_db, get_business_db
-from app.core.security import SecurityManager, verify_api_key
-from app.core.math_utils import get_normalized_fingerprint, calculate_mse, calculate_max_error
-from app.models import StampRegistry, StampPermission, StampingLog
+from app.core.database import (
+    DATABASE_URL_CORE, get_core_async_db, AsyncSessionLocalCore, AsyncSessionLocalBusiness,
+    async_engine_core, async_engine_business
+)
+from app.core.security import SecurityManager, verify_api_key, api_key_cache, hash_api_key
+from app.core.math_utils import get_normalized_fingerprint, get_normalized_fingerprints
+from app.core.binary_protocol import (
+    MEDIA_TYPE as BINARY_MEDIA_TYPE, decode_points, encode_response, encode_session_response, error_status,
+    split_session_request
+)
+from app.core.cache import fingerprint_cache
+from app.core.log_writer import StampingLogWriter, build_log_row
+from app.core.log_spool import LOG_SPOOL_ENABLED, LogSpool
+from app.core.change_feed import CHANGE_FEED_ENABLED, RegistryChangeFeed
+from app.core.registry_snapshot import (
+    REGISTRY_SNAPSHOT_DIR, REGISTRY_SNAPSHOT_ENABLED, RegistrySnapshotManager, default_snapshot_dir
+)
+from app.core.metrics import (
+    METRICS_ENABLED, CallbackMetric, VERIFY_DURATION_SECONDS, VERIFY_OUTCOMES, VERIFY_REJECTIONS,
+    VERIFY_STAGE_SECONDS, pool_stats, registry
+)
+from app.core.rate_limit import (
+    RATE_LIMIT_CLIENT_OVERRIDES, RATE_LIMIT_ENABLED, AdmissionController, RateLimiter, ServerOverloaded,
+    parse_overrides
+)
+from app.core.sessions import (
+    CLOSE_INTERNAL_ERROR, CLOSE_NORMAL, CLOSE_POLICY_VIOLATION, CLOSE_TRY_AGAIN_LATER, WS_SESSION_IDLE_TIMEOUT,
+    SessionRegistry, VerifySession, encode_text_response, split_text_request, validate_points
+)
 
 # 初始化 FastAPI
 app = FastAPI(
@@ -30,16 +59,137 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化安全管理器
+# 初始化安全管理器（簽章演算法與簽章池由 JWT_ALGORITHM / JWT_SIGNING_* 設定）
 PRIVATE_KEY_PATH = os.getenv('PRIVATE_KEY_PATH', 'keys/private_key.pem')
 security_manager = SecurityManager(private_key_path=PRIVATE_KEY_PATH)
 
+# 驗證日誌批次寫入器（app_business_db 變慢或無法連線時改寫入本機暫存，恢復後重送）
+log_writer = StampingLogWriter(
+    session_factory=AsyncSessionLocalBusiness,
+    spool=LogSpool() if LOG_SPOOL_ENABLED else None
+)
+
+# 註冊表變更同步（管理後台的變更在 CHANGE_FEED_INTERVAL 秒內套用到快取）
+change_feed = RegistryChangeFeed(
+    session_factory=AsyncSessionLocalCore,
+    fingerprint_cache=fingerprint_cache,
+    api_key_cache=api_key_cache
+)
+
+# 共享註冊表快照（同一台機器上的 worker 共用一份印章指紋，快取未命中時不查詢資料庫；
+# 核心資料庫無法連線時以快照繼續驗證）
+# 快照之後的變更靠變更同步補上，因此停用變更同步時也停用快照
+snapshot_manager = RegistrySnapshotManager(
+    directory=REGISTRY_SNAPSHOT_DIR or default_snapshot_dir(DATABASE_URL_CORE),
+    session_factory=AsyncSessionLocalCore,
+    fingerprint_cache=fingerprint_cache,
+    api_key_cache=api_key_cache,
+    change_feed=change_feed
+)
+
+# 每個客戶的限流與全域並行數上限（在查詢資料庫之前檢查，超過時快速返回 429 / 503）
+rate_limiter = RateLimiter(overrides=parse_overrides(RATE_LIMIT_CLIENT_OVERRIDES))
+admission = AdmissionController()
+
+# WebSocket 驗證工作階段（客戶被停用時由變更同步通知並關閉）
+session_registry = SessionRegistry()
+change_feed.listeners.append(session_registry.on_change)
+
+# 資料庫連線池與背景元件的監控指標（抓取時才取值）
+DB_ENGINES = {
+    'core': async_engine_core,
+    'business': async_engine_business,
+}
+
+
+def _collect_pool(field: str):
+    for name, stats in pool_stats(DB_ENGINES).items():
+        if field in stats:
+            yield (name,), stats[field]
+
+
+for _field, _doc in (
+    ('size', '連線池大小'),
+    ('checked_out', '使用中的連線數'),
+    ('checked_in', '閒置的連線數'),
+    ('overflow', '超出連線池大小的連線數（負值表示尚未建立的連線）'),
+):
+    registry.register(CallbackMetric(
+        f'stamp_db_pool_{_field}', _doc, ('engine',),
+        lambda field=_field: _collect_pool(field)
+    ))
+
+registry.register(CallbackMetric(
+    'stamp_log_queue_depth', '驗證日誌佇列中等待寫入的筆數', (),
+    lambda: [((), log_writer.stats()['queue_depth'])]
+))
+registry.register(CallbackMetric(
+    'stamp_log_rows_written_total', '已寫入 stamping_logs 的筆數', (),
+    lambda: [((), log_writer.written)], type='counter'
+))
+registry.register(CallbackMetric(
+    'stamp_log_flush_failures_total', '驗證日誌批次寫入失敗次數', (),
+    lambda: [((), log_writer.failed_flushes)], type='counter'
+))
+registry.register(CallbackMetric(
+    'stamp_log_spooled_total', '寫入本機暫存的驗證日誌筆數', (),
+    lambda: [((), log_writer.spooled)], type='counter'
+))
+registry.register(CallbackMetric(
+    'stamp_log_spool_pending_bytes', '本機暫存中尚未重送的資料量（位元組）', (),
+    lambda: [((), log_writer.spool.pending_bytes() if log_writer.spool else 0)]
+))
+registry.register(CallbackMetric(
+    'stamp_cache_requests_total', '快取查詢次數', ('cache', 'result'),
+    lambda: [
+        ((name, result), stats[result])
+        for name, stats in (('fingerprint', fingerprint_cache.stats()), ('api_key', api_key_cache.stats()['clients']), ('api_key_negative', api_key_cache.stats()['unknown_keys']))
+        for result in ('hits', 'misses')
+    ],
+    type='counter'
+))
+registry.register(CallbackMetric(
+    'stamp_change_feed_last_id', '已套用的最大變更紀錄 id', (),
+    lambda: [((), change_feed.last_id or 0)]
+))
+registry.register(CallbackMetric(
+    'stamp_change_feed_errors_total', '讀取變更紀錄失敗次數', (),
+    lambda: [((), change_feed.errors)], type='counter'
+))
+registry.register(CallbackMetric(
+    'stamp_change_feed_resyncs_total', '無法確定是否遺漏變更而完整重新同步的次數', (),
+    lambda: [((), change_feed.resyncs)], type='counter'
+))
+registry.register(CallbackMetric(
+    'stamp_admission_in_flight', '正在處理的驗證請求數', (),
+    lambda: [((), admission.in_flight)]
+))
+registry.register(CallbackMetric(
+    'stamp_admission_waiting', '等待處理的驗證請求數', (),
+    lambda: [((), admission.waiting)]
+))
+registry.register(CallbackMetric(
+    'stamp_ws_sessions', '目前的 WebSocket 驗證工作階段數', (),
+    lambda: [((), len(session_registry))]
+))
+registry.register(CallbackMetric(
+    'stamp_registry_snapshot_generation', '目前映射的註冊表快照 generation', (),
+    lambda: [((), snapshot_manager.snapshot.generation)] if snapshot_manager.snapshot else []
+))
+registry.register(CallbackMetric(
+    'stamp_registry_snapshot_overlay', '共享快照之後尚未納入快照的變更筆數', (),
+    lambda: [((), fingerprint_cache.overlay_size)]
+))
+
 # 驗證容差（可配置）
 # MSE 容差：預設值 0.0001（更嚴格的驗證）
 VERIFICATION_TOLERANCE_MSE = float(os.getenv('VERIFICATION_TOLERANCE_MSE', '0.0001'))
 # 最大誤差容差：單一指紋值的最大允許誤差（預設 0.01，即 1%）
 VERIFICATION_TOLERANCE_MAX = float(os.getenv('VERIFICATION_TOLERANCE_MAX', '0.01'))
 
+# 批次驗證單次請求最多的項目數量
+VERIFY_BATCH_MAX_ITEMS = int(os.getenv('VERIFY_BATCH_MAX_ITEMS', '1000'))
+
 
 # Pydantic 模型
 class VerifyRequest(BaseModel):
@@ -60,6 +210,117 @@ class VerifyResponse(BaseModel):
     message: str
 
 
+class BatchVerifyRequest(BaseModel):
+    """批次驗證請求模型"""
+    items: List[VerifyRequest] = Field(
+        ...,
+        description="多組 5 點座標",
+        min_items=1,
+        max_items=VERIFY_BATCH_MAX_ITEMS
+    )
+
+
+class BatchVerifyItem(BaseModel):
+    """批次驗證的單筆結果（index 對應請求中的位置）"""
+    index: int
+    status: str
+    stamp_id: Optional[int] = None
+    jwt_token: Optional[str] = None
+    message: str
+
+
+class BatchVerifyResponse(BaseModel):
+    """批次驗證回應模型"""
+    total: int
+    valid: int
+    invalid: int
+    results: List[BatchVerifyItem]
+
+
+def is_match(best) -> bool:
+    """候選已滿足最大誤差條件，還必須滿足 MSE 條件"""
+    return best is not None and best.mse < VERIFICATION_TOLERANCE_MSE
+
+
+def check_rate_limit(x_api_key: str, endpoint: str, tokens: int = 1) -> None:
+    """
+    檢查客戶的令牌桶（不查詢資料庫）
+
+    client_id 取自 API Key 快取；尚未快取的 Key 不限流，驗證 API Key 後即會快取。
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    client_id = api_key_cache.peek_client_id(hash_api_key(x_api_key))
+    if client_id is not None:
+        check_client_rate_limit(client_id, endpoint, tokens)
+
+
+def check_client_rate_limit(client_id: int, endpoint: str, tokens: int = 1) -> None:
+    """檢查已知客戶的令牌桶，令牌不足時返回 429"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    retry_after = rate_limiter.acquire(client_id, tokens)
+    if not retry_after:
+        return
+    VERIFY_REJECTIONS.inc(endpoint, 'rate_limited')
+    if math.isinf(retry_after):
+        raise HTTPException(
+            status_code=429,
+            detail=f"單次請求的項目數量（{tokens}）超過該客戶的限流容量"
+        )
+    raise HTTPException(
+        status_code=429,
+        detail="請求過於頻繁，請稍後再試",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+@asynccontextmanager
+async def admitted(endpoint: str):
+    """取得處理資格；並行數已達上限且等待佇列已滿或等待逾時時返回 503"""
+    try:
+        async with admission.admit():
+            yield
+    except ServerOverloaded as e:
+        VERIFY_REJECTIONS.inc(endpoint, 'overloaded')
+        raise HTTPException(
+            status_code=503,
+            detail=f"伺服器忙碌中（{e}），請稍後再試",
+            headers={"Retry-After": "1"}
+        )
+
+
+def mismatch_message(best, client_stamps) -> str:
+    """驗證失敗時的錯誤訊息"""
+    if best is not None:
+        return f"指紋不匹配（MSE: {best.mse:.6f}, 最大誤差: {best.max_error:.6f}, MSE容差: {VERIFICATION_TOLERANCE_MSE}, 最大誤差容差: {VERIFICATION_TOLERANCE_MAX}）"
+    if len(client_stamps):
+        return f"指紋不匹配（最大誤差容差 {VERIFICATION_TOLERANCE_MAX} 內沒有候選印章）"
+    return "找不到匹配的印章"
+
+
+@app.on_event("startup")
+async def startup_event():
+    """啟動驗證日誌背景寫入任務、註冊表變更同步與共享快照"""
+    await log_writer.start()
+    if CHANGE_FEED_ENABLED:
+        await change_feed.start()
+        if REGISTRY_SNAPSHOT_ENABLED:
+            await snapshot_manager.start()
+    elif REGISTRY_SNAPSHOT_ENABLED:
+        print("警告：CHANGE_FEED_ENABLED=false，共享註冊表快照已停用")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """關閉 WebSocket 工作階段，寫入佇列中剩餘的驗證日誌，並關閉簽章池"""
+    await session_registry.close_all()
+    await snapshot_manager.stop()
+    await change_feed.stop()
+    await log_writer.stop()
+    security_manager.close()
+
+
 @app.get("/")
 async def root():
     """健康檢查端點"""
@@ -72,8 +333,26 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """健康檢查"""
-    return {"status": "healthy"}
+    """健康檢查（以可能過時的註冊表快照服務時回報 degraded）"""
+    return {
+        "status": "degraded" if snapshot_manager.is_stale() else "healthy",
+        "fingerprint_cache": fingerprint_cache.stats(),
+        "api_key_cache": api_key_cache.stats(),
+        "log_writer": log_writer.stats(),
+        "change_feed": change_feed.stats(),
+        "registry_snapshot": snapshot_manager.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "admission": admission.stats(),
+        "sessions": session_registry.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 監控指標（METRICS_ENABLED=false 時停用）"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.post("/api/v1/verify", response_model=VerifyResponse)
@@ -81,8 +360,7 @@ async def verify_stamp(
     request: VerifyRequest,
     x_api_key: str = Header(..., alias="X-API-Key", description="API Key"),
     http_request: Request = None,
-    core_db: Session = Depends(get_core_db),
-    business_db: Session = Depends(get_business_db)
+    core_db: AsyncSession = Depends(get_core_async_db)
 ):
     """
     驗證印章有效性
@@ -90,19 +368,41 @@ async def verify_stamp(
     流程：
     1. 驗證 API Key
     2. 將 5 點座標轉換為指紋
-    3. 從資料庫查詢該客戶可用的印章指紋
+    3. 從快取（未命中時查詢資料庫）取得該客戶可用的印章指紋
     4. 比對指紋（MSE < tolerance）
     5. 若成功，簽發 JWT
-    6. 記錄日誌
+    6. 記錄日誌（放入批次寫入佇列）
+    
+    查詢資料庫之前先檢查客戶的限流（429）與全域並行數上限（503）。
+    """
+    with VERIFY_DURATION_SECONDS.time('single'):
+        check_rate_limit(x_api_key, 'single')
+        async with admitted('single'):
+            return await _verify_stamp(request.points, x_api_key, http_request, core_db)
+
+
+async def _verify_stamp(
+    points: List[Tuple[float, float]],
+    x_api_key: str,
+    http_request: Request,
+    core_db: Optional[AsyncSession],
+    endpoint: str = 'single',
+    session: Optional[VerifySession] = None
+) -> VerifyResponse:
+    """
+    verify_stamp、verify_stamp_binary 與 WebSocket 工作階段的實作（各階段耗時依 endpoint 記錄於 stamp_verify_stage_seconds）
+    
+    工作階段使用連線時已驗證的客戶資訊與保留的印章，不需要 core_db。
     """
     client_info = None
-    matched_stamp = None
     error_message = None
     
     try:
         # 步驟 1: 驗證 API Key
-        client_info = verify_api_key(x_api_key, core_db)
+        with VERIFY_STAGE_SECONDS.time(endpoint, 'api_key'):
+            client_info = session.client_info if session else await verify_api_key(x_api_key, core_db)
         if not client_info:
+            VERIFY_OUTCOMES.inc(endpoint, 'forbidden')
             raise HTTPException(
                 status_code=403,
                 detail="無效的 API Key"
@@ -110,96 +410,75 @@ async def verify_stamp(
         
         # 步驟 2: 轉換為指紋
         try:
-            fingerprint = get_normalized_fingerprint(request.points)
+            with VERIFY_STAGE_SECONDS.time(endpoint, 'fingerprint'):
+                fingerprint = get_normalized_fingerprint(points)
         except ValueError as e:
+            VERIFY_OUTCOMES.inc(endpoint, 'invalid')
             raise HTTPException(
                 status_code=400,
                 detail=f"指紋計算失敗: {str(e)}"
             )
         
-        # 步驟 3: 查詢該客戶可用的印章
-        permissions = core_db.query(StampPermission).filter(
-            StampPermission.client_id == client_info['client_id'],
-            StampPermission.is_active == True
-        ).all()
+        # 步驟 3: 取得該客戶可用的印章（優先使用快取）
+        with VERIFY_STAGE_SECONDS.time(endpoint, 'permissions'):
+            if session is not None:
+                client_stamps = await session.client_stamps(fingerprint_cache)
+            else:
+                client_stamps = await fingerprint_cache.get_client_stamps(client_info['client_id'], core_db)
         
-        if not permissions:
+        if not client_stamps.permission_count:
+            VERIFY_OUTCOMES.inc(endpoint, 'forbidden')
             error_message = "該客戶沒有可用的印章權限"
             raise HTTPException(
                 status_code=403,
                 detail=error_message
             )
         
-        stamp_ids = [p.stamp_id for p in permissions]
-        stamps = core_db.query(StampRegistry).filter(
-            StampRegistry.id.in_(stamp_ids)
-        ).all()
+        # 步驟 4: 比對指紋（在最大誤差容差內找出 MSE 最小的印章）
+        with VERIFY_STAGE_SECONDS.time(endpoint, 'match'):
+            best = client_stamps.best_match(fingerprint, VERIFICATION_TOLERANCE_MAX)
         
-        # 步驟 4: 比對指紋
-        best_match = None
-        best_mse = float('inf')
-        best_max_error = float('inf')
-        
-        for stamp in stamps:
-            stored_fingerprint = stamp.fingerprint
-            if not stored_fingerprint:
-                continue
-            
-            mse = calculate_mse(fingerprint, stored_fingerprint)
-            max_error = calculate_max_error(fingerprint, stored_fingerprint)
-            
-            # 同時考慮 MSE 和最大誤差
-            if mse < best_mse:
-                best_mse = mse
-                best_max_error = max_error
-                best_match = stamp
-        
-        # 步驟 5: 判斷是否匹配（必須同時滿足 MSE 和最大誤差條件）
-        if best_match and best_mse < VERIFICATION_TOLERANCE_MSE and best_max_error < VERIFICATION_TOLERANCE_MAX:
+        # 步驟 5: 判斷是否匹配（候選已滿足最大誤差條件，還必須滿足 MSE 條件）
+        if is_match(best):
             # 驗證成功：簽發 JWT
-            jwt_token = security_manager.sign_jwt(
-                stamp_id=best_match.id,
-                status='valid'
-            )
+            with VERIFY_STAGE_SECONDS.time(endpoint, 'sign_jwt'):
+                jwt_token = await security_manager.sign_jwt_async(
+                    stamp_id=best.stamp_id,
+                    status='valid'
+                )
             
             # 記錄成功日誌
-            log_entry = StampingLog(
-                client_id=client_info['client_id'],
-                stamp_id=best_match.id,
-                status='valid',
-                fingerprint=fingerprint,
-                ip_address=http_request.client.host if http_request else None,
-                user_agent=http_request.headers.get('user-agent') if http_request else None
-            )
-            business_db.add(log_entry)
-            business_db.commit()
+            with VERIFY_STAGE_SECONDS.time(endpoint, 'log'):
+                await log_writer.enqueue(build_log_row(
+                    client_id=client_info['client_id'],
+                    stamp_id=best.stamp_id,
+                    status='valid',
+                    fingerprint=fingerprint,
+                    http_request=http_request
+                ))
             
+            VERIFY_OUTCOMES.inc(endpoint, 'valid')
             return VerifyResponse(
                 status="valid",
-                stamp_id=best_match.id,
+                stamp_id=best.stamp_id,
                 jwt_token=jwt_token,
                 message="印章驗證成功"
             )
         else:
             # 驗證失敗
-            if best_match:
-                error_message = f"指紋不匹配（MSE: {best_mse:.6f}, 最大誤差: {best_max_error:.6f}, MSE容差: {VERIFICATION_TOLERANCE_MSE}, 最大誤差容差: {VERIFICATION_TOLERANCE_MAX}）"
-            else:
-                error_message = "找不到匹配的印章"
+            error_message = mismatch_message(best, client_stamps)
             
             # 記錄失敗日誌
-            log_entry = StampingLog(
-                client_id=client_info['client_id'],
-                stamp_id=None,
-                status='invalid',
-                fingerprint=fingerprint,
-                error_message=error_message,
-                ip_address=http_request.client.host if http_request else None,
-                user_agent=http_request.headers.get('user-agent') if http_request else None
-            )
-            business_db.add(log_entry)
-            business_db.commit()
+            with VERIFY_STAGE_SECONDS.time(endpoint, 'log'):
+                await log_writer.enqueue(build_log_row(
+                    client_id=client_info['client_id'],
+                    status='invalid',
+                    fingerprint=fingerprint,
+                    error_message=error_message,
+                    http_request=http_request
+                ))
             
+            VERIFY_OUTCOMES.inc(endpoint, 'invalid')
             raise HTTPException(
                 status_code=400,
                 detail=error_message
@@ -211,18 +490,278 @@ async def verify_stamp(
     
     except Exception as e:
         # 記錄錯誤日誌
+        VERIFY_OUTCOMES.inc(endpoint, 'error')
         error_message = f"伺服器錯誤: {str(e)}"
         if client_info:
-            log_entry = StampingLog(
+            await log_writer.enqueue(build_log_row(
                 client_id=client_info['client_id'],
-                stamp_id=None,
                 status='error',
                 error_message=error_message,
-                ip_address=http_request.client.host if http_request else None,
-                user_agent=http_request.headers.get('user-agent') if http_request else None
+                http_request=http_request
+            ))
+        
+        raise HTTPException(
+            status_code=500,
+            detail=error_message
+        )
+
+
+@app.post(
+    "/api/v1/verify/binary",
+    response_class=Response,
+    responses={200: {"content": {BINARY_MEDIA_TYPE: {}}, "description": "二進位驗證結果"}}
+)
+async def verify_stamp_binary(
+    http_request: Request,
+    x_api_key: str = Header(..., alias="X-API-Key", description="API Key"),
+    core_db: AsyncSession = Depends(get_core_async_db)
+):
+    """
+    驗證印章有效性（二進位格式，供高頻率裝置使用）
+    
+    請求本文為 10 個 little-endian float64（5 點座標，共 80 位元組），回應為固定長度標頭加上
+    jwt_token 與 message，格式見 app/core/binary_protocol.py。只檢查本文長度與數值是否有限，
+    不經過 JSON 解析與 Pydantic 驗證；驗證流程、限流與 HTTP 狀態碼與 /api/v1/verify 相同。
+    """
+    with VERIFY_DURATION_SECONDS.time('binary'):
+        try:
+            try:
+                points = decode_points(await http_request.body())
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=f"請求格式錯誤: {str(e)}")
+            check_rate_limit(x_api_key, 'binary')
+            async with admitted('binary'):
+                result = await _verify_stamp(points, x_api_key, http_request, core_db, endpoint='binary')
+        except HTTPException as e:
+            return Response(
+                content=encode_response(error_status(e.status_code), str(e.detail)),
+                status_code=e.status_code,
+                media_type=BINARY_MEDIA_TYPE,
+                headers=e.headers
             )
-            business_db.add(log_entry)
-            business_db.commit()
+        return Response(
+            content=encode_response(result.status, result.message, result.stamp_id, result.jwt_token),
+            media_type=BINARY_MEDIA_TYPE
+        )
+
+
+@app.websocket("/api/v1/verify/ws")
+async def verify_session(websocket: WebSocket):
+    """
+    WebSocket 驗證工作階段（供持續蓋印的裝置使用）
+    
+    連線時以 X-API-Key 標頭驗證一次，之後在同一條連線上連續送出座標：
+    - 文字訊框：{"id": 任意值, "points": [[x, y], ...]}，回應 {"id", "code", "status", "stamp_id", "jwt_token", "message"}
+    - 二進位訊框：請求 ID（uint32）+ 80 位元組座標，格式見 app/core/binary_protocol.py
+    
+    code 對應 HTTP 狀態碼（200 / 400 / 403 / 422 / 429 / 500 / 503），可不等回應連續送出，以 id 對應回應。
+    閒置超過 WS_SESSION_IDLE_TIMEOUT 秒或客戶被停用時伺服器關閉連線。
+    """
+    api_key = websocket.headers.get('x-api-key')
+    if not api_key:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="缺少 X-API-Key")
+        return
+    try:
+        async with AsyncSessionLocalCore() as core_db:
+            client_info = await verify_api_key(api_key, core_db)
+    except Exception as e:
+        print(f"警告：WebSocket 工作階段驗證 API Key 失敗: {e}")
+        await websocket.close(code=CLOSE_INTERNAL_ERROR, reason="伺服器錯誤")
+        return
+    if not client_info:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="無效的 API Key")
+        return
+
+    session = VerifySession(websocket, api_key, client_info, AsyncSessionLocalCore)
+    if not session_registry.register(session):
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="工作階段數量已達上限")
+        return
+
+    try:
+        await websocket.accept()
+        while not session.closed:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), WS_SESSION_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                session_registry.idle_closed += 1
+                await session.close(CLOSE_NORMAL, "閒置逾時")
+                break
+            if message['type'] == 'websocket.disconnect':
+                session.closed = True
+                break
+            session.received += 1
+            # 同時處理的請求達到上限時暫停讀取（背壓）
+            await session.slots.acquire()
+            session.track(asyncio.create_task(_handle_session_frame(session, message)))
+    finally:
+        await session.drain()
+        session_registry.unregister(session)
+
+
+async def _handle_session_frame(session: VerifySession, message: dict) -> None:
+    """處理工作階段中的單一訊框並送出回應"""
+    frame = message.get('bytes')
+    binary = frame is not None
+    request_id = 0 if binary else None
+    with VERIFY_DURATION_SECONDS.time('session'):
+        try:
+            try:
+                if binary:
+                    request_id, body = split_session_request(frame)
+                    points = decode_points(body)
+                else:
+                    request_id, points = split_text_request(message.get('text') or '')
+                    points = validate_points(points)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=f"請求格式錯誤: {str(e)}")
+            if session.needs_revalidation() and not await session_registry.revalidate(session):
+                return
+            check_client_rate_limit(session.client_id, 'session')
+            async with admitted('session'):
+                result = await _verify_stamp(
+                    points, session.api_key, session.websocket, None, endpoint='session', session=session
+                )
+        except HTTPException as e:
+            if binary:
+                await session.send(encode_session_response(
+                    request_id, e.status_code, error_status(e.status_code), str(e.detail)
+                ))
+            else:
+                retry_after = (e.headers or {}).get('Retry-After')
+                await session.send(encode_text_response(
+                    request_id, e.status_code, error_status(e.status_code), str(e.detail),
+                    retry_after=int(retry_after) if retry_after else None
+                ))
+            return
+
+        if binary:
+            await session.send(encode_session_response(
+                request_id, 200, result.status, result.message, result.stamp_id, result.jwt_token
+            ))
+        else:
+            await session.send(encode_text_response(
+                request_id, 200, result.status, result.message, result.stamp_id, result.jwt_token
+            ))
+
+
+@app.post("/api/v1/verify/batch", response_model=BatchVerifyResponse)
+async def verify_stamp_batch(
+    request: BatchVerifyRequest,
+    x_api_key: str = Header(..., alias="X-API-Key", description="API Key"),
+    http_request: Request = None,
+    core_db: AsyncSession = Depends(get_core_async_db)
+):
+    """
+    批次驗證印章有效性
+    
+    單次請求驗證多組座標，結果依請求順序返回；單筆不匹配不影響其他項目，
+    整個請求以 HTTP 200 返回，各項目的 status 為 valid 或 invalid。
+    
+    流程：
+    1. 驗證 API Key（整批一次）
+    2. 取得該客戶可用的印章（整批一次）
+    3. 將每組座標轉換為指紋，以一次向量化運算比對所有指紋
+    4. 只為驗證成功的項目簽發 JWT
+    5. 以單一多筆 INSERT 寫入整批日誌
+    
+    限流時每個項目消耗一個令牌。
+    """
+    with VERIFY_DURATION_SECONDS.time('batch'):
+        check_rate_limit(x_api_key, 'batch', tokens=len(request.items))
+        async with admitted('batch'):
+            return await _verify_stamp_batch(request, x_api_key, http_request, core_db)
+
+
+async def _verify_stamp_batch(request: BatchVerifyRequest, x_api_key: str, http_request: Request, core_db: AsyncSession):
+    """verify_stamp_batch 的實作"""
+    client_info = None
+    
+    try:
+        # 步驟 1: 驗證 API Key
+        with VERIFY_STAGE_SECONDS.time('batch', 'api_key'):
+            client_info = await verify_api_key(x_api_key, core_db)
+        if not client_info:
+            VERIFY_OUTCOMES.inc('batch', 'forbidden')
+            raise HTTPException(
+                status_code=403,
+                detail="無效的 API Key"
+            )
+        
+        # 步驟 2: 取得該客戶可用的印章（優先使用快取）
+        with VERIFY_STAGE_SECONDS.time('batch', 'permissions'):
+            client_stamps = await fingerprint_cache.get_client_stamps(client_info['client_id'], core_db)
+        
+        if not client_stamps.permission_count:
+            VERIFY_OUTCOMES.inc('batch', 'forbidden')
+            raise HTTPException(
+                status_code=403,
+                detail="該客戶沒有可用的印章權限"
+            )
+        
+        # 步驟 3: 以批次 API 一次轉換所有指紋（每個項目都已由 Pydantic 確認為 5 點座標）並批次比對
+        results: List[Optional[BatchVerifyItem]] = [None] * len(request.items)
+        with VERIFY_STAGE_SECONDS.time('batch', 'fingerprint'):
+            fingerprints = get_normalized_fingerprints([item.points for item in request.items])
+        
+        with VERIFY_STAGE_SECONDS.time('batch', 'match'):
+            matches = client_stamps.best_matches(fingerprints, VERIFICATION_TOLERANCE_MAX)
+        
+        # 步驟 4: 只為驗證成功的項目簽發 JWT（由簽章池並行處理）
+        matched = [(i, best) for i, best in enumerate(matches) if is_match(best)]
+        with VERIFY_STAGE_SECONDS.time('batch', 'sign_jwt'):
+            tokens = await asyncio.gather(*(
+                security_manager.sign_jwt_async(stamp_id=best.stamp_id, status='valid')
+                for _, best in matched
+            ))
+        for (i, best), jwt_token in zip(matched, tokens):
+            results[i] = BatchVerifyItem(
+                index=i,
+                status="valid",
+                stamp_id=best.stamp_id,
+                jwt_token=jwt_token,
+                message="印章驗證成功"
+            )
+        for i, best in enumerate(matches):
+            if results[i] is None:
+                results[i] = BatchVerifyItem(index=i, status="invalid", message=mismatch_message(best, client_stamps))
+        
+        # 步驟 5: 整批日誌以單一 INSERT 寫入
+        with VERIFY_STAGE_SECONDS.time('batch', 'log'):
+            await log_writer.write_many([
+                build_log_row(
+                    client_id=client_info['client_id'],
+                    stamp_id=result.stamp_id,
+                    status=result.status,
+                    fingerprint=fingerprints[result.index].tolist(),
+                    error_message=None if result.status == "valid" else result.message,
+                    http_request=http_request
+                )
+                for result in results
+            ])
+        
+        valid = sum(1 for result in results if result.status == "valid")
+        VERIFY_OUTCOMES.inc('batch', 'valid', amount=valid)
+        VERIFY_OUTCOMES.inc('batch', 'invalid', amount=len(results) - valid)
+        return BatchVerifyResponse(
+            total=len(results),
+            valid=valid,
+            invalid=len(results) - valid,
+            results=results
+        )
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        VERIFY_OUTCOMES.inc('batch', 'error')
+        error_message = f"伺服器錯誤: {str(e)}"
+        if client_info:
+            await log_writer.enqueue(build_log_row(
+                client_id=client_info['client_id'],
+                status='error',
+                error_message=error_message,
+                http_request=http_request
+            ))
         
         raise HTTPException(
             status_code=500,
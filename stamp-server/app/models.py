@@ -50,6 +50,7 @@ class StampingLog(Base):
     __tablename__ = 'stamping_logs'
     
     id = Column(Integer, primary_key=True, index=True)
+    log_uuid = Column(String(32), nullable=True, unique=True)  # 重送本機暫存時避免重複寫入
     client_id = Column(Integer, nullable=False, index=True)
     stamp_id = Column(Integer, nullable=True, index=True)  # 如果驗證失敗則為 None
     status = Column(String(50), nullable=False)  # 'valid', 'invalid', 'error'
@@ -59,3 +60,14 @@ class StampingLog(Base):
     user_agent = Column(String(500), nullable=True)
     created_at = Column(DateTime, default=func.now(), nullable=False, index=True)
 
+
+class RegistryChange(Base):
+    """註冊表變更紀錄（唯讀，由管理後台寫入）"""
+    __tablename__ = 'registry_changes'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(32), nullable=False)
+    client_id = Column(Integer, nullable=True)
+    stamp_id = Column(Integer, nullable=True)
+    fingerprint = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=func.now(), nullable=False, index=True)
@@ -0,0 +1,11 @@
+"""
+stamp-server 測試共用設定：讓測試以 `import app...` 載入服務程式碼
+
+    python -m pytest stamp-server/tests
+"""
+import os
+import sys
+
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_ROOT not in sys.path:
+    sys.path.insert(0, SERVICE_ROOT)
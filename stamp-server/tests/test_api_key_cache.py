@@ -0,0 +1,45 @@
+"""
+API Key 快取：查詢資料庫期間發生的失效不應被過時的查詢結果覆蓋
+"""
+import asyncio
+
+from app.core import security
+
+
+def run_lookup_with_invalidation(monkeypatch, invalidate):
+    cache = security.APIKeyCache()
+    monkeypatch.setattr(security, 'api_key_cache', cache)
+    state = {}
+
+    async def resolve(api_key, db_session):
+        await state['release'].wait()
+        return {'client_id': 1, 'is_active': True}
+
+    monkeypatch.setattr(security, 'resolve_api_key', resolve)
+
+    async def scenario():
+        state['release'] = asyncio.Event()
+        lookup = asyncio.create_task(security.verify_api_key('sk_test', None))
+        await asyncio.sleep(0)
+        invalidate(cache)
+        state['release'].set()
+        return await lookup
+
+    client_info = asyncio.run(scenario())
+    return client_info, cache.get(security.hash_api_key('sk_test'))
+
+
+def test_invalidation_during_lookup_skips_cache(monkeypatch):
+    client_info, cached = run_lookup_with_invalidation(monkeypatch, lambda cache: cache.invalidate_client(1))
+    assert client_info['client_id'] == 1
+    assert cached == (False, None)
+
+
+def test_clear_during_lookup_skips_cache(monkeypatch):
+    _, cached = run_lookup_with_invalidation(monkeypatch, lambda cache: cache.clear())
+    assert cached == (False, None)
+
+
+def test_lookup_without_invalidation_is_cached(monkeypatch):
+    _, cached = run_lookup_with_invalidation(monkeypatch, lambda cache: None)
+    assert cached == (True, {'client_id': 1, 'is_active': True})
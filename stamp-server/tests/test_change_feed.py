@@ -0,0 +1,92 @@
+"""
+變更同步：較晚 commit 的較小 id 不會被略過；無法確定是否遺漏變更時完整重新同步
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.cache import FingerprintCache
+from app.core.change_feed import PERMISSION_GRANTED, PERMISSION_REVOKED, RegistryChangeFeed
+from app.core.security import APIKeyCache
+from app.models import RegistryChange
+
+
+def run_feed(tmp_path, scenario, **options):
+    """以 SQLite 模擬 registry_changes，scenario(feed, commit) 以 commit(id, kind, stamp_id) 寫入變更"""
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'core.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(RegistryChange.__table__.create)
+
+        async def commit(*changes):
+            async with engine.begin() as conn:
+                await conn.execute(insert(RegistryChange), [
+                    {'id': change_id, 'kind': kind, 'client_id': 7, 'stamp_id': stamp_id}
+                    for change_id, kind, stamp_id in changes
+                ])
+
+        feed = RegistryChangeFeed(async_sessionmaker(engine), FingerprintCache(), APIKeyCache(), **options)
+        applied = []
+        feed.listeners.append(lambda kind, client_id, stamp_id: applied.append((kind, stamp_id)))
+        try:
+            await commit((1, PERMISSION_GRANTED, 1))
+            await feed.poll()
+            await scenario(feed, commit)
+        finally:
+            await engine.dispose()
+        return feed, applied
+
+    return asyncio.run(main())
+
+
+def test_out_of_order_commit_is_applied(tmp_path):
+    async def scenario(feed, commit):
+        # id 2 的交易先取得 id，但在 id 3 之後才 commit
+        await commit((3, PERMISSION_GRANTED, 3))
+        await feed.poll()
+        assert feed.stats()['pending_gaps'] == 1
+        await commit((2, PERMISSION_REVOKED, 1))
+        await feed.poll()
+
+    feed, applied = run_feed(tmp_path, scenario)
+    assert applied == [(PERMISSION_GRANTED, 3), (PERMISSION_REVOKED, 1)]
+    assert feed.last_id == 3
+    assert feed.stats()['pending_gaps'] == 0
+    assert feed.resyncs == 0
+
+
+def test_large_gap_is_tracked(tmp_path):
+    async def scenario(feed, commit):
+        # 大量授權的交易取得 id 2..2001，較晚 commit
+        await commit((2002, PERMISSION_GRANTED, 1))
+        await feed.poll()
+        assert feed.stats()['pending_gaps'] == 2000
+        await commit(*[(change_id, PERMISSION_GRANTED, change_id) for change_id in range(2, 2002)])
+        while await feed.poll():
+            pass
+
+    feed, applied = run_feed(tmp_path, scenario, batch_size=500)
+    assert len(applied) == 2001
+    assert feed.stats()['pending_gaps'] == 0
+    assert feed.resyncs == 0
+
+
+def test_expired_gap_resyncs(tmp_path):
+    async def scenario(feed, commit):
+        feed.fingerprint_cache.use_snapshot(SimpleNamespace(change_id=1, collected_at=time.time()))
+        await commit((3, PERMISSION_GRANTED, 3))
+        await feed.poll()
+        await feed.poll()
+
+    feed, _ = run_feed(tmp_path, scenario, gap_timeout=0)
+    assert feed.resyncs == 1
+    assert feed.stats()['pending_gaps'] == 0
+    # 停用共享快照，直到映射在重新同步之後建立的快照
+    assert feed.fingerprint_cache.snapshot is None
+    feed.fingerprint_cache.use_snapshot(SimpleNamespace(change_id=3, collected_at=time.time() - 60))
+    assert feed.fingerprint_cache.snapshot is None
+    feed.fingerprint_cache.use_snapshot(SimpleNamespace(change_id=3, collected_at=time.time()))
+    assert feed.fingerprint_cache.snapshot is not None
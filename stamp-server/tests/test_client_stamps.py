@@ -0,0 +1,70 @@
+"""
+ClientStamps 的權限數量：沒有指紋或指紋格式不符的印章也計入權限，新增與移除不會累積誤差
+"""
+import asyncio
+
+import numpy as np
+
+from app.core.cache import ClientStamps, FingerprintCache
+from app.core.change_feed import PERMISSION_GRANTED, PERMISSION_REVOKED, STAMP_DELETED
+from app.core.registry_snapshot import RegistrySnapshot, write_snapshot
+
+FINGERPRINT = [0.1, 0.2, 0.3, 0.4, 0.5]
+
+
+def test_unmatchable_stamps_are_counted_once():
+    stamps = ClientStamps.build([1], [FINGERPRINT], unmatchable=[2])
+    assert stamps.permission_count == 2
+    assert len(stamps) == 1
+    assert 2 in stamps
+
+    assert stamps.add_stamp(3, None)
+    assert stamps.add_stamp(4, [0.1, 0.2])
+    assert not stamps.add_stamp(3, None)
+    assert not stamps.add_stamp(2, FINGERPRINT)
+    assert stamps.permission_count == 4
+    assert len(stamps) == 1
+
+    for stamp_id in (2, 3, 4):
+        assert stamps.remove_stamp(stamp_id)
+        assert not stamps.remove_stamp(stamp_id)
+    assert stamps.permission_count == 1
+    assert stamps.remove_stamp(1)
+    assert stamps.permission_count == 0
+
+
+def test_regrant_after_revoke_does_not_drift():
+    stamps = ClientStamps.build([], [])
+    for _ in range(3):
+        assert stamps.add_stamp(5, None)
+        assert stamps.remove_stamp(5)
+    assert stamps.permission_count == 0
+    assert stamps.best_match(FINGERPRINT, 0.01) is None
+
+
+def test_snapshot_keeps_unmatchable_stamps(tmp_path):
+    path = str(tmp_path / 'registry.bin')
+    write_snapshot(
+        path, generation=1, change_id=10, collected_at=0.0,
+        client_ids=np.array([7], dtype=np.int64),
+        offsets=np.array([0, 1], dtype=np.int64),
+        stamp_ids=np.array([1], dtype=np.int64),
+        fingerprints=np.array([FINGERPRINT], dtype=np.float64),
+        unmatchable_offsets=np.array([0, 2], dtype=np.int64),
+        unmatchable_ids=np.array([2, 3], dtype=np.int64),
+        key_client_ids=np.zeros(0, dtype=np.int64),
+        name_offsets=np.zeros(1, dtype=np.int64),
+        key_hashes=np.zeros(0, dtype=np.uint8),
+        names=np.zeros(0, dtype=np.uint8),
+    )
+    snapshot = RegistrySnapshot(path)
+    cache = FingerprintCache()
+    cache.use_snapshot(snapshot)
+    cache.apply_change(11, PERMISSION_REVOKED, 7, 2, None)
+    cache.apply_change(12, STAMP_DELETED, None, 3, None)
+    cache.apply_change(13, PERMISSION_GRANTED, 7, 4, [])
+
+    stamps = asyncio.run(cache.get_client_stamps(7, None))
+    assert stamps.permission_count == 2
+    assert stamps.unmatchable == {4}
+    assert stamps.stamp_ids.tolist() == [1]
@@ -0,0 +1,38 @@
+"""
+驗證日誌寫入器：停用暫存且資料庫無法寫入時，關閉不會無限期等待
+"""
+import asyncio
+
+from app.core import log_writer
+from app.core.log_writer import StampingLogWriter, build_log_row
+
+
+class UnreachableDatabase:
+    """進入 session 時拋出連線錯誤"""
+
+    def __init__(self):
+        self.attempts = 0
+
+    async def __aenter__(self):
+        self.attempts += 1
+        raise OSError("connection refused")
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def test_stop_gives_up_when_database_is_down(monkeypatch):
+    monkeypatch.setattr(log_writer, 'LOG_CLOSE_MAX_RETRIES', 2)
+    database = UnreachableDatabase()
+    writer = StampingLogWriter(lambda: database, batch_size=2, flush_interval=0.01)
+
+    async def scenario():
+        await writer.start()
+        for _ in range(5):
+            await writer.enqueue(build_log_row(client_id=1, status='valid'))
+        await asyncio.wait_for(writer.stop(), timeout=5)
+
+    asyncio.run(scenario())
+    assert writer.dropped == 5
+    assert writer.written == 0
+    assert not writer.running
@@ -0,0 +1,153 @@
+"""
+向量化比對與逐筆比對（calculate_mse / calculate_max_error）的一致性測試
+
+逐筆比對的參考實作：
+- baseline_best_match：verify_stamp 原本的迴圈（MSE 最小者，相同時取第一枚）
+- baseline_best_within：最大誤差小於容差的印章中 MSE 最小者，相同時取印章 ID 最小者
+"""
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from app.core.fingerprint_index import FingerprintGridIndex
+from app.core.math_utils import calculate_max_error, calculate_mse, get_normalized_fingerprint
+from app.core.matcher import (
+    as_fingerprint_matrix,
+    calculate_errors,
+    find_best_match,
+    find_best_within,
+    find_best_within_many,
+    select_best,
+)
+
+TOLERANCE = 0.01
+
+
+def baseline_best_match(stamp_ids, fingerprints, fingerprint):
+    best = None
+    best_mse = float('inf')
+    for stamp_id, stored in zip(stamp_ids, fingerprints):
+        mse = calculate_mse(fingerprint, stored)
+        if mse < best_mse:
+            best_mse = mse
+            best = (stamp_id, mse, calculate_max_error(fingerprint, stored))
+    return best
+
+
+def baseline_best_within(stamp_ids, fingerprints, fingerprint, tolerance):
+    best = None
+    for stamp_id, stored in zip(stamp_ids, fingerprints):
+        mse = calculate_mse(fingerprint, stored)
+        max_error = calculate_max_error(fingerprint, stored)
+        if max_error < tolerance and (best is None or (mse, stamp_id) < (best[1], best[0])):
+            best = (stamp_id, mse, max_error)
+    return best
+
+
+def summary(result):
+    return None if result is None else (result.stamp_id, result.mse, result.max_error)
+
+
+def check_all(stamp_ids, fingerprints, targets, tolerance=TOLERANCE):
+    """以所有向量化 API 比對 targets，與逐筆比對的結果逐位元比較"""
+    ids = np.asarray(stamp_ids, dtype=np.int64)
+    matrix = as_fingerprint_matrix(fingerprints)
+    index = FingerprintGridIndex.build(ids, matrix, cell_size=2 * tolerance)
+    many = find_best_within_many(ids, matrix, targets, tolerance)
+    assert len(many) == len(targets)
+    for target, batch_result in zip(targets, many):
+        expected = baseline_best_within(stamp_ids, fingerprints, target, tolerance)
+        assert summary(find_best_within(ids, matrix, target, tolerance)) == expected
+        assert summary(batch_result) == expected
+        assert summary(index.query(target, tolerance)) == expected
+
+        mse, max_error = calculate_errors(matrix, target)
+        assert summary(select_best(ids, matrix, target, mse, max_error, tolerance)) == expected
+        if stamp_ids:
+            assert summary(find_best_match(ids, matrix, target)) == baseline_best_match(stamp_ids, fingerprints, target)
+
+
+def random_fingerprint(rng: random.Random):
+    return get_normalized_fingerprint([(rng.uniform(0, 500), rng.uniform(0, 500)) for _ in range(5)])
+
+
+def near(rng: random.Random, fingerprint, amount: float):
+    return [value + rng.uniform(-amount, amount) for value in fingerprint]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_registry(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 400)
+    fingerprints = [random_fingerprint(rng) for _ in range(n)]
+    # 在部分印章附近加入相近的印章，讓方框內有多個候選
+    for _ in range(n // 4):
+        fingerprints.append(near(rng, rng.choice(fingerprints), TOLERANCE))
+    stamp_ids = rng.sample(range(1, 10 * len(fingerprints)), len(fingerprints))
+    targets = [near(rng, rng.choice(fingerprints), TOLERANCE * rng.choice([0.1, 0.5, 1.0])) for _ in range(40)]
+    targets += [random_fingerprint(rng) for _ in range(10)]
+    check_all(stamp_ids, fingerprints, targets)
+
+
+def test_near_ties_are_resolved_with_calculate_mse():
+    # 同一組差值以不同順序排列：數學上 MSE 相同，依累加順序與平方方式可能差幾個 ULP
+    rng = random.Random(1)
+    for _ in range(200):
+        target = [rng.uniform(0.2, 0.8) for _ in range(5)]
+        offsets = [rng.uniform(-TOLERANCE, TOLERANCE) * 0.9 for _ in range(5)]
+        fingerprints = [[t + o for t, o in zip(target, perm)] for perm in itertools.permutations(offsets)]
+        stamp_ids = rng.sample(range(1, 1000), len(fingerprints))
+        check_all(stamp_ids, fingerprints, [target])
+
+
+def test_exact_ties_prefer_smallest_stamp_id():
+    fingerprint = [0.1, 0.2, 0.3, 0.4, 0.5]
+    stamp_ids = [7, 3, 5]
+    fingerprints = [fingerprint, fingerprint, fingerprint]
+    check_all(stamp_ids, fingerprints, [fingerprint, near(random.Random(2), fingerprint, 0.001)])
+
+    ids = np.asarray(stamp_ids, dtype=np.int64)
+    matrix = as_fingerprint_matrix(fingerprints)
+    assert find_best_within(ids, matrix, fingerprint, TOLERANCE).stamp_id == 3
+    # 全域比對維持原本的行為：取第一枚
+    assert find_best_match(ids, matrix, fingerprint).stamp_id == 7
+
+
+def test_max_error_exactly_at_tolerance_is_excluded():
+    tolerance = 0.25
+    target = [0.5, 0.5, 0.5, 0.5, 0.5]
+    # 0.75 - 0.5 恰好等於容差：不在方框內（最大誤差必須小於容差）
+    at_tolerance = [0.75, 0.5, 0.5, 0.5, 0.5]
+    inside = [0.625, 0.625, 0.625, 0.625, 0.625]
+    assert calculate_max_error(target, at_tolerance) == tolerance
+    assert calculate_mse(target, at_tolerance) < calculate_mse(target, inside)
+
+    check_all([1], [at_tolerance], [target], tolerance)
+    check_all([1, 2], [at_tolerance, inside], [target], tolerance)
+    ids = np.asarray([1, 2], dtype=np.int64)
+    matrix = as_fingerprint_matrix([at_tolerance, inside])
+    assert find_best_within(ids, matrix, target, tolerance).stamp_id == 2
+    assert find_best_within(ids[:1], matrix[:1], target, tolerance) is None
+
+
+def test_empty_registry():
+    ids = np.zeros(0, dtype=np.int64)
+    matrix = as_fingerprint_matrix([])
+    target = [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert find_best_match(ids, matrix, target) is None
+    assert find_best_within(ids, matrix, target, TOLERANCE) is None
+    assert find_best_within_many(ids, matrix, [target, target], TOLERANCE) == [None, None]
+    assert FingerprintGridIndex(cell_size=2 * TOLERANCE).query(target, TOLERANCE) is None
+    check_all([], [], [target])
+
+
+def test_batch_chunks_match_single_queries(monkeypatch):
+    from app.core import matcher
+
+    monkeypatch.setattr(matcher, 'BATCH_CHUNK_PAIRS', 7)
+    rng = random.Random(3)
+    fingerprints = [random_fingerprint(rng) for _ in range(5)]
+    targets = [near(rng, fingerprint, TOLERANCE) for fingerprint in fingerprints for _ in range(3)]
+    check_all([5, 4, 3, 2, 1], fingerprints, targets)
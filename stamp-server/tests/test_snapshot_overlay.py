@@ -0,0 +1,63 @@
+"""
+共享快照的 overlay：id 較小但較晚 commit 的變更，在包含它的快照映射之前不會被移除
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from app.core.cache import FingerprintCache
+from app.core.change_feed import PERMISSION_REVOKED
+from app.core.registry_snapshot import RegistrySnapshot, write_snapshot
+
+FINGERPRINT = [0.1, 0.2, 0.3, 0.4, 0.5]
+
+
+def snapshot_of(path, generation, change_id, collected_at, stamp_ids):
+    """客戶 7 擁有 stamp_ids 的快照"""
+    write_snapshot(
+        str(path), generation=generation, change_id=change_id, collected_at=collected_at,
+        client_ids=np.array([7], dtype=np.int64),
+        offsets=np.array([0, len(stamp_ids)], dtype=np.int64),
+        stamp_ids=np.array(stamp_ids, dtype=np.int64),
+        fingerprints=np.array([FINGERPRINT] * len(stamp_ids), dtype=np.float64).reshape(-1, 5),
+        unmatchable_offsets=np.array([0, 0], dtype=np.int64),
+        unmatchable_ids=np.zeros(0, dtype=np.int64),
+        key_client_ids=np.zeros(0, dtype=np.int64),
+        name_offsets=np.zeros(1, dtype=np.int64),
+        key_hashes=np.zeros(0, dtype=np.uint8),
+        names=np.zeros(0, dtype=np.uint8),
+    )
+    return RegistrySnapshot(str(path))
+
+
+def client_stamp_ids(cache):
+    return asyncio.run(cache.get_client_stamps(7, None)).stamp_ids.tolist()
+
+
+def test_late_change_survives_snapshot_collected_before_it(tmp_path):
+    cache = FingerprintCache()
+    cache.use_snapshot(snapshot_of(tmp_path / 'a.bin', 1, 10, time.time() - 10, [1, 2]))
+
+    # id 8 較晚 commit：變更同步以缺漏 id 的身分讀取到
+    cache.apply_change(8, PERMISSION_REVOKED, 7, 2, None, late=True)
+    observed = time.time()
+    assert client_stamp_ids(cache) == [1]
+
+    # 在讀取到 id 8 之前開始讀取資料庫的快照：change_id 較大，但可能不包含 id 8
+    cache.use_snapshot(snapshot_of(tmp_path / 'b.bin', 2, 12, observed - 1, [1, 2]))
+    assert cache.overlay_size == 1
+    assert client_stamp_ids(cache) == [1]
+
+    # 讀取到 id 8 之後才開始讀取資料庫的快照必定包含該變更
+    cache.use_snapshot(snapshot_of(tmp_path / 'c.bin', 3, 12, observed + 1, [1]))
+    assert cache.overlay_size == 0
+    assert client_stamp_ids(cache) == [1]
+
+
+def test_changes_after_snapshot_are_kept(tmp_path):
+    cache = FingerprintCache()
+    cache.use_snapshot(snapshot_of(tmp_path / 'a.bin', 1, 10, time.time(), [1, 2]))
+    cache.apply_change(11, PERMISSION_REVOKED, 7, 1, None)
+    cache.use_snapshot(snapshot_of(tmp_path / 'b.bin', 2, 10, time.time() + 1, [1, 2]))
+    assert client_stamp_ids(cache) == [2]